@@ -0,0 +1,282 @@
+"""
+Azure OpenAI Batch Image Generation Module
+
+This module provides an asyncio based batch API on top of AzureImageGenerator.
+Many prompts are processed by a fixed size worker pool, paced by an optional
+rate limiter, and throttled calls are retried with jittered exponential backoff.
+Results are streamed back to the caller as soon as each image completes.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Iterable, Optional, Union
+
+import openai
+
+from generate import AzureImageGenerator
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ImageRequest:
+    """A single prompt and the generation parameters to use for it."""
+
+    prompt: str
+    size: str = "1024x1024"
+    quality: str = "medium"
+    output_format: str = "png"
+    output_compression: int = 100
+    n: int = 1
+    key: Optional[str] = None
+
+
+@dataclass
+class ImageResult:
+    """The outcome of an ImageRequest, either image bytes or the final error."""
+
+    request: ImageRequest
+    image_bytes: Optional[bytes] = None
+    error: Optional[BaseException] = None
+    attempts: int = 0
+    latency: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.image_bytes is not None
+
+
+class AsyncRateLimiter:
+    """
+    Spaces calls evenly so that no more than `requests_per_minute` start per minute.
+
+    Waiters are served in arrival order; the limiter never sleeps while holding
+    the lock longer than the gap to the next free slot.
+    """
+
+    def __init__(self, requests_per_minute: float):
+        if requests_per_minute <= 0:
+            raise ValueError("requests_per_minute must be positive")
+        self.interval = 60.0 / requests_per_minute
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+def _is_throttled(error: BaseException) -> bool:
+    """Return True for errors that indicate the service asked us to back off."""
+    if isinstance(error, (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in (429, 500, 502, 503, 504)
+    return False
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    """Read the Retry-After hint from a throttled response, if the service sent one."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    value = response.headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000.0
+        except ValueError:
+            pass
+    value = response.headers.get("retry-after")
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+class AsyncImageGenerationService:
+    """
+    Concurrency limited, asynchronous batch front end for AzureImageGenerator.
+
+    The synchronous generator calls run on worker threads so the event loop stays
+    free; at most `max_in_flight` calls are outstanding at any time.
+    """
+
+    def __init__(
+        self,
+        generator: Optional[AzureImageGenerator] = None,
+        max_in_flight: int = 4,
+        requests_per_minute: Optional[float] = None,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0
+    ):
+        """
+        Initialize the batch service.
+
+        Args:
+            generator: Generator to use, a new AzureImageGenerator is created if omitted
+            max_in_flight: Maximum number of concurrent image generation calls
+            requests_per_minute: Optional cap on how many calls start per minute
+            max_retries: Number of retries for throttled or transient failures
+            base_delay: Initial backoff delay in seconds
+            max_delay: Upper bound for a single backoff delay in seconds
+        """
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+        self.generator = generator or AzureImageGenerator()
+        self.max_in_flight = max_in_flight
+        self.rate_limiter = AsyncRateLimiter(requests_per_minute) if requests_per_minute else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def _backoff(self, attempt: int, error: BaseException) -> float:
+        """Full jitter exponential backoff, never shorter than the server's Retry-After."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        hint = _retry_after(error)
+        if hint is not None:
+            delay = max(delay, min(hint, self.max_delay))
+        return delay
+
+    async def _call(self, request: ImageRequest) -> Optional[bytes]:
+        return await asyncio.to_thread(
+            self.generator.generate_image,
+            prompt=request.prompt,
+            size=request.size,
+            quality=request.quality,
+            output_format=request.output_format,
+            output_compression=request.output_compression,
+            n=request.n
+        )
+
+    async def generate(self, request: ImageRequest) -> ImageResult:
+        """
+        Generate a single image, retrying throttled calls.
+
+        Args:
+            request: The prompt and parameters to generate
+
+        Returns:
+            ImageResult: The image bytes, or the error of the last attempt
+        """
+        result = ImageResult(request=request)
+        started = time.monotonic()
+        for attempt in range(self.max_retries + 1):
+            if self.rate_limiter:
+                await self.rate_limiter.acquire()
+            result.attempts = attempt + 1
+            try:
+                result.image_bytes = await self._call(request)
+                result.error = None
+                break
+            except ValueError as e:
+                # Invalid parameters will not get better with retries
+                result.error = e
+                break
+            except Exception as e:
+                result.error = e
+                if attempt >= self.max_retries or not _is_throttled(e):
+                    break
+                delay = self._backoff(attempt, e)
+                logger.warning("Image generation throttled (%s), retrying in %.1fs", e, delay)
+                await asyncio.sleep(delay)
+        result.latency = time.monotonic() - started
+        if result.error is not None:
+            logger.error("Failed to generate image for %r: %s", request.key or request.prompt[:60], result.error)
+        return result
+
+    async def generate_many(
+        self,
+        requests: Iterable[Union[ImageRequest, str]]
+    ) -> AsyncIterator[ImageResult]:
+        """
+        Generate images for many prompts, yielding each result as soon as it completes.
+
+        Results arrive in completion order, not request order; use `ImageRequest.key`
+        to correlate them. Failures are yielded as results with `error` set.
+
+        Args:
+            requests: Prompts or ImageRequest objects to generate
+
+        Yields:
+            ImageResult: One result per request
+        """
+        pending: asyncio.Queue = asyncio.Queue(maxsize=self.max_in_flight * 2)
+        results: asyncio.Queue = asyncio.Queue()
+        done = object()
+
+        async def feeder():
+            # Always let the workers finish, an error from iterating requests is re-raised below
+            try:
+                for item in requests:
+                    await pending.put(item if isinstance(item, ImageRequest) else ImageRequest(prompt=item))
+            finally:
+                for _ in range(self.max_in_flight):
+                    await pending.put(done)
+
+        async def worker():
+            while True:
+                item = await pending.get()
+                if item is done:
+                    await results.put(done)
+                    return
+                await results.put(await self.generate(item))
+
+        tasks = [asyncio.create_task(feeder())]
+        tasks.extend(asyncio.create_task(worker()) for _ in range(self.max_in_flight))
+        try:
+            finished = 0
+            while finished < self.max_in_flight:
+                result = await results.get()
+                if result is done:
+                    finished += 1
+                    continue
+                yield result
+            await tasks[0]
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            # Persist the access times of the cache hits, so eviction order survives the run
+            if (cache := getattr(self.generator, "cache", None)) is not None:
+                await asyncio.to_thread(cache.flush)
+
+
+async def main():
+    """
+    Example usage of the batch service.
+
+    Generates a handful of car category images concurrently and saves each
+    one as soon as it is ready.
+    """
+    service = AsyncImageGenerationService(max_in_flight=3, requests_per_minute=20)
+    prompt = "A clear image of a recent generation {} on a transparent background without any visible brand signs."
+    requests = [
+        ImageRequest(prompt=prompt.format(category), key=category.replace(" ", "_"))
+        for category in ["electric SUV", "practical sedan", "compact city car", "elegant limousine"]
+    ]
+    async for result in service.generate_many(requests):
+        if result.ok:
+            saved_path = service.generator.save_image(result.image_bytes, f"{result.request.key}.png")
+            print(f"Generated {result.request.key} in {result.latency:.1f}s -> {saved_path}")
+        else:
+            print(f"Failed to generate {result.request.key}: {result.error}")
+
+
+if __name__ == "__main__":
+    # Configure logging for standalone execution
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    asyncio.run(main())
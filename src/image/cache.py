@@ -0,0 +1,260 @@
+"""
+Content Addressed Image Cache
+
+This module provides an on-disk cache for generated and edited images. Entries are
+keyed by a hash of everything that determines the output (model, prompt, size,
+quality, format and the content of any input images) and evicted least recently
+used first once the cache grows beyond its size budget.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Union
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+INDEX_FILENAME = "index.json"
+
+
+def hash_file(path: Union[str, Path], chunk_size: int = 1024 * 1024) -> str:
+    """Return the SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ImageCache:
+    """
+    Size bounded, content addressed image cache on local disk.
+
+    The cache directory holds one file per entry plus an index file that tracks
+    entry sizes and last access times. The index is kept in least recently used
+    order and written back at most every `flush_interval` seconds on lookups, call
+    `flush` when done to persist the latest access times. All methods are thread
+    safe so a cache can be shared by the worker threads of the batch service.
+    """
+
+    flush_interval: float = 30.0
+
+    def __init__(self, directory: Union[str, Path] = ".image_cache", max_bytes: int = 512 * 1024 * 1024):
+        """
+        Initialize the cache and load its index.
+
+        Args:
+            directory: Directory to store cached images in
+            max_bytes: Total size budget, least recently used entries are evicted beyond it
+        """
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._index: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._total = 0
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._load_index()
+
+    @classmethod
+    def from_environment(cls) -> Optional["ImageCache"]:
+        """Create a cache from IMAGE_CACHE_DIR / IMAGE_CACHE_MAX_MB, or None if caching is not configured."""
+        directory = os.environ.get("IMAGE_CACHE_DIR")
+        if not directory:
+            return None
+        max_mb = int(os.environ.get("IMAGE_CACHE_MAX_MB", "512"))
+        logger.info("Using image cache at %s (max %d MB)", directory, max_mb)
+        return cls(directory, max_bytes=max_mb * 1024 * 1024)
+
+    @staticmethod
+    def make_key(
+        model: str,
+        prompt: str,
+        size: Optional[str] = None,
+        quality: Optional[str] = None,
+        output_format: Optional[str] = None,
+        input_images: Iterable[Union[str, Path, bytes]] = (),
+        **extra: Any
+    ) -> str:
+        """
+        Build the cache key for an image request.
+
+        Args:
+            model: Model or deployment name
+            prompt: Prompt text
+            size: Image size
+            quality: Image quality
+            output_format: Output format
+            input_images: Input image paths or bytes, hashed by content
+            **extra: Any other parameter that changes the output (e.g. compression, index)
+
+        Returns:
+            str: SHA-256 hex digest identifying the request
+        """
+        input_hashes = [
+            hashlib.sha256(image).hexdigest() if isinstance(image, bytes) else hash_file(image)
+            for image in input_images
+        ]
+        material = {
+            "model": model,
+            "prompt": prompt,
+            "size": size,
+            "quality": quality,
+            "output_format": output_format,
+            "inputs": input_hashes,
+            **extra
+        }
+        return hashlib.sha256(json.dumps(material, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / key
+
+    def _load_index(self):
+        index_path = self.directory / INDEX_FILENAME
+        if not index_path.exists():
+            return
+        try:
+            with open(index_path, "r") as f:
+                index = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable image cache index: %s", e)
+            return
+        # Drop entries whose files were removed behind our back, oldest access first
+        entries = sorted(index.items(), key=lambda item: item[1]["last_access"])
+        self._index = OrderedDict((key, entry) for key, entry in entries if self._path(key).exists())
+        self._total = sum(entry["size"] for entry in self._index.values())
+
+    def _save_index(self):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self.directory / INDEX_FILENAME)
+        self._dirty = False
+        self._saved_at = time.monotonic()
+
+    def _drop(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._index.pop(key, None)
+        if entry is not None:
+            self._total -= entry["size"]
+        return entry
+
+    def _evict(self):
+        while self._total > self.max_bytes and self._index:
+            key = next(iter(self._index))
+            entry = self._drop(key)
+            try:
+                self._path(key).unlink()
+            except FileNotFoundError:
+                pass
+            logger.info("Evicted cached image %s (%d bytes)", key, entry["size"])
+
+    def get_path(self, key: str) -> Optional[Path]:
+        """Return the path of a cached entry, counting the lookup as a hit or miss."""
+        with self._lock:
+            entry = self._index.get(key)
+            path = self._path(key)
+            if entry is None or not path.exists():
+                self._drop(key)
+                self.misses += 1
+                return None
+            entry["last_access"] = time.time()
+            self._index.move_to_end(key)
+            self._dirty = True
+            self.hits += 1
+            if time.monotonic() - self._saved_at >= self.flush_interval:
+                self._save_index()
+            return path
+
+    def _raced_eviction(self):
+        # The file was evicted by another thread after get_path counted a hit
+        with self._lock:
+            self.hits -= 1
+            self.misses += 1
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the cached bytes for a key, or None on a miss."""
+        path = self.get_path(key)
+        if path is None:
+            return None
+        try:
+            return path.read_bytes()
+        except FileNotFoundError:
+            self._raced_eviction()
+            return None
+
+    def put(self, key: str, data: bytes) -> Optional[Path]:
+        """Store bytes under a key and return the path of the cached file, or None if it exceeds the budget."""
+        if len(data) > self.max_bytes:
+            logger.info("Not caching image %s, %d bytes exceed the cache size", key, len(data))
+            return None
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        return self._commit(key, tmp_path, len(data))
+
+    def put_file(self, key: str, source: Union[str, Path]) -> Optional[Path]:
+        """Copy a file into the cache under a key and return the path of the cached file, or None if it exceeds the budget."""
+        size = os.path.getsize(source)
+        if size > self.max_bytes:
+            logger.info("Not caching image %s, %d bytes exceed the cache size", key, size)
+            return None
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        os.close(fd)
+        shutil.copyfile(source, tmp_path)
+        return self._commit(key, tmp_path, os.path.getsize(tmp_path))
+
+    def _commit(self, key: str, tmp_path: str, size: int) -> Path:
+        path = self._path(key)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._drop(key)
+            self._index[key] = {"size": size, "last_access": time.time()}
+            self._total += size
+            self._evict()
+            self._save_index()
+        return path
+
+    def copy_to(self, key: str, destination: Union[str, Path]) -> Optional[str]:
+        """Copy a cached entry to a destination file, returning its absolute path or None on a miss."""
+        path = self.get_path(key)
+        if path is None:
+            return None
+        try:
+            shutil.copyfile(path, destination)
+        except FileNotFoundError:
+            if path.exists():
+                raise
+            self._raced_eviction()
+            return None
+        return os.path.abspath(destination)
+
+    def flush(self):
+        """Persist access times collected since the last write."""
+        with self._lock:
+            if self._dirty:
+                self._save_index()
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters and the current cache size."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._index),
+                "bytes": self._total
+            }
@@ -0,0 +1,208 @@
+"""
+Catalog Image Generation CLI
+
+This module generates every missing catalog image referenced by the realtime stores'
+data files (e.g. `reportstore/categories.json`, `reportstore/cars.json`). Prompts are
+built from a template, images are generated concurrently with AsyncImageGenerationService,
+and progress is recorded in an append-only manifest so an interrupted run resumes
+where it stopped. Throughput and per-image latency are reported at the end.
+
+Example:
+    python catalog.py ../realtime/reportstore/cars.json --static-dir ../realtime/static
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import statistics
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from batch import AsyncImageGenerationService, ImageRequest
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_TEMPLATE = (
+    "I need clear and detailed images for my product catalog. There should not be any visible brand signs "
+    "on the product but a clear depiction of its core property on a transparent background. "
+    "The product should be from a recent generation and should not be a specific model. "
+    "I need {title}: {text} {description}"
+)
+
+
+@dataclass
+class CatalogEntry:
+    """A catalog item whose image is served from the static directory."""
+
+    image_path: str
+    fields: Dict[str, Any]
+
+    def prompt(self, template: str) -> str:
+        values = {"title": "", "name": "", "text": "", "description": ""}
+        values.update({key: value for key, value in self.fields.items() if isinstance(value, (str, int, float))})
+        values["title"] = values["title"] or values["name"]
+        return " ".join(template.format(**values).split())
+
+
+def iter_catalog_entries(data: Any) -> Iterator[CatalogEntry]:
+    """
+    Walk a store data file and yield every entry that references a local static image.
+
+    Categories, their variations and nested products are all visited, so both the
+    `categories.json` layout and flat lists like `cars.json` are supported.
+    """
+    if isinstance(data, list):
+        for item in data:
+            yield from iter_catalog_entries(item)
+    elif isinstance(data, dict):
+        image = data.get("image")
+        if isinstance(image, str) and "/static/" in image:
+            yield CatalogEntry(image.partition("/static/")[2], data)
+        for value in data.values():
+            if isinstance(value, (list, dict)):
+                yield from iter_catalog_entries(value)
+
+
+def prompt_hash(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+
+
+class CatalogManifest:
+    """
+    Append-only JSON lines log of finished images.
+
+    Each completed image appends one line, so a crash loses at most the images
+    that were still in flight.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.done: Dict[str, str] = {}
+        if path.exists():
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A torn last line from a crashed run
+                        continue
+                    if record.get("status") == "done":
+                        self.done[record["image"]] = record["prompt_hash"]
+
+    def is_done(self, image: str, prompt: str) -> bool:
+        return self.done.get(image) == prompt_hash(prompt)
+
+    def record(self, image: str, prompt: str, status: str, latency: float, error: Optional[str] = None):
+        entry = {"image": image, "prompt_hash": prompt_hash(prompt), "status": status, "latency": round(latency, 3)}
+        if error:
+            entry["error"] = error
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+        if status == "done":
+            self.done[image] = entry["prompt_hash"]
+
+
+def plan(sources: List[Path], static_dir: Path, template: str, manifest: CatalogManifest, force: bool = False) -> List[ImageRequest]:
+    """Build one request per missing image, de-duplicating images shared by several entries."""
+    requests: Dict[str, ImageRequest] = {}
+    for source in sources:
+        with open(source, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        for entry in iter_catalog_entries(data):
+            if entry.image_path in requests:
+                continue
+            prompt = entry.prompt(template)
+            target = static_dir / entry.image_path
+            if target.exists() and not force:
+                # Keep existing images unless an earlier run generated them from a different prompt
+                if entry.image_path not in manifest.done or manifest.is_done(entry.image_path, prompt):
+                    continue
+            requests[entry.image_path] = ImageRequest(prompt=prompt, key=entry.image_path)
+    return list(requests.values())
+
+
+async def run(
+    requests: List[ImageRequest],
+    static_dir: Path,
+    manifest: CatalogManifest,
+    service: AsyncImageGenerationService,
+    post_processor=None
+) -> Dict[str, Any]:
+    """Generate all planned images, save them as they complete and return run statistics."""
+    latencies: List[float] = []
+    failed = 0
+    started = time.monotonic()
+
+    async for result in service.generate_many(requests):
+        target = static_dir / result.request.key
+        if result.ok:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            await asyncio.to_thread(service.generator.save_image, result.image_bytes, str(target), post_processor)
+            manifest.record(result.request.key, result.request.prompt, "done", result.latency)
+            latencies.append(result.latency)
+            logger.info("[%d/%d] %s in %.1fs", len(latencies) + failed, len(requests), result.request.key, result.latency)
+        else:
+            failed += 1
+            manifest.record(result.request.key, result.request.prompt, "failed", result.latency, str(result.error))
+
+    elapsed = time.monotonic() - started
+    stats = {"generated": len(latencies), "failed": failed, "elapsed_seconds": round(elapsed, 1)}
+    if latencies:
+        ordered = sorted(latencies)
+        stats.update({
+            "images_per_minute": round(len(latencies) / elapsed * 60, 2) if elapsed else None,
+            "latency_p50": round(statistics.median(ordered), 2),
+            "latency_p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+            "latency_max": round(ordered[-1], 2),
+        })
+    return stats
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Generate missing catalog images from the store data files.")
+    parser.add_argument("sources", nargs="+", type=Path, help="Store data files (categories.json, cars.json, ...)")
+    parser.add_argument("--static-dir", type=Path, default=Path("../realtime/static"), help="Directory the /static/ urls map to")
+    parser.add_argument("--template", default=DEFAULT_TEMPLATE, help="Prompt template using {title}, {name}, {text}, {description}")
+    parser.add_argument("--manifest", type=Path, default=None, help="Progress manifest (defaults to <static-dir>/catalog-manifest.jsonl)")
+    parser.add_argument("--concurrency", type=int, default=int(os.environ.get("IMAGE_BATCH_CONCURRENCY", "4")), help="Maximum images in flight")
+    parser.add_argument("--rpm", type=float, default=None, help="Maximum generation calls started per minute")
+    parser.add_argument("--force", action="store_true", help="Regenerate images that already exist")
+    parser.add_argument("--post-process", action="store_true", help="Create web variants of every generated image")
+    parser.add_argument("--dry-run", action="store_true", help="Only list the images that would be generated")
+    args = parser.parse_args()
+
+    manifest = CatalogManifest(args.manifest or args.static_dir / "catalog-manifest.jsonl")
+    requests = plan(args.sources, args.static_dir, args.template, manifest, args.force)
+    print(f"{len(requests)} image(s) to generate")
+    if args.dry_run or not requests:
+        for request in requests:
+            print(f"  {request.key}: {request.prompt}")
+        return
+
+    service = AsyncImageGenerationService(max_in_flight=args.concurrency, requests_per_minute=args.rpm)
+    post_processor = None
+    if args.post_process:
+        from postprocess import ImagePostProcessor
+        post_processor = ImagePostProcessor()
+    try:
+        stats = asyncio.run(run(requests, args.static_dir, manifest, service, post_processor))
+    finally:
+        if post_processor:
+            post_processor.close()
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    # Configure logging for standalone execution
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    main()
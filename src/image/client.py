@@ -0,0 +1,129 @@
+"""
+Shared Azure OpenAI Client Factory
+
+This module builds Azure OpenAI clients for the image modules. Clients are created
+lazily on first use, share a single HTTP connection pool, and use one credential per
+process whose tokens are cached until shortly before they expire.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import httpx
+from openai import AzureOpenAI, DefaultHttpxClient
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+COGNITIVE_SERVICES_SCOPE = "https://cognitiveservices.azure.com/.default"
+
+_lock = threading.RLock()
+_http_client: Optional[httpx.Client] = None
+_credential = None
+_token_providers: Dict[str, "CachedTokenProvider"] = {}
+_clients: Dict[Tuple[str, str, Optional[str]], AzureOpenAI] = {}
+
+
+def _get_credential():
+    """Create the process wide Azure credential on first use, following the project's authentication pattern."""
+    global _credential
+    with _lock:
+        if _credential is None:
+            from azure.identity import AzureDeveloperCliCredential, DefaultAzureCredential
+
+            if tenant_id := os.environ.get("AZURE_TENANT_ID"):
+                logger.info("Using AzureDeveloperCliCredential with tenant_id %s", tenant_id)
+                _credential = AzureDeveloperCliCredential(tenant_id=tenant_id, process_timeout=60)
+            else:
+                logger.info("Using DefaultAzureCredential")
+                _credential = DefaultAzureCredential()
+        return _credential
+
+
+class CachedTokenProvider:
+    """
+    Azure AD token provider that caches the token until it is about to expire.
+
+    The credential itself is only resolved when the first token is requested, so
+    constructing a client never pays for credential discovery.
+    """
+
+    def __init__(self, scope: str = COGNITIVE_SERVICES_SCOPE, refresh_margin: float = 300.0):
+        self.scope = scope
+        self.refresh_margin = refresh_margin
+        self._token: Optional[str] = None
+        self._expires_on = 0.0
+        self._lock = threading.Lock()
+
+    def __call__(self) -> str:
+        if self._token is not None and time.time() < self._expires_on - self.refresh_margin:
+            return self._token
+        with self._lock:
+            # Another thread may have refreshed the token while we waited for the lock
+            if self._token is None or time.time() >= self._expires_on - self.refresh_margin:
+                access_token = _get_credential().get_token(self.scope)
+                self._token = access_token.token
+                self._expires_on = float(access_token.expires_on)
+                logger.info("Acquired Azure AD token, valid for %.0f seconds", self._expires_on - time.time())
+            return self._token
+
+
+def get_token_provider(scope: str = COGNITIVE_SERVICES_SCOPE) -> CachedTokenProvider:
+    """Return the shared cached token provider for a scope."""
+    with _lock:
+        if scope not in _token_providers:
+            _token_providers[scope] = CachedTokenProvider(scope)
+        return _token_providers[scope]
+
+
+def get_http_client() -> httpx.Client:
+    """Return the HTTP client whose connection pool is shared by all Azure OpenAI clients."""
+    global _http_client
+    with _lock:
+        if _http_client is None:
+            max_connections = int(os.environ.get("AZURE_OPENAI_MAX_CONNECTIONS", "20"))
+            _http_client = DefaultHttpxClient(
+                limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+            )
+        return _http_client
+
+
+def get_client(endpoint: str, api_version: str, api_key: Optional[str] = None) -> AzureOpenAI:
+    """
+    Return a shared Azure OpenAI client for an endpoint.
+
+    Args:
+        endpoint: Azure OpenAI endpoint
+        api_version: API version
+        api_key: API key, Azure AD authentication is used if omitted
+
+    Returns:
+        AzureOpenAI: A client reused by every caller with the same endpoint and authentication
+    """
+    key = (endpoint, api_version, api_key)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    http_client = get_http_client()
+    with _lock:
+        if key not in _clients:
+            if api_key:
+                _clients[key] = AzureOpenAI(
+                    api_key=api_key,
+                    api_version=api_version,
+                    azure_endpoint=endpoint,
+                    http_client=http_client
+                )
+            else:
+                _clients[key] = AzureOpenAI(
+                    azure_ad_token_provider=get_token_provider(),
+                    api_version=api_version,
+                    azure_endpoint=endpoint,
+                    http_client=http_client
+                )
+            logger.info("Azure OpenAI client initialized for %s", endpoint)
+        return _clients[key]
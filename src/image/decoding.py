@@ -0,0 +1,89 @@
+"""
+Base64 Image Decoding Helpers
+
+The image APIs return every image as a base64 string inside the JSON response.
+These helpers decode them without keeping more copies in memory than needed:
+each base64 string is released as soon as it is decoded, and images can be
+decoded chunk by chunk straight to disk. Decoding runs sequentially, binascii
+holds the GIL so a thread pool would only add overhead.
+"""
+
+import base64
+import logging
+import os
+from typing import List, Optional, Union
+from pathlib import Path
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Number of base64 characters decoded per write, must be a multiple of 4
+CHUNK_CHARS = 4 * 256 * 1024
+
+
+def decode_b64_to_file(image_b64: str, filename: Union[str, Path]) -> int:
+    """
+    Decode a base64 string to a file in fixed size chunks.
+
+    Only one chunk of decoded bytes exists at a time, so the full decoded
+    image is never held in memory next to its base64 source.
+
+    Args:
+        image_b64: Base64 encoded image data
+        filename: Output filename
+
+    Returns:
+        int: Number of bytes written
+    """
+    written = 0
+    with open(filename, "wb") as f:
+        for start in range(0, len(image_b64), CHUNK_CHARS):
+            chunk = base64.b64decode(image_b64[start:start + CHUNK_CHARS])
+            f.write(chunk)
+            written += len(chunk)
+    return written
+
+
+def decode_b64_many(images_b64: List[Optional[str]]) -> List[bytes]:
+    """
+    Decode several base64 strings, releasing each one once it is decoded.
+
+    Every entry of images_b64 is set to None after decoding, so at any time
+    only the images decoded so far and the strings still waiting are held.
+
+    Args:
+        images_b64: Base64 encoded images, emptied in place
+
+    Returns:
+        list: Decoded images in input order
+    """
+    images = []
+    for index, image_b64 in enumerate(images_b64):
+        images_b64[index] = None
+        images.append(base64.b64decode(image_b64))
+        del image_b64
+    return images
+
+
+def decode_b64_many_to_files(
+    images_b64: List[Optional[str]],
+    filenames: List[Union[str, Path]]
+) -> List[str]:
+    """
+    Decode several base64 strings straight to disk, releasing each one once it is written.
+
+    Args:
+        images_b64: Base64 encoded images, emptied in place
+        filenames: Output filename for each image
+
+    Returns:
+        list: Absolute paths of the written files in input order
+    """
+    paths = []
+    for index, (image_b64, filename) in enumerate(zip(images_b64, filenames)):
+        images_b64[index] = None
+        size = decode_b64_to_file(image_b64, filename)
+        del image_b64
+        logger.info("Image saved to: %s (%d bytes)", filename, size)
+        paths.append(os.path.abspath(filename))
+    return paths
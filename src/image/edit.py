@@ -8,14 +8,17 @@ It follows the project's authentication patterns and Azure best practices.
 import os
 import base64
 import logging
-from typing import Optional, Union
+from contextlib import ExitStack
+from typing import Optional, Sequence, Union
 from pathlib import Path
 import requests
-from azure.identity import DefaultAzureCredential, AzureDeveloperCliCredential
-from azure.core.credentials import AzureKeyCredential
 from openai import AzureOpenAI
 from dotenv import load_dotenv
 
+from cache import ImageCache
+from client import get_client
+from decoding import decode_b64_to_file
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
@@ -28,11 +31,17 @@ class AzureImageEditor:
     Follows Azure best practices for security and error handling.
     """
     
-    def __init__(self):
-        """Initialize the Azure OpenAI client with appropriate authentication."""
+    def __init__(self, cache: Optional[ImageCache] = None):
+        """
+        Initialize the Azure OpenAI client with appropriate authentication.
+        
+        Args:
+            cache: Optional image cache, defaults to the cache configured by IMAGE_CACHE_DIR
+        """
+        self._client: Optional[AzureOpenAI] = None
         self._load_environment()
         self._setup_authentication()
-        self._initialize_client()
+        self.cache = cache if cache is not None else ImageCache.from_environment()
     
     def _load_environment(self):
         """Load environment variables from .env file in development."""
@@ -41,7 +50,7 @@ class AzureImageEditor:
             load_dotenv()
     
     def _setup_authentication(self):
-        """Setup authentication using the same pattern as other modules."""
+        """Read endpoint, key and deployment settings from the environment."""
         self.endpoint = os.environ.get("AZURE_OPENAI_ENDPOINT")
         self.api_key = os.environ.get("AZURE_API_KEY")
         self.api_version = os.environ.get("AZURE_OPENAI_API_VERSION", "2025-04-01-preview")
@@ -49,41 +58,17 @@ class AzureImageEditor:
         
         if not self.endpoint:
             raise ValueError("AZURE_OPENAI_ENDPOINT environment variable is required")
-        
-        # Use the same authentication pattern as other modules
-        if not self.api_key:
-            if tenant_id := os.environ.get("AZURE_TENANT_ID"):
-                logger.info("Using AzureDeveloperCliCredential with tenant_id %s", tenant_id)
-                self.credential = AzureDeveloperCliCredential(
-                    tenant_id=tenant_id, process_timeout=60
-                )
-            else:
-                logger.info("Using DefaultAzureCredential")
-                self.credential = DefaultAzureCredential()
-        else:
-            self.credential = AzureKeyCredential(self.api_key)
     
-    def _initialize_client(self):
-        """Initialize the Azure OpenAI client."""
-        try:
-            if isinstance(self.credential, AzureKeyCredential):
-                self.client = AzureOpenAI(
-                    api_key=self.credential.key,
-                    api_version=self.api_version,
-                    azure_endpoint=self.endpoint
-                )
-            else:
-                self.client = AzureOpenAI(
-                    azure_ad_token_provider=lambda: self.credential.get_token(
-                        "https://cognitiveservices.azure.com/.default"
-                    ).token,
-                    api_version=self.api_version,
-                    azure_endpoint=self.endpoint
-                )
-            logger.info("Azure OpenAI client initialized successfully")
-        except Exception as e:
-            logger.error("Failed to initialize Azure OpenAI client: %s", e)
-            raise
+    @property
+    def client(self) -> AzureOpenAI:
+        """The shared Azure OpenAI client, created on first use."""
+        if self._client is None:
+            self._client = get_client(self.endpoint, self.api_version, self.api_key)
+        return self._client
+    
+    @client.setter
+    def client(self, client: AzureOpenAI):
+        self._client = client
     
     def generate_image(
         self,
@@ -178,21 +163,27 @@ class AzureImageEditor:
             logger.error("Failed to save image: %s", e)
             raise
     
-    def edit_image(
+    def edit_images(
         self,
         prompt: str,
-        image_path: Union[str, Path],
-        image_path2: Union[str, Path],
-        output_file: str = "edited_image.png"
+        image_paths: Sequence[Union[str, Path]],
+        output_file: str = "edited_image.png",
+        mask_path: Optional[Union[str, Path]] = None,
+        size: Optional[str] = None
     ) -> Optional[str]:
         """
-        Edit an existing PNG image using Azure OpenAI's image edit API.
+        Edit or combine one or more images using Azure OpenAI's image edit API.
+
+        The input files are passed to the API as open file handles, so they are
+        streamed from disk during the upload instead of being read into memory.
+        The response is decoded straight into the output file.
 
         Args:
             prompt: Edit prompt
-            image_path: Path to the first image to edit (PNG)
-            image_path2: Path to the second image to edit (PNG)
+            image_paths: Paths to the images to edit or combine (PNG)
             output_file: Output filename for the edited image
+            mask_path: Optional mask (PNG) marking the area to edit in the first image
+            size: Optional output size (e.g., "1024x1024", "1024x1536")
 
         Returns:
             str: Path to the saved edited image, or None if failed
@@ -201,30 +192,84 @@ class AzureImageEditor:
             ValueError: If parameters are invalid
             Exception: If API call fails
         """
+        if not prompt:
+            raise ValueError("Prompt cannot be empty")
+
+        if not image_paths:
+            raise ValueError("At least one image is required")
+
+        for path in [*image_paths, *([mask_path] if mask_path else [])]:
+            if not os.path.exists(path):
+                raise ValueError(f"Image not found: {path}")
+
+        key = None
+        if self.cache:
+            key = ImageCache.make_key(
+                self.deployment_name, prompt, size=size, input_images=list(image_paths),
+                mask=ImageCache.make_key("mask", "", input_images=[mask_path]) if mask_path else None,
+                operation="edit"
+            )
+            if cached_path := self.cache.copy_to(key, output_file):
+                logger.info("Edited image served from cache: %s", cached_path)
+                return cached_path
+
+        optional_args = {}
+        if size:
+            optional_args["size"] = size
+
         try:
-            logger.info("Editing images using Azure OpenAI API...")
-            with open(image_path, "rb") as img1, open(image_path2, "rb") as img2:
+            logger.info("Editing %d image(s) using Azure OpenAI API...", len(image_paths))
+            with ExitStack() as stack:
+                images = [stack.enter_context(open(path, "rb")) for path in image_paths]
+                if mask_path:
+                    optional_args["mask"] = stack.enter_context(open(mask_path, "rb"))
                 result_edit = self.client.images.edit(
                     model=self.deployment_name,
-                    image=img1,
+                    image=images if len(images) > 1 else images[0],
                     prompt=prompt,
-                    # size="1024x1536"
+                    **optional_args
                 )
-                if result_edit.data and result_edit.data[0].b64_json:
-                    print(f"Image edit result: {result_edit.data[0].b64_json}"  )
-                    image_b64 = result_edit.data[0].b64_json
-                    image_bytes = base64.b64decode(image_b64)
-                    with open(output_file, "wb") as f:
-                        f.write(image_bytes)
-                    logger.info(f"Edited image saved to: {output_file}")
-                    return os.path.abspath(output_file)
-                else:
-                    logger.error("No image data returned from API")
-                    return None
+
+            if not result_edit.data or not result_edit.data[0].b64_json:
+                logger.error("No image data returned from API")
+                return None
+
+            size_written = decode_b64_to_file(result_edit.data[0].b64_json, output_file)
+            # Release the base64 payload right away instead of keeping it until the caller returns
+            del result_edit
+            logger.info("Edited image saved to: %s (%d bytes)", output_file, size_written)
+            if key:
+                self.cache.put_file(key, output_file)
+            return os.path.abspath(output_file)
         except Exception as e:
-            logger.error(f"Failed to edit image: {e}")
+            logger.error("Failed to edit image: %s", e)
             raise
 
+    def edit_image(
+        self,
+        prompt: str,
+        image_path: Union[str, Path],
+        image_path2: Optional[Union[str, Path]] = None,
+        output_file: str = "edited_image.png"
+    ) -> Optional[str]:
+        """
+        Edit an existing PNG image, optionally merging it with a second image.
+
+        Args:
+            prompt: Edit prompt
+            image_path: Path to the first image to edit (PNG)
+            image_path2: Optional path to a second image to combine with the first (PNG)
+            output_file: Output filename for the edited image
+
+        Returns:
+            str: Path to the saved edited image, or None if failed
+
+        Raises:
+            ValueError: If parameters are invalid
+            Exception: If API call fails
+        """
+        image_paths = [image_path] if image_path2 is None else [image_path, image_path2]
+        return self.edit_images(prompt, image_paths, output_file)
 
 def main():
     """
@@ -240,17 +285,17 @@ def main():
         editor = AzureImageEditor()
         # Example: Edit an existing PNG file
         image_path = "image_to_edit.png"
-        additional_path = "Subject.png"   # Path to your PNG file        # Path to your mask PNG file
+        additional_path = "Subject.png"   # Path to the subject PNG merged into the photo
         prompt = "Merge the photo with the subject"
         output_file = "edited_image.png"
-        if os.path.exists(image_path):
+        if os.path.exists(image_path) and os.path.exists(additional_path):
             edited_path = editor.edit_image(prompt, image_path, additional_path, output_file)
             if edited_path:
                 print(f"Edited image saved to: {edited_path}")
             else:
                 print("Failed to edit image")
         else:
-            print("Image or mask file not found. Skipping edit example.")
+            print("Image or subject file not found. Skipping edit example.")
             
     except Exception as e:
         logger.error("Error in main: %s", e)
@@ -266,4 +311,4 @@ if __name__ == "__main__":
     main()
 
 
-https://github.com/andreaskopp/visionary-lab/blob/main/notebooks/gpt-image-1.ipynb
\ No newline at end of file
+# Reference: https://github.com/andreaskopp/visionary-lab/blob/main/notebooks/gpt-image-1.ipynb
@@ -8,12 +8,17 @@ It follows the project's authentication patterns and Azure best practices.
 import os
 import base64
 import logging
-from typing import Optional
-from azure.identity import DefaultAzureCredential, AzureDeveloperCliCredential
-from azure.core.credentials import AzureKeyCredential
+from typing import TYPE_CHECKING, List, Optional
 from openai import AzureOpenAI
 from dotenv import load_dotenv
 
+from cache import ImageCache
+from client import get_client
+from decoding import decode_b64_many, decode_b64_many_to_files
+
+if TYPE_CHECKING:
+    from postprocess import ImagePostProcessor
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
@@ -26,11 +31,17 @@ class AzureImageGenerator:
     Follows Azure best practices for security and error handling.
     """
     
-    def __init__(self):
-        """Initialize the Azure OpenAI client with appropriate authentication."""
+    def __init__(self, cache: Optional[ImageCache] = None):
+        """
+        Initialize the Azure OpenAI client with appropriate authentication.
+        
+        Args:
+            cache: Optional image cache, defaults to the cache configured by IMAGE_CACHE_DIR
+        """
+        self._client: Optional[AzureOpenAI] = None
         self._load_environment()
         self._setup_authentication()
-        self._initialize_client()
+        self.cache = cache if cache is not None else ImageCache.from_environment()
     
     def _load_environment(self):
         """Load environment variables from .env file in development."""
@@ -39,49 +50,92 @@ class AzureImageGenerator:
             load_dotenv()
     
     def _setup_authentication(self):
-        """Setup authentication using the same pattern as other modules."""
-^        self.endpoint = os.environ.get("AZURE_IMAGE_GENERATE_ENDPOINT")
+        """Read endpoint, key and deployment settings from the environment."""
+        self.endpoint = os.environ.get("AZURE_IMAGE_GENERATE_ENDPOINT")
         self.api_key = os.environ.get("AZURE_API_KEY")
         self.api_version = os.environ.get("AZURE_OPENAI_API_VERSION", "2025-04-01-preview")
         self.deployment_name = os.environ.get("AZURE_OPENAI_IMAGE_DEPLOYMENT_NAME", "gpt-image-1")
         
         if not self.endpoint:
             raise ValueError("AZURE_IMAGE_GENERATE_ENDPOINT environment variable is required")
+    
+    @property
+    def client(self) -> AzureOpenAI:
+        """The shared Azure OpenAI client, created on first use."""
+        if self._client is None:
+            self._client = get_client(self.endpoint, self.api_version, self.api_key)
+        return self._client
+    
+    @client.setter
+    def client(self, client: AzureOpenAI):
+        self._client = client
+    
+    def _validate_parameters(
+        self,
+        prompt: str,
+        size: str,
+        quality: str,
+        output_format: str,
+        output_compression: int,
+        n: int
+    ):
+        """Validate image generation parameters, raising ValueError if invalid."""
+        if not prompt:
+            raise ValueError("Prompt cannot be empty")
         
-        # Use the same authentication pattern as other modules
-        if not self.api_key:
-            if tenant_id := os.environ.get("AZURE_TENANT_ID"):
-                logger.info("Using AzureDeveloperCliCredential with tenant_id %s", tenant_id)
-                self.credential = AzureDeveloperCliCredential(
-                    tenant_id=tenant_id, process_timeout=60
-                )
-            else:
-                logger.info("Using DefaultAzureCredential")
-                self.credential = DefaultAzureCredential()
-        else:
-            self.credential = AzureKeyCredential(self.api_key)
+        if size not in ["256x256", "512x512", "1024x1024", "1792x1024", "1024x1792"]:
+            raise ValueError(f"Invalid size: {size}")
+        
+        if quality not in ["standard", "hd", "medium"]:
+            raise ValueError(f"Invalid quality: {quality}")
+        
+        if output_format not in ["png", "jpeg"]:
+            raise ValueError(f"Invalid output format: {output_format}")
+        
+        if not 1 <= output_compression <= 100:
+            raise ValueError("Output compression must be between 1 and 100")
+        
+        if not 1 <= n <= 10:
+            raise ValueError("Number of images must be between 1 and 10")
     
-    def _initialize_client(self):
-        """Initialize the Azure OpenAI client."""
+    def _request_images(self, prompt: str, size: str, quality: str, n: int) -> List[str]:
+        """Call the image generation API and return the base64 payload of every image."""
         try:
-            if isinstance(self.credential, AzureKeyCredential):
-                self.client = AzureOpenAI(
-                    api_key=self.credential.key,
-                    api_version=self.api_version,
-                    azure_endpoint=self.endpoint
-                )
-            else:
-                self.client = AzureOpenAI(
-                    azure_ad_token_provider=lambda: self.credential.get_token(
-                        "https://cognitiveservices.azure.com/.default"
-                    ).token,
-                    api_version=self.api_version,
-                    azure_endpoint=self.endpoint
-                )
-            logger.info("Azure OpenAI client initialized successfully")
+            logger.info("Generating %d image(s) with prompt: %s", n, prompt)
+            
+            response = self.client.images.generate(
+                model=self.deployment_name,
+                prompt=prompt,
+                size=size,
+                quality=quality,
+                n=n
+            )
         except Exception as e:
-            logger.error("Failed to initialize Azure OpenAI client: %s", e)
+            logger.error("Failed to generate image: %s", e)
             raise
+        
+        images_b64 = [item.b64_json for item in (response.data or []) if item.b64_json]
+        if not images_b64:
+            logger.error("No image data returned from API")
+        return images_b64
+    
+    def _cache_keys(
+        self,
+        prompt: str,
+        size: str,
+        quality: str,
+        output_format: str,
+        output_compression: int,
+        n: int
+    ) -> List[str]:
+        """Return one cache key per image of a generation request."""
+        return [
+            ImageCache.make_key(
+                self.deployment_name, prompt, size, quality, output_format,
+                output_compression=output_compression, n=n, index=index
+            )
+            for index in range(n)
+        ]
     
     def generate_image(
         self,
@@ -110,57 +164,136 @@ class AzureImageGenerator:
             ValueError: If parameters are invalid
             Exception: If API call fails
         """
-        # Validate parameters
-        if not prompt:
-            raise ValueError("Prompt cannot be empty")
+        self._validate_parameters(prompt, size, quality, output_format, output_compression, n)
         
-        if size not in ["256x256", "512x512", "1024x1024", "1792x1024", "1024x1792"]:
-            raise ValueError(f"Invalid size: {size}")
+        key = None
+        if self.cache:
+            key = self._cache_keys(prompt, size, quality, output_format, output_compression, n)[0]
+            if (image_bytes := self.cache.get(key)) is not None:
+                logger.info("Image served from cache, size: %d bytes", len(image_bytes))
+                return image_bytes
         
-        if quality not in ["standard", "hd", "medium"]:
-            raise ValueError(f"Invalid quality: {quality}")
+        images_b64 = self._request_images(prompt, size, quality, n)
+        if not images_b64:
+            return None
         
-        if output_format not in ["png", "jpeg"]:
-            raise ValueError(f"Invalid output format: {output_format}")
+        # Return the first image as bytes
+        image_bytes = base64.b64decode(images_b64[0])
+        logger.info("Image generated successfully, size: %d bytes", len(image_bytes))
+        if key:
+            self.cache.put(key, image_bytes)
+        return image_bytes
+    
+    def generate_images(
+        self,
+        prompt: str,
+        size: str = "1024x1024",
+        quality: str = "medium",
+        output_format: str = "png",
+        output_compression: int = 100,
+        n: int = 1
+    ) -> List[bytes]:
+        """
+        Generate n images and return all of them.
         
-        if not 1 <= output_compression <= 100:
-            raise ValueError("Output compression must be between 1 and 100")
+        Each base64 payload is released as soon as it is decoded.
         
-        if not 1 <= n <= 10:
-            raise ValueError("Number of images must be between 1 and 10")
+        Args:
+            prompt: Text description of the image to generate
+            size: Image size (e.g., "1024x1024", "512x512")
+            quality: Image quality ("standard" or "hd")
+            output_format: Output format ("png" or "jpeg")
+            output_compression: Compression level (1-100)
+            n: Number of images to generate (1-10)
         
-        try:
-            logger.info("Generating image with prompt: %s", prompt)
-            
-            response = self.client.images.generate(
-                model=self.deployment_name,
-                prompt=prompt,
-                size=size,
-                quality=quality,
-                n=n
-            )
-            
-            if response.data:
-                # Return the first image as bytes
-                image_b64 = response.data[0].b64_json
-                image_bytes = base64.b64decode(image_b64)
-                logger.info("Image generated successfully, size: %d bytes", len(image_bytes))
-                return image_bytes
-            else:
-                logger.error("No image data returned from API")
-                return None
-                
-        except Exception as e:
-            logger.error("Failed to generate image: %s", e)
-            raise
+        Returns:
+            list: Image data as bytes for every generated image, empty if generation failed
+        
+        Raises:
+            ValueError: If parameters are invalid
+            Exception: If API call fails
+        """
+        self._validate_parameters(prompt, size, quality, output_format, output_compression, n)
+        
+        keys = []
+        if self.cache:
+            keys = self._cache_keys(prompt, size, quality, output_format, output_compression, n)
+            cached = [self.cache.get(key) for key in keys]
+            if all(image is not None for image in cached):
+                logger.info("Served %d image(s) from cache", n)
+                return cached
+        
+        images = decode_b64_many(self._request_images(prompt, size, quality, n))
+        logger.info("Generated %d image(s), total size: %d bytes", len(images), sum(len(i) for i in images))
+        for key, image_bytes in zip(keys, images):
+            self.cache.put(key, image_bytes)
+        return images
     
-    def save_image(self, image_bytes: bytes, filename: str) -> str:
+    def generate_images_to_files(
+        self,
+        prompt: str,
+        filename_pattern: str = "generated_image_{index}.png",
+        size: str = "1024x1024",
+        quality: str = "medium",
+        output_format: str = "png",
+        output_compression: int = 100,
+        n: int = 1
+    ) -> List[str]:
+        """
+        Generate n images and decode each one straight to disk.
+        
+        Decoded image bytes are written in chunks and never held in memory
+        as a whole, which keeps memory flat for large batches.
+        
+        Args:
+            prompt: Text description of the image to generate
+            filename_pattern: Output filename with an `{index}` placeholder
+            size: Image size (e.g., "1024x1024", "512x512")
+            quality: Image quality ("standard" or "hd")
+            output_format: Output format ("png" or "jpeg")
+            output_compression: Compression level (1-100)
+            n: Number of images to generate (1-10)
+        
+        Returns:
+            list: Full paths to the saved files
+        
+        Raises:
+            ValueError: If parameters are invalid
+            Exception: If API call fails
+        """
+        if "{index}" not in filename_pattern and n > 1:
+            raise ValueError("filename_pattern must contain {index} when generating more than one image")
+        self._validate_parameters(prompt, size, quality, output_format, output_compression, n)
+        
+        keys = []
+        if self.cache:
+            keys = self._cache_keys(prompt, size, quality, output_format, output_compression, n)
+            filenames = [filename_pattern.format(index=i) for i in range(n)]
+            # Stops at the first miss, the files copied so far are overwritten by the request below
+            if all(self.cache.copy_to(key, filename) for key, filename in zip(keys, filenames)):
+                logger.info("Served %d image(s) from cache", n)
+                return [os.path.abspath(filename) for filename in filenames]
+        
+        images_b64 = self._request_images(prompt, size, quality, n)
+        filenames = [filename_pattern.format(index=i) for i in range(len(images_b64))]
+        paths = decode_b64_many_to_files(images_b64, filenames)
+        for key, path in zip(keys, paths):
+            self.cache.put_file(key, path)
+        return paths
+    
+    def save_image(
+        self,
+        image_bytes: bytes,
+        filename: str,
+        post_processor: Optional["ImagePostProcessor"] = None
+    ) -> str:
         """
         Save image bytes to a file.
         
         Args:
             image_bytes: Image data as bytes
             filename: Output filename
+            post_processor: Optional post-processor that creates web variants of the saved image
         
         Returns:
             str: Full path to saved file
@@ -171,11 +304,13 @@ class AzureImageGenerator:
             
             abs_path = os.path.abspath(filename)
             logger.info("Image saved to: %s", abs_path)
-            return abs_path
         except Exception as e:
             logger.error("Failed to save image: %s", e)
             raise
-
+        
+        if post_processor is not None:
+            post_processor.submit(abs_path)
+        return abs_path
 
 def main():
     """
@@ -0,0 +1,232 @@
+"""
+Image Post-Processing Module
+
+This module turns generated catalog images into web friendly variants: resized
+copies, WebP/AVIF encodings and thumbnails. Images are processed in a process
+pool and a `variants.json` manifest is written next to the outputs so the stores
+can point their `image` fields at the right variant.
+"""
+
+import argparse
+import json
+import logging
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Iterable, Optional, Union
+
+from PIL import Image, features
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = "variants.json"
+
+# Variant name -> target width (None keeps the original size) and encodings, in order of preference
+DEFAULT_VARIANTS: Dict[str, Dict] = {
+    "full": {"width": None, "formats": ["avif", "webp"]},
+    "card": {"width": 512, "formats": ["avif", "webp"]},
+    "thumb": {"width": 160, "formats": ["webp"]},
+}
+
+_SAVE_OPTIONS = {
+    "webp": {"method": 6},
+    "avif": {"speed": 6},
+    "jpeg": {"optimize": True, "progressive": True},
+    "png": {"optimize": True},
+}
+
+
+def _format_supported(fmt: str) -> bool:
+    if fmt in ("webp", "avif"):
+        return bool(features.check(fmt))
+    return True
+
+
+def process_image(
+    source: Union[str, Path],
+    output_dir: Union[str, Path],
+    variants: Dict[str, Dict] = DEFAULT_VARIANTS,
+    quality: int = 80
+) -> Dict[str, Dict[str, str]]:
+    """
+    Produce all variants of a single image.
+
+    Outputs that are newer than the source are left untouched, so re-running the
+    pipeline over a catalog only processes new or regenerated images.
+
+    Args:
+        source: Path to the original image
+        output_dir: Directory to write the variants to
+        variants: Variant definitions, see DEFAULT_VARIANTS
+        quality: Encoder quality (1-100) for lossy formats
+
+    Returns:
+        dict: Variant name -> format -> output filename (relative to output_dir)
+    """
+    source = Path(source)
+    output_dir = Path(output_dir)
+    source_mtime = source.stat().st_mtime
+    result: Dict[str, Dict[str, str]] = {}
+
+    with Image.open(source) as original:
+        original.load()
+        for name, spec in variants.items():
+            width = spec.get("width")
+            image = original
+            if width and original.width > width:
+                image = original.copy()
+                image.thumbnail((width, round(original.height * width / original.width)), Image.LANCZOS)
+            for fmt in spec["formats"]:
+                if not _format_supported(fmt):
+                    logger.debug("Skipping %s encoding, not supported by this Pillow build", fmt)
+                    continue
+                filename = f"{source.stem}_{name}.{fmt}"
+                target = output_dir / filename
+                if not target.exists() or target.stat().st_mtime < source_mtime:
+                    encoded = image if fmt != "jpeg" or image.mode == "RGB" else image.convert("RGB")
+                    encoded.save(target, format=fmt.upper(), quality=quality, **_SAVE_OPTIONS.get(fmt, {}))
+                result.setdefault(name, {})[fmt] = filename
+
+    return result
+
+
+class ImagePostProcessor:
+    """
+    Process pool backed post-processing stage for generated images.
+
+    Use `submit` right after AzureImageGenerator.save_image, or `process` for a
+    whole directory. The manifest is merged and written when processing finishes.
+    """
+
+    def __init__(
+        self,
+        output_dir: Optional[Union[str, Path]] = None,
+        variants: Dict[str, Dict] = DEFAULT_VARIANTS,
+        quality: int = 80,
+        max_workers: Optional[int] = None
+    ):
+        """
+        Initialize the post-processor.
+
+        Args:
+            output_dir: Directory for the variants, defaults to the directory of each source image
+            variants: Variant definitions, see DEFAULT_VARIANTS
+            quality: Encoder quality (1-100) for lossy formats
+            max_workers: Size of the process pool, defaults to the number of CPUs
+        """
+        self.output_dir = Path(output_dir) if output_dir else None
+        self.variants = variants
+        self.quality = quality
+        self._executor = ProcessPoolExecutor(max_workers=max_workers)
+        self._manifests: Dict[Path, Dict[str, Dict]] = {}
+        self._pending: list = []
+        self._lock = Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _target_dir(self, source: Path) -> Path:
+        target = self.output_dir or source.parent
+        target.mkdir(parents=True, exist_ok=True)
+        return target
+
+    def _manifest(self, directory: Path) -> Dict[str, Dict]:
+        if directory not in self._manifests:
+            manifest_path = directory / MANIFEST_FILENAME
+            manifest = {}
+            if manifest_path.exists():
+                with open(manifest_path, "r") as f:
+                    manifest = json.load(f)
+            self._manifests[directory] = manifest
+        return self._manifests[directory]
+
+    def submit(self, source: Union[str, Path]) -> Future:
+        """
+        Queue an image for post-processing.
+
+        Args:
+            source: Path to the original image
+
+        Returns:
+            Future: Resolves to the variant mapping of the image
+        """
+        source = Path(source)
+        directory = self._target_dir(source)
+        future = self._executor.submit(process_image, source, directory, self.variants, self.quality)
+        with self._lock:
+            self._pending.append((future, source, directory))
+        return future
+
+    def process(self, sources: Iterable[Union[str, Path]]) -> int:
+        """
+        Post-process many images and write the manifests.
+
+        Args:
+            sources: Paths to the original images
+
+        Returns:
+            int: Number of images processed successfully
+        """
+        futures = [self.submit(source) for source in sources]
+        self.flush()
+        return sum(1 for future in futures if future.exception() is None)
+
+    def flush(self):
+        """Wait for queued images and write the updated manifests."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            if not pending:
+                return
+            for future, source, directory in pending:
+                if (error := future.exception()) is not None:
+                    logger.error("Failed to post-process %s: %s", source, error)
+                    continue
+                self._manifest(directory)[source.name] = future.result()
+            for directory, manifest in self._manifests.items():
+                tmp_path = directory / (MANIFEST_FILENAME + ".tmp")
+                with open(tmp_path, "w") as f:
+                    json.dump(manifest, f, indent=2, sort_keys=True)
+                os.replace(tmp_path, directory / MANIFEST_FILENAME)
+                logger.info("Wrote %d image variant entries to %s", len(manifest), directory / MANIFEST_FILENAME)
+
+    def close(self):
+        """Flush pending work and shut down the process pool."""
+        self.flush()
+        self._executor.shutdown()
+
+
+def main():
+    """
+    Post-process every PNG/JPEG image in a directory.
+
+    Example:
+        python postprocess.py ../realtime/static/cars
+    """
+    parser = argparse.ArgumentParser(description="Create resized WebP/AVIF variants of catalog images.")
+    parser.add_argument("directory", help="Directory containing the generated images")
+    parser.add_argument("--output-dir", help="Directory for the variants (defaults to the input directory)")
+    parser.add_argument("--quality", type=int, default=80, help="Encoder quality for lossy formats")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes")
+    args = parser.parse_args()
+
+    sources = sorted(
+        path for path in Path(args.directory).iterdir()
+        if path.suffix.lower() in (".png", ".jpg", ".jpeg") and not path.stem.endswith(tuple(f"_{v}" for v in DEFAULT_VARIANTS))
+    )
+    with ImagePostProcessor(args.output_dir, quality=args.quality, max_workers=args.workers) as processor:
+        count = processor.process(sources)
+    print(f"Post-processed {count} of {len(sources)} images")
+
+
+if __name__ == "__main__":
+    # Configure logging for standalone execution
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    main()
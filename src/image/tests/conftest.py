@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The image modules import each other by module name, like the scripts do when run from src/image
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
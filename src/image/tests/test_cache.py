@@ -0,0 +1,68 @@
+from cache import ImageCache
+
+
+def test_put_and_get(tmp_path):
+    cache = ImageCache(tmp_path, max_bytes=100)
+    key = ImageCache.make_key("model", "a red car", size="1024x1024")
+    assert cache.get(key) is None
+    cache.put(key, b"image")
+    assert cache.get(key) == b"image"
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 1, "bytes": 5}
+
+
+def test_entry_larger_than_budget_is_not_cached(tmp_path):
+    cache = ImageCache(tmp_path, max_bytes=100)
+    assert cache.put("aa01", b"x" * 101) is None
+    assert not cache._path("aa01").exists()
+    assert cache.stats()["bytes"] == 0
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ImageCache(tmp_path, max_bytes=100)
+    cache.put("aa01", b"a" * 40)
+    cache.put("bb01", b"b" * 40)
+    assert cache.get("aa01") is not None
+    cache.put("cc01", b"c" * 40)
+    assert cache.get("bb01") is None
+    assert cache.get("aa01") is not None and cache.get("cc01") is not None
+    assert cache.stats()["bytes"] == 80
+
+
+def test_replacing_an_entry_keeps_the_size_total(tmp_path):
+    cache = ImageCache(tmp_path, max_bytes=100)
+    cache.put("aa01", b"a" * 60)
+    cache.put("aa01", b"a" * 30)
+    assert cache.stats()["bytes"] == 30
+
+
+class RacingCache(ImageCache):
+    """Evicts every entry right after it was looked up, as another thread could."""
+
+    def get_path(self, key):
+        path = super().get_path(key)
+        if path is not None:
+            path.unlink()
+        return path
+
+
+def test_eviction_race_counts_as_a_miss(tmp_path):
+    cache = RacingCache(tmp_path, max_bytes=100)
+    cache.put("aa01", b"a" * 10)
+    assert cache.get("aa01") is None
+    cache.put("aa01", b"a" * 10)
+    assert cache.copy_to("aa01", tmp_path / "out.png") is None
+    assert not (tmp_path / "out.png").exists()
+    assert cache.stats()["hits"] == 0
+    assert cache.stats()["misses"] == 2
+
+
+def test_access_order_survives_a_restart(tmp_path):
+    cache = ImageCache(tmp_path, max_bytes=100)
+    cache.put("aa01", b"a" * 40)
+    cache.put("bb01", b"b" * 40)
+    cache.get("aa01")
+    cache.flush()
+    reopened = ImageCache(tmp_path, max_bytes=100)
+    reopened.put("cc01", b"c" * 40)
+    assert reopened.get("bb01") is None
+    assert reopened.get("aa01") is not None
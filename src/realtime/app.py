@@ -1,47 +1,43 @@
+from backend.startup import create_credential, profiler
+
 import logging
 import os
 from pathlib import Path
-from aiohttp import web
-from azure.core.credentials import AzureKeyCredential
-from azure.identity import AzureDeveloperCliCredential, DefaultAzureCredential
-from dotenv import load_dotenv
 
-from backend.tools import _get_available_categories_tool_schema, _get_product_variants_by_category_tool_schema, _get_product_models_by_variant_schema, _get_products_tool_schema, _show_product_categories_tool_schema, _show_product_information_tool_schema, _show_product_models_tool_schema, Tool
-from backend.rtmt import RTMiddleTier
+with profiler.track("import:aiohttp"):
+    from aiohttp import web
+
+with profiler.track("import:backend"):
+    from backend.tools import _get_available_categories_tool_schema, _get_product_variants_by_category_tool_schema, _get_product_models_by_variant_schema, _get_products_tool_schema, _show_product_categories_tool_schema, _show_product_information_tool_schema, _show_product_models_tool_schema, Tool
+    from backend.logs import configure_logging
+    from backend.rtmt import RTMiddleTier
+    from backend.staticfiles import StaticAssets
 
-from reportstore.filedb import FileDBStore
+with profiler.track("import:reportstore"):
+    from reportstore.catalog import create_catalog_store
 
-logging.basicConfig(level=logging.INFO)
+configure_logging()
 logger = logging.getLogger("voicerag")
 
 async def create_app():
     if not os.environ.get("RUNNING_IN_PRODUCTION"):
         logger.info("Running in development mode, loading from .env file")
+        from dotenv import load_dotenv
         load_dotenv()
     llm_endpoint = os.environ.get("AZURE_OPENAI_ENDPOINT")
     llm_deployment = os.environ.get("AZURE_OPENAI_COMPLETION_DEPLOYMENT_NAME")
     llm_key = os.environ.get("AZURE_OPENAI_API_KEY")
 
-    credential = None
+    llm_credential = create_credential(llm_key)
 
-    store: FileDBStore = None
-    
-    if not llm_key:
-        if tenant_id := os.environ.get("AZURE_TENANT_ID"):
-            logger.info(
-                "Using AzureDeveloperCliCredential with tenant_id %s", tenant_id)
-            credential = AzureDeveloperCliCredential(
-                tenant_id=tenant_id, process_timeout=60)
-        else:
-            logger.info("Using DefaultAzureCredential")
-            credential = DefaultAzureCredential()
-    llm_credential = AzureKeyCredential(llm_key) if llm_key else credential
-
-    fileDB = FileDBStore()  
-    
     app = web.Application()
 
-    rtmt = RTMiddleTier(llm_endpoint, llm_deployment, llm_credential)
+    # FileDBStore unless CATALOG_STORE selects the Cosmos DB backed catalog, see reportstore/catalog.py
+    with profiler.track("store"):
+        fileDB = create_catalog_store(app)
+
+    with profiler.track("rtmt"):
+        rtmt = RTMiddleTier(llm_endpoint, llm_deployment, llm_credential)
 
     rtmt.system_message = (
         "You are a helpful assistant that maintains a conversation with the user, while helping the user to make a choice for a car.\n"
@@ -58,26 +54,38 @@ async def create_app():
     rtmt.tools["get_available_categories"] = Tool(
         schema=_get_available_categories_tool_schema,
         target=lambda args: fileDB.get_available_categories(args),
+        blocking=False,
+        cache_ttl=300,
+        speculative_args=(),
     )
     rtmt.tools["get_product_variants_by_category"] = Tool(
         schema=_get_product_variants_by_category_tool_schema,
         target=lambda args: fileDB.get_product_variants_by_category(args),
+        blocking=False,
+        cache_ttl=300,
+        speculative_args=("category",),
     )
     rtmt.tools["get_product_models_by_variant"] = Tool(
         schema=_get_product_models_by_variant_schema,
         target=lambda args: fileDB.get_product_models_by_variant(args),
+        blocking=False,
+        cache_ttl=300,
+        speculative_args=(),
     )
     rtmt.tools["show_product_information"] = Tool(
         schema=_show_product_information_tool_schema,
         target=lambda args: fileDB.show_product_information(args),
+        blocking=False,
     )
     rtmt.tools["show_product_categories"] = Tool(
         schema=_show_product_categories_tool_schema,
         target=lambda args: fileDB.show_product_categories(args),
+        blocking=False,
     )
     rtmt.tools["show_product_models"] = Tool(
         schema=_show_product_models_tool_schema,
         target=lambda args: fileDB.show_product_models(args),
+        blocking=False,
     )
     
         
@@ -91,12 +99,13 @@ async def create_app():
     if not static_directory.exists():
         raise FileNotFoundError("Static directory not found at expected path: {}".format(static_directory))
 
-    # Serve index.html at root
-    async def index(request):
-        return web.FileResponse(static_directory / 'index.html')
+    # Serve index.html at root from memory and static files precompressed with content hashed urls
+    with profiler.track("static_assets"):
+        static_assets = StaticAssets(static_directory)
+    static_assets.attach_to_app(app, index='index.html')
 
-    app.router.add_get('/', index)
-    app.router.add_static('/static/', path=str(static_directory), name='static')
+    # Reports time to ready with STARTUP_PROFILE=1, see backend/startup.py
+    app.on_startup.append(profiler.on_startup)
 
     return app
 
@@ -1,45 +1,42 @@
+from backend.startup import create_credential, profiler
+
 import logging
 import os
 from pathlib import Path
-from aiohttp import web
-from azure.core.credentials import AzureKeyCredential
-from azure.identity import AzureDeveloperCliCredential, DefaultAzureCredential
-from dotenv import load_dotenv
 
-from backend.tools import _show_final_details_tool_schema, _show_product_information_tool_schema,_get_available_locations_tool_schema, _get_available_models_tool_schema, Tool
-from backend.rtmt import RTMiddleTier
+with profiler.track("import:aiohttp"):
+    from aiohttp import web
+
+with profiler.track("import:backend"):
+    from backend.tools import _show_final_details_tool_schema, _show_product_information_tool_schema,_get_available_locations_tool_schema, _get_available_models_tool_schema, Tool
+    from backend.logs import configure_logging
+    from backend.rtmt import RTMiddleTier
+    from backend.staticfiles import StaticAssets
 
-from reportstore.rentaldb import RentalDBStore
+with profiler.track("import:reportstore"):
+    from reportstore.rentaldb import RentalDBStore
 
-logging.basicConfig(level=logging.INFO)
+configure_logging()
 logger = logging.getLogger("voicerag")
 
 async def create_app():
     if not os.environ.get("RUNNING_IN_PRODUCTION"):
         logger.info("Running in development mode, loading from .env file")
+        from dotenv import load_dotenv
         load_dotenv()
     llm_endpoint = os.environ.get("AZURE_OPENAI_ENDPOINT")
     llm_deployment = os.environ.get("AZURE_OPENAI_COMPLETION_DEPLOYMENT_NAME")
     llm_key = os.environ.get("AZURE_OPENAI_API_KEY")
 
-    credential = None
-   
-    if not llm_key:
-        if tenant_id := os.environ.get("AZURE_TENANT_ID"):
-            logger.info(
-                "Using AzureDeveloperCliCredential with tenant_id %s", tenant_id)
-            credential = AzureDeveloperCliCredential(
-                tenant_id=tenant_id, process_timeout=60)
-        else:
-            logger.info("Using DefaultAzureCredential")
-            credential = DefaultAzureCredential()
-    llm_credential = AzureKeyCredential(llm_key) if llm_key else credential
-
-    store = RentalDBStore()  
+    llm_credential = create_credential(llm_key)
+
+    with profiler.track("store"):
+        store = RentalDBStore()
     
     app = web.Application()
 
-    rtmt = RTMiddleTier(llm_endpoint, llm_deployment, llm_credential)
+    with profiler.track("rtmt"):
+        rtmt = RTMiddleTier(llm_endpoint, llm_deployment, llm_credential)
 
     rtmt.system_message = (
         "You are a helpful assistant working in a car rental company and are tasked to help the user make a rental car choice.\n"
@@ -54,21 +51,30 @@ async def create_app():
     rtmt.tools["get_available_locations"] = Tool(
         schema=_get_available_locations_tool_schema,
         target=lambda args: store.get_available_locations(args),
+        blocking=False,
+        cache_ttl=300,
+        speculative_args=("prefered_location",),
     )
     rtmt.tools["get_available_cars"] = Tool(
         schema=_get_available_models_tool_schema,
         target=lambda args: store.get_available_cars(args),
+        blocking=False,
+        speculative_args=("prefered_location", "pickup_date", "return_date"),
     )
     rtmt.tools["show_model_information"] = Tool(
         schema=_show_product_information_tool_schema,
         target=lambda args: store.show_product_information(args),
+        blocking=False,
     )
     rtmt.tools["show_final_details"] = Tool(
         schema=_show_final_details_tool_schema,
         target=lambda args: store.show_final_details(args),
+        blocking=False,
     )  
         
     rtmt.attach_to_app(app, "/realtime")
+    # Writes the bookings still queued on shutdown
+    app.on_cleanup.append(store.on_cleanup)
 
     # Serve static files and index.html
     current_directory = Path(__file__).parent  # Points to 'app' directory
@@ -78,12 +84,13 @@ async def create_app():
     if not static_directory.exists():
         raise FileNotFoundError("Static directory not found at expected path: {}".format(static_directory))
 
-    # Serve index.html at root
-    async def index(request):
-        return web.FileResponse(static_directory / 'index.html')
+    # Serve index.html at root from memory and static files precompressed with content hashed urls
+    with profiler.track("static_assets"):
+        static_assets = StaticAssets(static_directory)
+    static_assets.attach_to_app(app, index='index.html')
 
-    app.router.add_get('/', index)
-    app.router.add_static('/static/', path=str(static_directory), name='static')
+    # Reports time to ready with STARTUP_PROFILE=1, see backend/startup.py
+    app.on_startup.append(profiler.on_startup)
 
     return app
 
@@ -0,0 +1,218 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Optional
+from backend.sharedstate import InMemorySharedState, SharedState
+
+logger = logging.getLogger("admission")
+
+class AdmissionRejected(Exception):
+    retry_after: float
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.retry_after = retry_after
+
+class Admission:
+    def __init__(self, controller: "AdmissionController", session_id: str):
+        self.controller = controller
+        self.session_id = session_id
+        self.admitted_at = time.monotonic()
+        self._heartbeat: Optional[asyncio.Task] = None
+
+    async def _keep_registered(self):
+        # Keep the session alive in the shared registry, sessions of a crashed replica expire after session_ttl
+        while True:
+            await asyncio.sleep(self.controller.session_ttl / 3)
+            try:
+                await self.controller.state.refresh_session(self.session_id, self.controller.session_ttl)
+            except Exception as e:
+                logger.warning("Failed to refresh session registration: %s", e)
+
+    async def __aenter__(self):
+        if self.controller.global_max_sessions is not None:
+            self._heartbeat = asyncio.create_task(self._keep_registered())
+        return self
+
+    async def __aexit__(self, *exc_info):
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+        await self.controller.release(self)
+
+class AdmissionController:
+    # Limits concurrent realtime sessions per worker and globally. Sessions over the limit wait in
+    # a bounded FIFO queue for up to queue_timeout seconds and are rejected with a retry hint after
+    # that, or right away when the queue is full. Upstream throttling shrinks the per-worker
+    # capacity multiplicatively, every successful upstream connect grows it back by one. The global
+    # limit, the session start rate and upstream throttling are shared through the SharedState backend
+    # so every replica behind the ingress enforces the same limits.
+
+    max_sessions: int
+    global_max_sessions: Optional[int]
+    max_sessions_per_minute: Optional[int]
+    max_waiting: int
+    queue_timeout: float
+    min_sessions: int
+    session_ttl: float = 120.0
+    capacity: int
+    active: int = 0
+
+    def __init__(self, max_sessions: int = 50, global_max_sessions: Optional[int] = None, max_waiting: int = 20,
+                 queue_timeout: float = 10.0, min_sessions: int = 1, max_sessions_per_minute: Optional[int] = None,
+                 state: Optional[SharedState] = None):
+        self.max_sessions = max_sessions
+        self.global_max_sessions = global_max_sessions
+        self.max_sessions_per_minute = max_sessions_per_minute
+        self.max_waiting = max_waiting
+        self.queue_timeout = queue_timeout
+        self.min_sessions = min_sessions
+        self.capacity = max_sessions
+        self.state = state or InMemorySharedState()
+        self._waiters: deque[asyncio.Future] = deque()
+        self._throttled_until = 0.0
+        self.stats = {"admitted": 0, "queued": 0, "rejected": 0, "upstream_throttled": 0}
+
+    @classmethod
+    def from_environment(cls, state: Optional[SharedState] = None) -> "AdmissionController":
+        global_max = os.environ.get("REALTIME_GLOBAL_MAX_SESSIONS")
+        per_minute = os.environ.get("REALTIME_MAX_SESSIONS_PER_MINUTE")
+        return cls(
+            max_sessions=int(os.environ.get("REALTIME_MAX_SESSIONS", "50")),
+            global_max_sessions=int(global_max) if global_max else None,
+            max_waiting=int(os.environ.get("REALTIME_MAX_WAITING", "20")),
+            queue_timeout=float(os.environ.get("REALTIME_QUEUE_TIMEOUT", "10")),
+            max_sessions_per_minute=int(per_minute) if per_minute else None,
+            state=state,
+        )
+
+    def _reject(self, reason: str, retry_after: Optional[float] = None) -> AdmissionRejected:
+        self.stats["rejected"] += 1
+        if retry_after is None:
+            retry_after = max(1.0, self.queue_timeout / 2)
+        logger.warning("Rejecting session: %s (retry after %.0fs)", reason, retry_after, extra={"event": "admission_rejected", "sample_every": 10})
+        return AdmissionRejected(reason, retry_after)
+
+    async def acquire(self, session_id: str) -> Admission:
+        # session_id must be generated by the server, the registry counts every id once
+        now = time.monotonic()
+        if now < self._throttled_until:
+            raise self._reject("upstream is throttling", self._throttled_until - now)
+        try:
+            shared_until = await self.state.cache_get("throttled_until")
+        except Exception as e:
+            # Admit on the local view rather than failing every new session while the store is down
+            logger.warning("Failed to read shared upstream throttling: %s", e)
+            shared_until = None
+        if shared_until:
+            # Another replica was throttled, back off for as long as it was told to
+            remaining = float(shared_until) - time.time()
+            if remaining > 0:
+                self._throttled_until = now + remaining
+                raise self._reject("upstream is throttling", remaining)
+
+        if self.active >= self.capacity or self._waiters:
+            if len(self._waiters) >= self.max_waiting:
+                raise self._reject("worker at capacity")
+            await self._wait_for_slot()
+        else:
+            self.active += 1
+
+        registered = False
+        try:
+            if self.global_max_sessions is not None:
+                registered = await self._register(session_id)
+                if registered is False:
+                    raise self._reject("global session limit reached")
+            # Counted last, so sessions rejected for capacity don't use up the start rate
+            if self.max_sessions_per_minute is not None and await self._count_start() > self.max_sessions_per_minute:
+                raise self._reject("session start rate exceeded", 60 - time.time() % 60)
+        except BaseException:
+            if registered:
+                await self._unregister(session_id)
+            self._release_slot()
+            raise
+
+        self.stats["admitted"] += 1
+        return Admission(self, session_id)
+
+    async def _register(self, session_id: str) -> Optional[bool]:
+        # None if the shared state is unreachable, the session is then only held to the worker limit
+        try:
+            return await self.state.register_session(session_id, self.global_max_sessions, self.session_ttl)
+        except Exception as e:
+            logger.warning("Failed to register session for the global limit: %s", e)
+            return None
+
+    async def _count_start(self) -> int:
+        try:
+            return await self.state.incr("session_starts", 60)
+        except Exception as e:
+            logger.warning("Failed to count the session start rate: %s", e)
+            return 0
+
+    async def _unregister(self, session_id: str):
+        try:
+            await self.state.unregister_session(session_id)
+        except Exception:
+            logger.exception("Failed to unregister session %s", session_id)
+
+    async def _wait_for_slot(self):
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.stats["queued"] += 1
+        try:
+            done, _ = await asyncio.wait({waiter}, timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed to us just as we got cancelled, pass it on
+                self._release_slot()
+            else:
+                waiter.cancel()
+            raise
+        if not done:
+            waiter.cancel()
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+            raise self._reject("timed out waiting for a free session slot")
+
+    def _release_slot(self):
+        # Hand the slot straight to the next live waiter, otherwise free it
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                if self.active <= self.capacity:
+                    waiter.set_result(None)
+                    return
+                self._waiters.appendleft(waiter)
+                break
+        self.active -= 1
+
+    async def release(self, admission: Admission):
+        if self.global_max_sessions is not None:
+            await self._unregister(admission.session_id)
+        self._release_slot()
+
+    async def report_throttled(self, retry_after: Optional[float] = None):
+        self.stats["upstream_throttled"] += 1
+        self.capacity = max(self.min_sessions, int(self.capacity * 0.75))
+        logger.warning("Upstream throttled, reducing session capacity to %d", self.capacity)
+        if retry_after:
+            self._throttled_until = max(self._throttled_until, time.monotonic() + retry_after)
+            try:
+                await self.state.cache_set("throttled_until", str(time.time() + retry_after), retry_after)
+            except Exception as e:
+                logger.warning("Failed to share upstream throttling: %s", e)
+
+    def report_success(self):
+        if self.capacity < self.max_sessions and time.monotonic() >= self._throttled_until:
+            self.capacity += 1
+            # Let a queued session take the slot we just regained
+            while self._waiters and self.active < self.capacity:
+                waiter = self._waiters.popleft()
+                if not waiter.done():
+                    self.active += 1
+                    waiter.set_result(None)
@@ -0,0 +1,152 @@
+import base64
+import os
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING, Any, Optional
+from backend.startup import profiler
+
+if TYPE_CHECKING:
+    import numpy as np
+
+def _load_numpy():
+    # numpy is only imported once a gate is configured, so it costs nothing at startup when it is off
+    global np
+    if "np" not in globals():
+        try:
+            with profiler.track("import:numpy"):
+                import numpy as np
+        except ImportError:
+            raise RuntimeError("REALTIME_AUDIO_GATE requires the numpy package") from None
+
+# The realtime API's input format is 24kHz mono PCM16
+SAMPLE_RATE = 24000
+
+@dataclass(frozen=True)
+class AudioGateSettings:
+    # REALTIME_AUDIO_GATE=drop holds back input audio that contains no speech instead of relaying
+    # it upstream, =thin still relays every thin_every-th silent chunk. Audio counts as speech when
+    # the RMS of any frame reaches threshold (full scale 1.0, the same scale as VAD_THRESHOLD in
+    # app.js). The last pre_roll seconds of silence are sent ahead of speech so its onset isn't cut,
+    # and hangover seconds of silence follow it so the server VAD can still detect the end of a turn.
+
+    mode: str = "drop"
+    threshold: float = 0.01
+    pre_roll: float = 0.3
+    hangover: float = 0.8
+    thin_every: int = 10
+    frame: float = 0.02
+
+    @classmethod
+    def from_environment(cls) -> Optional["AudioGateSettings"]:
+        mode = os.environ.get("REALTIME_AUDIO_GATE", "off").lower()
+        if mode in ("", "off", "0", "false", "no"):
+            return None
+        if mode not in ("drop", "thin"):
+            raise ValueError(f"REALTIME_AUDIO_GATE must be off, drop or thin, not {mode}")
+        _load_numpy()
+        return cls(
+            mode=mode,
+            threshold=float(os.environ.get("REALTIME_AUDIO_GATE_THRESHOLD", str(cls.threshold))),
+            pre_roll=int(os.environ.get("REALTIME_AUDIO_GATE_PRE_ROLL_MS", str(int(cls.pre_roll * 1000)))) / 1000,
+            hangover=int(os.environ.get("REALTIME_AUDIO_GATE_HANGOVER_MS", str(int(cls.hangover * 1000)))) / 1000,
+            thin_every=int(os.environ.get("REALTIME_AUDIO_GATE_THIN_EVERY", str(cls.thin_every))),
+        )
+
+@dataclass
+class AudioGateStats:
+    chunks: int = 0
+    forwarded_chunks: int = 0
+    seconds: float = 0.0
+    forwarded_seconds: float = 0.0
+    bytes: int = 0
+    forwarded_bytes: int = 0
+
+    def add(self, other: "AudioGateStats"):
+        for name, value in asdict(other).items():
+            setattr(self, name, getattr(self, name) + value)
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            **asdict(self),
+            "seconds": round(self.seconds, 3),
+            "forwarded_seconds": round(self.forwarded_seconds, 3),
+            "dropped_chunks": self.chunks - self.forwarded_chunks,
+            "dropped_seconds": round(self.seconds - self.forwarded_seconds, 3),
+        }
+
+class AudioGate:
+    # Gate state of one session. Time is measured in audio rather than on the wall clock, so a
+    # replayed recording is gated exactly like the live session was.
+
+    settings: AudioGateSettings
+    stats: AudioGateStats
+
+    def __init__(self, settings: AudioGateSettings):
+        _load_numpy()
+        self.settings = settings
+        self.pre_roll = settings.pre_roll
+        self.hangover = settings.hangover
+        self.stats = AudioGateStats()
+        self._frame_samples = max(1, int(SAMPLE_RATE * settings.frame))
+        self._clock = 0.0
+        self._open_until = 0.0
+        self._evicted = 0
+        self._held: deque[tuple[str, float, int]] = deque()
+        self._held_seconds = 0.0
+
+    def follow_turn_detection(self, turn_detection: dict):
+        # Never hold back more than the server VAD needs: its prefix padding has to be in the pre-roll
+        # and its silence duration has to pass before the gate closes, or turns would never end
+        padding = turn_detection.get("prefix_padding_ms")
+        silence = turn_detection.get("silence_duration_ms")
+        if isinstance(padding, (int, float)):
+            self.pre_roll = max(self.settings.pre_roll, padding / 1000)
+        if isinstance(silence, (int, float)):
+            self.hangover = max(self.settings.hangover, silence / 1000 + 2 * self.settings.frame)
+
+    def is_speech(self, samples: "np.ndarray") -> bool:
+        count = len(samples) - len(samples) % self._frame_samples or len(samples)
+        if count == 0:
+            return False
+        frames = samples[:count].reshape(-1, min(count, self._frame_samples)).astype(np.float32) / 32768.0
+        energy = np.mean(frames * frames, axis=1)
+        return bool((energy >= self.settings.threshold * self.settings.threshold).any())
+
+    def feed(self, audio: str) -> list[str]:
+        # Takes the base64 audio of one input_audio_buffer.append, returns the audio to relay in order
+        pcm = base64.b64decode(audio)
+        samples = np.frombuffer(pcm, dtype="<i2", count=len(pcm) // 2)
+        seconds = len(samples) / SAMPLE_RATE
+        self.stats.chunks += 1
+        self.stats.seconds += seconds
+        self.stats.bytes += len(pcm)
+        start = self._clock
+        self._clock += seconds
+
+        if self.is_speech(samples):
+            self._open_until = self._clock + self.hangover
+        if start < self._open_until:
+            released = list(self._held)
+            self._held.clear()
+            self._held_seconds = 0.0
+            released.append((audio, seconds, len(pcm)))
+            return self._forward(released)
+
+        self._held.append((audio, seconds, len(pcm)))
+        self._held_seconds += seconds
+        thinned = []
+        while self._held and self._held_seconds - self._held[0][1] >= self.pre_roll:
+            evicted = self._held.popleft()
+            self._held_seconds -= evicted[1]
+            # Silence leaving the pre-roll is dropped, thin mode relays every thin_every-th chunk of it
+            self._evicted += 1
+            if self.settings.mode == "thin" and self._evicted % self.settings.thin_every == 0:
+                thinned.append(evicted)
+        return self._forward(thinned)
+
+    def _forward(self, chunks: list[tuple[str, float, int]]) -> list[str]:
+        for _, seconds, size in chunks:
+            self.stats.forwarded_chunks += 1
+            self.stats.forwarded_seconds += seconds
+            self.stats.forwarded_bytes += size
+        return [audio for audio, _, _ in chunks]
@@ -0,0 +1,142 @@
+import asyncio
+import base64
+import os
+from dataclasses import asdict, dataclass
+from typing import Any, Awaitable, Callable, Optional
+from backend.codec import JsonCodec, codec
+from backend.eventfilter import event_type
+
+# Event type -> (field holding the delta, True if it is base64 audio)
+DELTA_FIELDS = {
+    "response.audio.delta": ("delta", True),
+    "response.audio_transcript.delta": ("delta", False),
+}
+
+@dataclass(frozen=True)
+class CoalescerSettings:
+    # REALTIME_COALESCE_WINDOW_MS > 0 merges audio and transcript deltas of the same content part
+    # into one event for up to window seconds, or until max_bytes of delta are pending. Larger
+    # windows mean fewer frames for the browser to parse and more latency before audio plays.
+
+    window: float = 0.04
+    max_bytes: int = 32 * 1024
+
+    @classmethod
+    def from_environment(cls) -> Optional["CoalescerSettings"]:
+        window = int(os.environ.get("REALTIME_COALESCE_WINDOW_MS", "0"))
+        if window <= 0:
+            return None
+        return cls(window=window / 1000, max_bytes=int(os.environ.get("REALTIME_COALESCE_MAX_BYTES", str(cls.max_bytes))))
+
+@dataclass
+class CoalescerStats:
+    events: int = 0
+    deltas: int = 0
+    frames: int = 0
+    flushed_by_size: int = 0
+
+    def add(self, other: "CoalescerStats"):
+        for name, value in asdict(other).items():
+            setattr(self, name, getattr(self, name) + value)
+
+    def snapshot(self) -> dict[str, Any]:
+        return {**asdict(self), "frames_saved": self.events - self.frames}
+
+class _Pending:
+    __slots__ = ("text", "message", "field", "audio", "parts", "size")
+
+    def __init__(self, text: str, message: dict, field: str, audio: bool):
+        self.text = text
+        self.message = message
+        self.field = field
+        self.audio = audio
+        self.parts: list[str] = []
+        self.size = 0
+
+    def add(self, delta: str):
+        self.parts.append(delta)
+        self.size += len(delta)
+
+    def merged(self, json_codec: JsonCodec) -> str:
+        if len(self.parts) == 1:
+            return self.text
+        if self.audio:
+            # base64 strings can't be concatenated unless every part is a multiple of 3 bytes
+            self.message[self.field] = base64.b64encode(b"".join(base64.b64decode(part) for part in self.parts)).decode("ascii")
+        else:
+            self.message[self.field] = "".join(self.parts)
+        return json_codec.dumps(self.message)
+
+class DeltaCoalescer:
+    # Sits in front of a session's client socket. Deltas wait for the window to pass and leave as
+    # one event per content part, any other event first flushes what is pending so deltas never
+    # overtake the events that follow them. Audio and transcript deltas of a response arrive
+    # interleaved, they are buffered side by side rather than flushing each other.
+
+    settings: CoalescerSettings
+    stats: CoalescerStats
+
+    def __init__(self, settings: CoalescerSettings, deliver: Callable[[str], Awaitable[None]], json_codec: Optional[JsonCodec] = None):
+        self.settings = settings
+        self.stats = CoalescerStats()
+        self.codec = json_codec or codec
+        self._deliver = deliver
+        self._pending: dict[tuple, _Pending] = {}
+        self._timer: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    async def push(self, text: str):
+        self.stats.events += 1
+        kind, message = event_type(text, self.codec)
+        delta_field = DELTA_FIELDS.get(kind)
+        if delta_field is not None and message is None:
+            message = self.codec.loads(text)
+        delta = message.get(delta_field[0]) if delta_field is not None else None
+        if not isinstance(delta, str):
+            async with self._lock:
+                await self._flush()
+                await self._send(text)
+            return
+
+        field, audio = delta_field
+        self.stats.deltas += 1
+        key = (kind, message.get("response_id"), message.get("item_id"), message.get("content_index"))
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = self._pending[key] = _Pending(text, message, field, audio)
+        pending.add(delta)
+        if pending.size >= self.settings.max_bytes:
+            self.stats.flushed_by_size += 1
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def flush(self):
+        async with self._lock:
+            await self._flush()
+
+    async def _flush(self):
+        # Only called with the lock held, so a flush in progress can't be overtaken by later events
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending = list(self._pending.values())
+        self._pending.clear()
+        for entry in pending:
+            await self._send(entry.merged(self.codec))
+
+    def close(self):
+        # Drops whatever is pending, the session is over
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._pending.clear()
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.settings.window)
+        self._timer = None
+        await self.flush()
+
+    async def _send(self, message: str):
+        self.stats.frames += 1
+        await self._deliver(message)
@@ -0,0 +1,74 @@
+import json
+import logging
+import os
+from typing import IO, Any, Optional
+from aiohttp import WSMsgType
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger("codec")
+
+class JsonCodec:
+    # JSON encoding used by the relay, the tools and the stores. The stdlib implementation is the
+    # default, JSON_CODEC=orjson (or auto, when installed) switches to orjson.
+
+    name: str = "stdlib"
+    # True if dumps_bytes is the native output and dumps has to decode it
+    bytes_native: bool = False
+
+    def loads(self, data: str | bytes) -> Any:
+        return json.loads(data)
+
+    def dumps(self, obj: Any) -> str:
+        return json.dumps(obj)
+
+    def dumps_bytes(self, obj: Any) -> bytes:
+        return json.dumps(obj).encode("utf-8")
+
+    def load(self, file: IO) -> Any:
+        return json.load(file)
+
+class OrjsonCodec(JsonCodec):
+    name = "orjson"
+    bytes_native = True
+    _options = orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+
+    def __init__(self):
+        if orjson is None:
+            raise RuntimeError("JSON_CODEC=orjson requires the orjson package")
+
+    def loads(self, data: str | bytes) -> Any:
+        return orjson.loads(data)
+
+    def dumps(self, obj: Any) -> str:
+        return self.dumps_bytes(obj).decode("utf-8")
+
+    def dumps_bytes(self, obj: Any) -> bytes:
+        try:
+            return orjson.dumps(obj, option=self._options)
+        except TypeError:
+            # e.g. integers beyond 64 bit, which the stdlib encoder handles
+            return json.dumps(obj).encode("utf-8")
+
+    def load(self, file: IO) -> Any:
+        return orjson.loads(file.read())
+
+def create_codec(name: Optional[str] = None) -> JsonCodec:
+    name = (name or os.environ.get("JSON_CODEC", "auto")).lower()
+    if name == "orjson" or (name == "auto" and orjson is not None):
+        return OrjsonCodec()
+    return JsonCodec()
+
+# Process wide codec, import this rather than the json module
+codec = create_codec()
+
+async def send_json(ws: Any, obj: Any, json_codec: Optional[JsonCodec] = None):
+    # Sends obj as a text frame, handing bytes straight to the websocket when the codec produces them
+    json_codec = json_codec or codec
+    if json_codec.bytes_native and hasattr(ws, "send_frame"):
+        await ws.send_frame(json_codec.dumps_bytes(obj), WSMsgType.TEXT)
+    else:
+        await ws.send_str(json_codec.dumps(obj))
@@ -0,0 +1,88 @@
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Optional
+from backend.codec import JsonCodec, OrjsonCodec, orjson
+from backend.eventbench import CLIENT_SAMPLES, SERVER_SAMPLES
+from backend.eventfilter import CLIENT_EVENT_RULES, SERVER_EVENT_RULES, EventFilter
+
+# Relay throughput per JSON codec: a conversation shaped mix of events pushed through the relay's
+# event filters, and catalog sized tool results encoded for the model:
+#   python -m backend.codecbench [--seconds 2] [--json]
+
+# Relative frequency of each event in a typical spoken turn with one tool call
+_MIX = {
+    "response.audio.delta": 60,
+    "response.audio_transcript.delta": 30,
+    "input_audio_buffer.append": 100,
+    "session.created": 1,
+    "session.update": 1,
+    "response.output_item.added": 2,
+    "conversation.item.created": 2,
+    "response.function_call_arguments.delta": 10,
+    "response.function_call_arguments.done": 1,
+    "response.output_item.done": 2,
+    "response.done": 1,
+}
+
+_CATALOG = Path(__file__).parent.parent / "reportstore" / "cars.json"
+
+def _relay_throughput(json_codec: JsonCodec, seconds: float) -> float:
+    filters = {"client": EventFilter(CLIENT_EVENT_RULES, json_codec), "server": EventFilter(SERVER_EVENT_RULES, json_codec)}
+    events = []
+    for kind, weight in _MIX.items():
+        direction, text = ("client", CLIENT_SAMPLES[kind]) if kind in CLIENT_SAMPLES else ("server", SERVER_SAMPLES[kind])
+        events.extend([(filters[direction], text)] * weight)
+    count = 0
+    deadline = time.perf_counter() + seconds
+    started = time.perf_counter()
+    while time.perf_counter() < deadline:
+        for event_filter, text in events:
+            _, message, output = event_filter.apply(text)
+            if message is not None and output is None:
+                # Handlers answer dropped tool events upstream
+                json_codec.dumps_bytes({"type": "conversation.item.create", "item": {"type": "function_call_output", "call_id": "c1", "output": ""}})
+        count += len(events)
+    return count / (time.perf_counter() - started)
+
+def _encode_throughput(json_codec: JsonCodec, payload: object, seconds: float) -> float:
+    count = 0
+    deadline = time.perf_counter() + seconds
+    started = time.perf_counter()
+    while time.perf_counter() < deadline:
+        json_codec.dumps(payload)
+        count += 1
+    return count / (time.perf_counter() - started)
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description="Compare relay throughput across JSON codecs.")
+    parser.add_argument("--seconds", type=float, default=2.0, help="Duration of each measurement")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args(argv)
+
+    codecs = [JsonCodec()] + ([OrjsonCodec()] if orjson is not None else [])
+    with open(_CATALOG, "r", encoding="utf-8") as file:
+        catalog = json.load(file) * 25
+    results = {}
+    for json_codec in codecs:
+        results[json_codec.name] = {
+            "relay_events_per_second": round(_relay_throughput(json_codec, args.seconds)),
+            "tool_results_per_second": round(_encode_throughput(json_codec, catalog, args.seconds)),
+        }
+    baseline = results["stdlib"]
+    for name, result in results.items():
+        result["relay_speedup"] = round(result["relay_events_per_second"] / baseline["relay_events_per_second"], 2)
+        result["tool_result_speedup"] = round(result["tool_results_per_second"] / baseline["tool_results_per_second"], 2)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    if orjson is None:
+        print("orjson is not installed, only the stdlib codec was measured")
+    print(f"{'codec':<8} {'relay events/s':>15} {'speedup':>8} {'tool results/s':>15} {'speedup':>8}")
+    for name, r in results.items():
+        print(f"{name:<8} {r['relay_events_per_second']:>15} {r['relay_speedup']:>8} {r['tool_results_per_second']:>15} {r['tool_result_speedup']:>8}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import argparse
+import base64
+import json
+import os
+import timeit
+from typing import Optional
+from backend.eventfilter import CLIENT_EVENT_RULES, SERVER_EVENT_RULES, EventFilter
+
+# Micro-benchmark of the relay's event filter per event type, against parsing every event which is
+# what the relay did before the rule tables:
+#   python -m backend.eventbench [--number 20000] [--json]
+
+_AUDIO = base64.b64encode(os.urandom(4800)).decode("ascii")  # 100ms of 24kHz PCM16
+
+def _event(**fields) -> str:
+    return json.dumps(fields)
+
+CLIENT_SAMPLES = {
+    "response.audio.delta": _event(type="response.audio.delta", event_id="e1", response_id="r1", item_id="i1", output_index=0, content_index=0, delta=_AUDIO),
+    "response.audio_transcript.delta": _event(type="response.audio_transcript.delta", event_id="e2", response_id="r1", item_id="i1", output_index=0, content_index=0, delta="Hello"),
+    "session.created": _event(type="session.created", event_id="e3", session={"id": "s1", "instructions": "You are a helpful assistant." * 20, "tools": [{"type": "function", "name": "t"}], "tool_choice": "auto", "max_response_output_tokens": 4096}),
+    "response.output_item.added": _event(type="response.output_item.added", event_id="e4", response_id="r1", output_index=0, item={"id": "i2", "type": "function_call", "call_id": "c1", "name": "get_available_categories", "arguments": ""}),
+    "conversation.item.created": _event(type="conversation.item.created", event_id="e5", previous_item_id="i1", item={"id": "i2", "type": "function_call", "call_id": "c1", "name": "get_available_categories", "arguments": ""}),
+    "response.function_call_arguments.delta": _event(type="response.function_call_arguments.delta", event_id="e6", response_id="r1", item_id="i2", output_index=0, call_id="c1", delta='{"cat'),
+    "response.function_call_arguments.done": _event(type="response.function_call_arguments.done", event_id="e7", response_id="r1", item_id="i2", output_index=0, call_id="c1", arguments='{"category": "ovens"}'),
+    "response.output_item.done": _event(type="response.output_item.done", event_id="e8", response_id="r1", output_index=0, item={"id": "i2", "type": "message", "role": "assistant", "content": []}),
+    "response.done": _event(type="response.done", event_id="e9", response={"id": "r1", "status": "completed", "output": [
+        {"id": "i1", "type": "message", "role": "assistant", "content": [{"type": "audio", "transcript": "Hello there"}]},
+        {"id": "i2", "type": "function_call", "call_id": "c1", "name": "get_available_categories", "arguments": "{}"},
+    ], "usage": {"total_tokens": 120}}),
+}
+
+SERVER_SAMPLES = {
+    "input_audio_buffer.append": _event(type="input_audio_buffer.append", audio=_AUDIO),
+    "session.update": _event(type="session.update", session={"turn_detection": {"type": "server_vad", "threshold": 0.7}}),
+}
+
+def run(number: int) -> list[dict]:
+    results = []
+    for direction, rules, samples in (("to_client", CLIENT_EVENT_RULES, CLIENT_SAMPLES), ("to_server", SERVER_EVENT_RULES, SERVER_SAMPLES)):
+        event_filter = EventFilter(rules)
+        for kind, text in samples.items():
+            filtered = min(timeit.repeat(lambda: event_filter.apply(text), number=number, repeat=3)) / number
+            parsed = min(timeit.repeat(lambda: json.loads(text), number=number, repeat=3)) / number
+            rule, _, output = event_filter.apply(text)
+            results.append({
+                "direction": direction,
+                "event": kind,
+                "bytes": len(text),
+                "rule": rule is not None,
+                "forwarded": output is not None,
+                "filter_us": round(filtered * 1e6, 3),
+                "parse_us": round(parsed * 1e6, 3),
+            })
+    return results
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description="Micro-benchmark the realtime event filter per event type.")
+    parser.add_argument("--number", type=int, default=20000, help="Iterations per measurement")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args(argv)
+    results = run(args.number)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'direction':<10} {'event':<40} {'bytes':>7} {'rule':>5} {'fwd':>5} {'filter us':>10} {'parse us':>10}")
+    for r in results:
+        print(f"{r['direction']:<10} {r['event']:<40} {r['bytes']:>7} {str(r['rule']):>5} {str(r['forwarded']):>5} {r['filter_us']:>10} {r['parse_us']:>10}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import re
+from dataclasses import dataclass
+from typing import Any, Optional
+from backend.codec import JsonCodec, codec
+
+# Leading "type" member of an event, anchored so a nested "type" can never match
+_LEADING_TYPE = re.compile(r'\{\s*"type"\s*:\s*"([^"\\]*)"')
+
+@dataclass(frozen=True)
+class EventRule:
+    # What the relay does with one event type. Rules are data so the tables below can be read at a
+    # glance; EventFilter compiles them once and decides per rule how much parsing an event needs.
+
+    # Don't forward the event
+    drop: bool = False
+    # Only apply the rule when message["item"]["type"] is one of these, other events pass unchanged
+    item_types: Optional[frozenset[str]] = None
+    # Fields to overwrite before forwarding, e.g. {"session": {"instructions": ""}}
+    mask: Optional[dict[str, dict[str, Any]]] = None
+    # (container, list, types): remove entries of these types from message[container][list]
+    prune: Optional[tuple[str, str, frozenset[str]]] = None
+    # Name of the relay coroutine called with (message, session, other_ws), returns True if it changed the message
+    handler: Optional[str] = None
+
+    @property
+    def needs_parse(self) -> bool:
+        return not (self.drop and self.item_types is None and self.handler is None)
+
+def event_type(text: str, json_codec: JsonCodec = codec) -> tuple[Optional[str], Optional[dict]]:
+    # Realtime events lead with their type, read it without parsing the event. Returns the parsed
+    # message as well when the type had to be found the slow way.
+    match = _LEADING_TYPE.match(text)
+    if match is not None:
+        return match.group(1), None
+    message = json_codec.loads(text)
+    return (message.get("type") if isinstance(message, dict) else None), message
+
+class EventFilter:
+    # Applies a rule table to raw event text. Events without a rule are returned untouched without
+    # being parsed, dropped events without a condition or handler aren't parsed either, and events
+    # are only serialized again when a mask, prune or handler actually changed them.
+
+    rules: dict[str, EventRule]
+
+    def __init__(self, rules: dict[str, EventRule], json_codec: Optional[JsonCodec] = None):
+        self.rules = dict(rules)
+        self.codec = json_codec or codec
+
+    def apply(self, text: str) -> tuple[Optional[EventRule], Optional[dict], Optional[str]]:
+        # Returns (rule that applied, parsed message if any, text to forward or None to drop)
+        kind, message = event_type(text, self.codec)
+        rule = self.rules.get(kind)
+        if rule is None:
+            return None, message, text
+        if not rule.needs_parse:
+            return rule, message, None
+        if message is None:
+            message = self.codec.loads(text)
+        if rule.item_types is not None:
+            item = message.get("item")
+            if not isinstance(item, dict) or item.get("type") not in rule.item_types:
+                return None, message, text
+        changed = False
+        if rule.mask is not None:
+            for key, fields in rule.mask.items():
+                if isinstance(message.get(key), dict):
+                    message[key].update(fields)
+                    changed = True
+        if rule.prune is not None:
+            container_key, list_key, types = rule.prune
+            container = message.get(container_key)
+            if isinstance(container, dict) and isinstance(container.get(list_key), list):
+                entries = container[list_key]
+                kept = [entry for entry in entries if not (isinstance(entry, dict) and entry.get("type") in types)]
+                if len(kept) != len(entries):
+                    container[list_key] = kept
+                    changed = True
+        if rule.drop:
+            return rule, message, None
+        return rule, message, self.codec.dumps(message) if changed else text
+
+_FUNCTION_CALL = frozenset({"function_call"})
+
+# Events from the realtime API on their way to the browser
+CLIENT_EVENT_RULES: dict[str, EventRule] = {
+    # Hide the instructions, tools and max tokens from clients, if we ever allow client-side
+    # tools, this will need updating
+    "session.created": EventRule(mask={"session": {"instructions": "", "tools": [], "tool_choice": "none", "max_response_output_tokens": None}}),
+    "response.output_item.added": EventRule(drop=True, item_types=_FUNCTION_CALL, handler="_on_function_call_added"),
+    "conversation.item.created": EventRule(drop=True, item_types=frozenset({"function_call", "function_call_output"}), handler="_on_conversation_item_created"),
+    "response.function_call_arguments.delta": EventRule(drop=True, handler="_on_function_call_arguments_delta"),
+    "response.function_call_arguments.done": EventRule(drop=True),
+    "response.output_item.done": EventRule(drop=True, item_types=_FUNCTION_CALL, handler="_on_function_call_done"),
+    "response.done": EventRule(prune=("response", "output", _FUNCTION_CALL), handler="_on_response_done"),
+}
+
+# Events from the browser on their way to the realtime API
+SERVER_EVENT_RULES: dict[str, EventRule] = {
+    "session.update": EventRule(handler="_on_session_update"),
+}
+
+# Added to SERVER_EVENT_RULES when REALTIME_AUDIO_GATE is on, the handler relays the audio the gate lets through
+AUDIO_GATE_RULES: dict[str, EventRule] = {
+    "input_audio_buffer.append": EventRule(drop=True, handler="_on_input_audio_append"),
+}
@@ -0,0 +1,153 @@
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from typing import Optional
+
+# Id of the realtime session the current task is serving, inherited by every task the session spawns
+session_context: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("session_id", default=None)
+
+_STANDARD_ATTRIBUTES = set(logging.LogRecord("", 0, "", 0, "", None, None).__dict__) | {"message", "asctime"}
+
+class SessionContextFilter(logging.Filter):
+    # Only ever set by the relay to the id it generated, ids sent by the client are logged as
+    # client_request_id so they can't be mistaken for or collide with a session
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.session_id = session_context.get()
+        return True
+
+class SamplingFilter(logging.Filter):
+    # Keeps one out of every N records of a high frequency event. Callers tag records with
+    # extra={"event": "...", "sample_every": N}; LOG_SAMPLE_RATES="event=N,..." overrides N per event.
+
+    def __init__(self, overrides: Optional[dict[str, int]] = None):
+        super().__init__()
+        self.overrides = overrides or {}
+        self._counts: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        event = getattr(record, "event", None)
+        every = self.overrides.get(event, getattr(record, "sample_every", 1)) if event else 1
+        if every <= 1:
+            return True
+        with self._lock:
+            count = self._counts.get(event, 0)
+            self._counts[event] = count + 1
+        if count % every:
+            return False
+        record.sampled = every
+        return True
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    # Never blocks the caller: records are enqueued without formatting and dropped if the
+    # writer thread falls behind far enough to fill the queue. Drops are reported with a warning
+    # once the queue has room again, and on shutdown for whatever wasn't reported by then.
+
+    dropped: int = 0
+    reported: int = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return
+        if self.dropped > self.reported:
+            try:
+                self.queue.put_nowait(self.drop_record())
+            except queue.Full:
+                return
+            self.reported = self.dropped
+
+    def drop_record(self) -> logging.LogRecord:
+        record = logging.LogRecord("logs", logging.WARNING, __file__, 0, "Dropped %d log records, the log writer fell behind (%d since start)",
+                                   (self.dropped - self.reported, self.dropped), None)
+        record.event = "log_records_dropped"
+        record.session_id = None
+        return self.prepare(record)
+
+class StructuredFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRIBUTES and value is not None:
+                entry[key] = value
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s [%(session_id)s] %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        record.session_id = getattr(record, "session_id", None) or "-"
+        return super().format(record)
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[DroppingQueueHandler] = None
+
+def dropped_records() -> int:
+    # Log records dropped since configure_logging(), 0 if logging isn't queued
+    return _queue_handler.dropped if _queue_handler is not None else 0
+
+def _parse_sample_rates(value: str) -> dict[str, int]:
+    rates = {}
+    for item in value.split(","):
+        event, _, every = item.partition("=")
+        if event.strip() and every.strip().isdigit():
+            rates[event.strip()] = int(every)
+    return rates
+
+def configure_logging(level: Optional[str] = None, fmt: Optional[str] = None):
+    # Replaces the root handlers with a queue handler drained by a background thread, so log
+    # writes never stall the event loop. LOG_LEVEL and LOG_FORMAT (text|json) configure the output.
+    global _listener, _queue_handler
+    if _listener is not None:
+        return
+    level = level or os.environ.get("LOG_LEVEL", "INFO")
+    fmt = fmt or os.environ.get("LOG_FORMAT", "text")
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(StructuredFormatter() if fmt == "json" else TextFormatter())
+
+    queue_handler = DroppingQueueHandler(queue.Queue(maxsize=int(os.environ.get("LOG_QUEUE_SIZE", "10000"))))
+    queue_handler.addFilter(SamplingFilter(_parse_sample_rates(os.environ.get("LOG_SAMPLE_RATES", ""))))
+    queue_handler.addFilter(SessionContextFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _queue_handler = queue_handler
+    _listener = logging.handlers.QueueListener(queue_handler.queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_shutdown, stream_handler)
+
+def _shutdown(stream_handler: logging.Handler):
+    _listener.stop()
+    # The queue is drained, write the last drop count straight to the output
+    if _queue_handler.dropped > _queue_handler.reported:
+        stream_handler.handle(_queue_handler.drop_record())
+        _queue_handler.reported = _queue_handler.dropped
@@ -0,0 +1,81 @@
+import hashlib
+import os
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Optional
+from backend.codec import codec
+
+# Tools whose client result is the complete list of product cards to show
+CARD_TOOLS = frozenset({"show_product_categories", "show_product_models"})
+
+@dataclass(frozen=True)
+class ProductCardSettings:
+    # Product card lists go to the browser as diffs against the cards it already holds, on unless
+    # REALTIME_CARD_DIFF is false. The browser keeps at most cache_size cards, the server tells it
+    # which to drop.
+
+    cache_size: int = 500
+
+    @classmethod
+    def from_environment(cls) -> Optional["ProductCardSettings"]:
+        if os.environ.get("REALTIME_CARD_DIFF", "true").lower() not in ("1", "true", "yes"):
+            return None
+        return cls(cache_size=int(os.environ.get("REALTIME_CARD_CACHE_SIZE", str(cls.cache_size))))
+
+@dataclass
+class ProductCardStats:
+    updates: int = 0
+    cards: int = 0
+    sent: int = 0
+    evicted: int = 0
+
+    def add(self, other: "ProductCardStats"):
+        for name, value in asdict(other).items():
+            setattr(self, name, getattr(self, name) + value)
+
+    def snapshot(self) -> dict[str, Any]:
+        return {**asdict(self), "reused": self.cards - self.sent}
+
+def card_id(card: dict[str, Any]) -> str:
+    # Derived from the content, a card that changes gets a new id and is sent again
+    return hashlib.blake2b(codec.dumps_bytes(card), digest_size=8).hexdigest()
+
+class ProductCards:
+    # The cards one session's browser holds, least recently shown first. update() turns the full
+    # list a tool returned into the cards the browser doesn't have yet, the ones it should drop and
+    # the order of the ids to show.
+
+    def __init__(self, settings: ProductCardSettings):
+        self.settings = settings
+        self.stats = ProductCardStats()
+        self._known: OrderedDict[str, None] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._known)
+
+    def reset(self):
+        # The browser lost track, e.g. it resumed after messages were dropped from the replay buffer
+        self._known.clear()
+
+    def update(self, cards: list[dict[str, Any]]) -> dict[str, Any]:
+        order, added, shown = [], [], set()
+        for card in cards:
+            key = card_id(card)
+            if key in shown:
+                continue
+            shown.add(key)
+            if key in self._known:
+                self._known.move_to_end(key)
+            else:
+                self._known[key] = None
+                added.append({"id": key, **card})
+            order.append(key)
+        # Never evict what is about to be shown, even if the list alone exceeds the cache
+        removed = []
+        while len(self._known) > max(self.settings.cache_size, len(order)):
+            removed.append(self._known.popitem(last=False)[0])
+        self.stats.updates += 1
+        self.stats.cards += len(order)
+        self.stats.sent += len(added)
+        self.stats.evicted += len(removed)
+        return {"added": added, "removed": removed, "order": order}
@@ -0,0 +1,112 @@
+import base64
+import json
+import os
+import struct
+import time
+import uuid
+from dataclasses import dataclass
+from enum import IntEnum
+from pathlib import Path
+from typing import Any, BinaryIO, Iterator, Optional
+
+# File layout: MAGIC, a u32 length prefixed JSON header, then records until the end of the file.
+# Every record is a fixed RECORD header (direction, kind, seconds since the session started,
+# length of the JSON part, length of the raw audio part) followed by both parts. Audio events are
+# stored as their JSON envelope without the base64 field plus the decoded PCM bytes.
+MAGIC = b"RTREC\x01"
+RECORD = struct.Struct("<BBdII")
+
+class Direction(IntEnum):
+    CLIENT = 0     # message received from the browser
+    UPSTREAM = 1   # message received from the realtime API
+    TOOL = 2       # tool call executed by the relay, with its result and duration
+
+class Kind(IntEnum):
+    TEXT = 0
+    AUDIO = 1
+
+# Event type -> name of the field holding base64 audio
+AUDIO_FIELDS = {
+    "input_audio_buffer.append": "audio",
+    "response.audio.delta": "delta",
+}
+
+@dataclass
+class Record:
+    direction: Direction
+    timestamp: float
+    text: str
+
+class SessionRecorder:
+    # Append-only recorder for one session. Writes go to a buffered file and cost a memory copy
+    # on the hot path; only audio events are parsed, to store their payload as raw bytes.
+
+    path: Path
+    started: float
+
+    def __init__(self, path: Path, header: Optional[dict[str, Any]] = None, buffer_size: int = 256 * 1024):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.started = time.monotonic()
+        self._file: Optional[BinaryIO] = open(self.path, "wb", buffering=buffer_size)
+        header = json.dumps({"version": 1, "started_at": time.time(), **(header or {})}).encode("utf-8")
+        self._file.write(MAGIC + struct.pack("<I", len(header)) + header)
+
+    @classmethod
+    def from_environment(cls, session_id: str, header: Optional[dict[str, Any]] = None) -> Optional["SessionRecorder"]:
+        directory = os.environ.get("REALTIME_RECORDING_DIR")
+        if not directory:
+            return None
+        # The session id can come from a client header, it only goes into the header and never into the path
+        return cls(Path(directory) / f"{uuid.uuid4().hex}.rtrec", {"session_id": session_id, **(header or {})})
+
+    def record(self, direction: Direction, text: str):
+        if self._file is None:
+            return
+        timestamp = time.monotonic() - self.started
+        # Cheap substring check first, so only audio events pay for a parse
+        if '"input_audio_buffer.append"' in text or '"response.audio.delta"' in text:
+            message = json.loads(text)
+            field = AUDIO_FIELDS.get(message.get("type"))
+            if field and isinstance(message.get(field), str):
+                audio = base64.b64decode(message.pop(field))
+                envelope = json.dumps(message, separators=(",", ":")).encode("utf-8")
+                self._file.write(RECORD.pack(direction, Kind.AUDIO, timestamp, len(envelope), len(audio)) + envelope + audio)
+                return
+        data = text.encode("utf-8")
+        self._file.write(RECORD.pack(direction, Kind.TEXT, timestamp, len(data), 0) + data)
+
+    def record_tool(self, name: str, call_id: str, result: str, destination: int, duration: float):
+        self.record(Direction.TOOL, json.dumps({"name": name, "call_id": call_id, "result": result, "destination": destination, "duration": duration}))
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+def read_recording(path: Path) -> tuple[dict[str, Any], Iterator[Record]]:
+    # Returns the header and an iterator over the records, with audio re-encoded into the original JSON
+    file = open(path, "rb")
+    if file.read(len(MAGIC)) != MAGIC:
+        file.close()
+        raise ValueError(f"{path} is not a realtime recording")
+    (length,) = struct.unpack("<I", file.read(4))
+    header = json.loads(file.read(length))
+
+    def records() -> Iterator[Record]:
+        with file:
+            while chunk := file.read(RECORD.size):
+                if len(chunk) < RECORD.size:
+                    return  # Truncated tail of a recording that was still being written
+                direction, kind, timestamp, text_length, audio_length = RECORD.unpack(chunk)
+                text = file.read(text_length)
+                audio = file.read(audio_length)
+                if len(text) < text_length or len(audio) < audio_length:
+                    return
+                if kind == Kind.AUDIO:
+                    message = json.loads(text)
+                    message[AUDIO_FIELDS[message["type"]]] = base64.b64encode(audio).decode("ascii")
+                    yield Record(Direction(direction), timestamp, json.dumps(message))
+                else:
+                    yield Record(Direction(direction), timestamp, text.decode("utf-8"))
+    return header, records()
@@ -0,0 +1,177 @@
+import argparse
+import asyncio
+import cProfile
+import json
+import logging
+import os
+import statistics
+import time
+from collections import defaultdict, deque
+from pathlib import Path
+from typing import Optional
+import aiohttp
+from aiohttp import web
+from azure.core.credentials import AzureKeyCredential
+from backend.recording import Direction, Record, read_recording
+from backend.rtmt import RTMiddleTier
+from backend.tools import Tool, ToolResult, ToolResultDirection
+
+logger = logging.getLogger("replay")
+
+class RecordingReplay:
+    # Feeds a recording through a real RTMiddleTier: a local fake of the realtime API plays back the
+    # upstream messages, a websocket client plays back the browser messages and recorded tool results
+    # stand in for the tools, all on the original timeline divided by speed. Reports how long the
+    # relay took to forward each upstream event to the client.
+
+    records: list[Record]
+    speed: float
+
+    def __init__(self, path: Path, speed: float = 1.0):
+        self.header, records = read_recording(path)
+        self.records = list(records)
+        self.speed = speed
+        self._sent_at: dict[str, float] = {}
+        self.latencies: list[float] = []
+        self.received = 0
+
+    async def _sleep_until(self, start: float, timestamp: float):
+        delay = start + timestamp / self.speed - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _upstream_handler(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+
+        async def drain():
+            async for _ in ws:
+                pass
+
+        drainer = asyncio.create_task(drain())
+        start = time.monotonic()
+        for record in self.records:
+            if record.direction != Direction.UPSTREAM:
+                continue
+            await self._sleep_until(start, record.timestamp)
+            event_id = json.loads(record.text).get("event_id")
+            if event_id:
+                self._sent_at[event_id] = time.monotonic()
+            await ws.send_str(record.text)
+        # Stay connected until the replayed client ends the session
+        await drainer
+        return ws
+
+    def _build_relay(self, endpoint: str) -> RTMiddleTier:
+        relay = RTMiddleTier(endpoint, self.header.get("deployment", "replay"), AzureKeyCredential("replay"))
+        relay.tools = {}
+        results: dict[str, deque] = defaultdict(deque)
+        for record in self.records:
+            if record.direction == Direction.TOOL:
+                call = json.loads(record.text)
+                results[call["name"]].append(call)
+
+        def make_target(name: str):
+            async def target(args) -> ToolResult:
+                call = results[name].popleft()
+                await asyncio.sleep(call["duration"] / self.speed)
+                return ToolResult(call["result"], ToolResultDirection(call["destination"]))
+            return target
+
+        for name in results:
+            relay.tools[name] = Tool(target=make_target(name), schema={"type": "function", "name": name})
+        return relay
+
+    async def _play_client(self, url: str):
+        async with aiohttp.ClientSession() as session:
+            async with session.ws_connect(url) as ws:
+                async def receive():
+                    async for msg in ws:
+                        if msg.type != aiohttp.WSMsgType.TEXT:
+                            continue
+                        self.received += 1
+                        event_id = json.loads(msg.data).get("event_id")
+                        sent_at = self._sent_at.pop(event_id, None) if event_id else None
+                        if sent_at is not None:
+                            self.latencies.append(time.monotonic() - sent_at)
+
+                receiver = asyncio.create_task(receive())
+                start = time.monotonic()
+                for record in self.records:
+                    if record.direction == Direction.CLIENT:
+                        await self._sleep_until(start, record.timestamp)
+                        await ws.send_str(record.text)
+                # Let the rest of the upstream timeline play out, then end the session like the browser did
+                if self.records:
+                    await self._sleep_until(start, self.records[-1].timestamp)
+                await asyncio.sleep(0.1)
+                await ws.close()
+                await receiver
+
+    async def run(self) -> dict:
+        upstream = web.Application()
+        upstream.router.add_get("/openai/realtime", self._upstream_handler)
+        upstream_runner = web.AppRunner(upstream)
+        await upstream_runner.setup()
+        upstream_site = web.TCPSite(upstream_runner, "127.0.0.1", 0)
+        await upstream_site.start()
+        upstream_port = upstream_site._server.sockets[0].getsockname()[1]
+
+        relay_app = web.Application()
+        relay = self._build_relay(f"http://127.0.0.1:{upstream_port}")
+        relay.attach_to_app(relay_app, "/realtime")
+        relay_runner = web.AppRunner(relay_app)
+        await relay_runner.setup()
+        relay_site = web.TCPSite(relay_runner, "127.0.0.1", 0)
+        await relay_site.start()
+        relay_port = relay_site._server.sockets[0].getsockname()[1]
+
+        started = time.monotonic()
+        try:
+            await self._play_client(f"http://127.0.0.1:{relay_port}/realtime")
+        finally:
+            await relay_runner.cleanup()
+            await upstream_runner.cleanup()
+        elapsed = time.monotonic() - started
+
+        latencies = sorted(self.latencies)
+        counts = {direction.name.lower(): sum(1 for r in self.records if r.direction == direction) for direction in Direction}
+        return {
+            "session_id": self.header.get("session_id"),
+            "speed": self.speed,
+            "recorded_seconds": round(self.records[-1].timestamp, 3) if self.records else 0.0,
+            "replay_seconds": round(elapsed, 3),
+            "records": counts,
+            "received_by_client": self.received,
+            # REALTIME_AUDIO_GATE=drop python -m backend.replay ... shows what gating would have saved
+            "audio_gate": relay.audio_gate_stats.snapshot() if relay.audio_gate is not None else None,
+            "coalescing": relay.coalescing_stats.snapshot() if relay.coalescing is not None else None,
+            "product_cards": relay.product_card_stats.snapshot() if relay.product_cards is not None else None,
+            "relay_latency_ms": {
+                "p50": round(statistics.median(latencies) * 1000, 3) if latencies else None,
+                "p95": round(latencies[int(len(latencies) * 0.95)] * 1000, 3) if latencies else None,
+                "max": round(latencies[-1] * 1000, 3) if latencies else None,
+            },
+        }
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description="Replay a realtime session recording through the relay.")
+    parser.add_argument("recording", type=Path, help="Recording written by REALTIME_RECORDING_DIR")
+    parser.add_argument("--speed", type=float, default=1.0, help="Playback speed, e.g. 4 for four times faster")
+    parser.add_argument("--profile", type=Path, help="Write cProfile stats of the replay to this file")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    os.environ.pop("REALTIME_RECORDING_DIR", None)  # Don't record the replay itself
+
+    replay = RecordingReplay(args.recording, args.speed)
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler is not None:
+        profiler.enable()
+    summary = asyncio.run(replay.run())
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(args.profile)
+    print(json.dumps(summary, indent=2))
+
+if __name__ == "__main__":
+    main()
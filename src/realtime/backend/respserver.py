@@ -0,0 +1,146 @@
+import argparse
+import asyncio
+import logging
+import time
+from typing import Any, Optional
+
+logger = logging.getLogger("respserver")
+
+class RespStandIn:
+    # Local stand-in for the Redis commands used by RedisSharedState, so several replicas can be
+    # run and tested against shared state without a Redis server:
+    #   python -m backend.respserver --port 6379
+    #   SHARED_STATE_URL=redis://localhost:6379 python app.py
+
+    def __init__(self):
+        self._strings: dict[str, tuple[str, Optional[float]]] = {}
+        self._zsets: dict[str, dict[str, float]] = {}
+        self._server: Optional[asyncio.base_events.Server] = None
+        self._clients: set[asyncio.Task] = set()
+
+    def _get(self, key: str) -> Optional[str]:
+        entry = self._strings.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= time.monotonic():
+            del self._strings[key]
+            return None
+        return entry[0]
+
+    def _score(self, value: str) -> float:
+        return {"-inf": float("-inf"), "+inf": float("inf")}.get(value, None) or float(value)
+
+    def execute(self, command: list[str]) -> Any:
+        name, args = command[0].upper(), command[1:]
+        if name in ("PING", "AUTH", "SELECT"):
+            return "PONG" if name == "PING" else "OK"
+        if name == "GET":
+            return self._get(args[0])
+        if name == "SET":
+            expires = None
+            options = [a.upper() for a in args[2:]]
+            if "PX" in options:
+                expires = time.monotonic() + int(args[2 + options.index("PX") + 1]) / 1000
+            elif "EX" in options:
+                expires = time.monotonic() + int(args[2 + options.index("EX") + 1])
+            self._strings[args[0]] = (args[1], expires)
+            return "OK"
+        if name == "DEL":
+            return sum(1 for key in args if self._strings.pop(key, None) or self._zsets.pop(key, None))
+        if name == "INCR":
+            current = self._get(args[0])
+            expires = self._strings[args[0]][1] if current is not None else None
+            value = int(current or 0) + 1
+            self._strings[args[0]] = (str(value), expires)
+            return value
+        if name == "EXPIRE":
+            if self._get(args[0]) is None:
+                return 0
+            self._strings[args[0]] = (self._strings[args[0]][0], time.monotonic() + int(args[1]))
+            return 1
+        if name == "ZADD":
+            zset = self._zsets.setdefault(args[0], {})
+            only_existing = args[1].upper() == "XX"
+            pairs = args[2:] if only_existing else args[1:]
+            added = 0
+            for score, member in zip(pairs[::2], pairs[1::2]):
+                if only_existing and member not in zset:
+                    continue
+                added += member not in zset
+                zset[member] = float(score)
+            return added
+        if name == "ZREM":
+            zset = self._zsets.get(args[0], {})
+            return sum(1 for member in args[1:] if zset.pop(member, None) is not None)
+        if name == "ZCARD":
+            return len(self._zsets.get(args[0], {}))
+        if name == "ZREMRANGEBYSCORE":
+            zset = self._zsets.get(args[0], {})
+            low, high = self._score(args[1]), self._score(args[2])
+            removed = [member for member, score in zset.items() if low <= score <= high]
+            for member in removed:
+                del zset[member]
+            return len(removed)
+        return RuntimeError(f"ERR unknown command '{name}'")
+
+    @staticmethod
+    def _encode(reply: Any) -> bytes:
+        if reply is None:
+            return b"$-1\r\n"
+        if isinstance(reply, Exception):
+            return f"-{reply}\r\n".encode("utf-8")
+        if isinstance(reply, int):
+            return b":%d\r\n" % reply
+        if reply in ("OK", "PONG"):
+            return f"+{reply}\r\n".encode("utf-8")
+        data = str(reply).encode("utf-8")
+        return b"$%d\r\n%s\r\n" % (len(data), data)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        task = asyncio.current_task()
+        self._clients.add(task)
+        try:
+            while line := await reader.readline():
+                if not line.startswith(b"*"):
+                    continue
+                command = []
+                for _ in range(int(line[1:-2])):
+                    length = int((await reader.readline())[1:-2])
+                    command.append((await reader.readexactly(length + 2))[:-2].decode("utf-8"))
+                writer.write(self._encode(self.execute(command)))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # Cancelled by stop(), a cancelled handler task is reported as an error by asyncio
+            pass
+        finally:
+            self._clients.discard(task)
+            writer.close()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 6379) -> int:
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            # Connections stay open after the server closes, end their handlers too
+            for task in self._clients:
+                task.cancel()
+            await asyncio.gather(*self._clients, return_exceptions=True)
+            await self._server.wait_closed()
+
+async def _serve(host: str, port: int):
+    standin = RespStandIn()
+    port = await standin.start(host, port)
+    logger.info("RESP stand-in listening on %s:%d", host, port)
+    await asyncio.Event().wait()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the Redis commands used by the shared state backend.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6379)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_serve(args.host, args.port))
@@ -1,11 +1,32 @@
 import aiohttp
 import asyncio
+import hashlib
 import json
-from typing import Any, Callable, Optional
+import logging
+import math
+import os
+import time
+import uuid
+from typing import TYPE_CHECKING, Any, Callable, Optional
 from aiohttp import web
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
-from azure.core.credentials import AzureKeyCredential
-from backend.tools import Tool, ToolResult, ToolResultDirection, RTToolCall
+from backend.admission import AdmissionController, AdmissionRejected
+from backend.audiogate import AudioGate, AudioGateSettings, AudioGateStats
+from backend.coalescer import CoalescerSettings, CoalescerStats, DeltaCoalescer
+from backend.codec import codec, send_json
+from backend.eventfilter import AUDIO_GATE_RULES, CLIENT_EVENT_RULES, SERVER_EVENT_RULES, EventFilter
+from backend.logs import session_context
+from backend.productcards import CARD_TOOLS, ProductCards, ProductCardSettings, ProductCardStats
+from backend.recording import Direction, SessionRecorder
+from backend.sessions import RealtimeSession
+from backend.sharedstate import SharedState, create_shared_state
+from backend.startup import profiler
+from backend.toolruntime import ToolRuntime
+from backend.tools import Tool, ToolResult, ToolResultDirection, RTToolCall, SpeculativeToolCall
+
+if TYPE_CHECKING:
+    from azure.core.credentials import AzureKeyCredential, TokenCredential
+
+logger = logging.getLogger("rtmt")
 
 class RTMiddleTier:
     endpoint: str
@@ -24,122 +45,228 @@ class RTMiddleTier:
     max_tokens: Optional[int] = None
     disable_audio: Optional[bool] = None
 
-    _tools_pending = {}
+    # Limits concurrent sessions and adapts to upstream throttling, see backend/admission.py
+    admission: AdmissionController
+
+    # Session registry, rate counters and tool result cache shared by all replicas, see backend/sharedstate.py
+    state: SharedState
+
+    # Resumable sessions: after an unclean client disconnect the upstream connection is kept open for
+    # resume_grace_period seconds and the last replay_buffer_bytes sent to the client are kept, so a
+    # client reconnecting with its resume token continues the same conversation. 0 disables resumption.
+    resume_grace_period: float = 0.0
+    replay_buffer_bytes: int = 2 * 1024 * 1024
+    # Seconds between pings to the browser, a socket that doesn't answer is closed after half that,
+    # so a dropped network is noticed quickly. 0 disables the pings.
+    client_heartbeat: float = 10.0
+
+    # Start tools that declare speculative_args while the model is still streaming the call arguments
+    speculative_tools: bool = False
+
+    # Runs tool targets, sync and CPU bound ones off the event loop, and keeps per-tool stats
+    tool_runtime: ToolRuntime
+
+    # Holds back input audio without speech instead of relaying it upstream, see backend/audiogate.py
+    audio_gate: Optional[AudioGateSettings] = None
+
+    # Merges audio and transcript deltas on their way to the browser, see backend/coalescer.py
+    coalescing: Optional[CoalescerSettings] = None
+
+    # Sends product card lists as diffs against the cards the browser holds, see backend/productcards.py
+    product_cards: Optional[ProductCardSettings] = None
+
     _token_provider = None
 
-    def __init__(self, endpoint: str, deployment: str, credentials: AzureKeyCredential | DefaultAzureCredential):
+    def __init__(self, endpoint: str, deployment: str, credentials: "AzureKeyCredential | TokenCredential"):
         self.endpoint = endpoint
         self.deployment = deployment
-        if isinstance(credentials, AzureKeyCredential):
+        self.state = create_shared_state()
+        self.admission = AdmissionController.from_environment(self.state)
+        self.resume_grace_period = float(os.environ.get("REALTIME_RESUME_GRACE_PERIOD", "0"))
+        self.replay_buffer_bytes = int(os.environ.get("REALTIME_REPLAY_BUFFER_BYTES", str(self.replay_buffer_bytes)))
+        self.client_heartbeat = float(os.environ.get("REALTIME_CLIENT_HEARTBEAT", str(self.client_heartbeat)))
+        self._closing: set[asyncio.Task] = set()
+        self._sessions: dict[str, RealtimeSession] = {}
+        self.speculative_tools = os.environ.get("REALTIME_SPECULATIVE_TOOLS", "false").lower() in ("1", "true", "yes")
+        self.speculation_stats = {"started": 0, "used": 0, "discarded": 0, "failed": 0}
+        self.tool_runtime = ToolRuntime.from_environment()
+        self._client_events = EventFilter(CLIENT_EVENT_RULES)
+        self.audio_gate = AudioGateSettings.from_environment()
+        self.audio_gate_stats = AudioGateStats()
+        self.coalescing = CoalescerSettings.from_environment()
+        self.coalescing_stats = CoalescerStats()
+        self.product_cards = ProductCardSettings.from_environment()
+        self.product_card_stats = ProductCardStats()
+        self._server_events = EventFilter(SERVER_EVENT_RULES if self.audio_gate is None else {**SERVER_EVENT_RULES, **AUDIO_GATE_RULES})
+        self._warm_up_task: Optional[asyncio.Task] = None
+        if isinstance(getattr(credentials, "key", None), str):
             self.key = credentials.key
         else:
+            from azure.identity import get_bearer_token_provider
             self._token_provider = get_bearer_token_provider(credentials, "https://cognitiveservices.azure.com/.default")
-            self._token_provider() # Warm up during startup so we have a token cached when the first request arrives
-
-    async def _process_message_to_client(self, msg: str, client_ws: web.WebSocketResponse, server_ws: web.WebSocketResponse) -> Optional[str]:
-        message = json.loads(msg.data)
-        updated_message = msg.data
-        if message is not None:
-            match message["type"]:
-                case "session.created":
-                    session = message["session"]
-                    # Hide the instructions, tools and max tokens from clients, if we ever allow client-side
-                    # tools, this will need updating
-                    session["instructions"] = ""
-                    session["tools"] = []
-                    session["tool_choice"] = "none"
-                    session["max_response_output_tokens"] = None
-                    updated_message = json.dumps(message)
-
-                case "response.output_item.added":
-                    if "item" in message and message["item"]["type"] == "function_call":
-                        updated_message = None
-
-                case "conversation.item.created":
-                    if "item" in message and message["item"]["type"] == "function_call":
-                        item = message["item"]
-                        if item["call_id"] not in self._tools_pending:
-                            self._tools_pending[item["call_id"]] = RTToolCall(item["call_id"], message["previous_item_id"])
-                        updated_message = None
-                    elif "item" in message and message["item"]["type"] == "function_call_output":
-                        updated_message = None
-
-                case "response.function_call_arguments.delta":
-                    updated_message = None
-
-                case "response.function_call_arguments.done":
-                    updated_message = None
-
-                case "response.output_item.done":
-                    if "item" in message and message["item"]["type"] == "function_call":
-                        item = message["item"]
-                        tool_call = self._tools_pending[message["item"]["call_id"]]
-                        tool = self.tools[item["name"]]
-                        args = item["arguments"]
-                        result = await tool.target(json.loads(args))
-                        await server_ws.send_json({
-                            "type": "conversation.item.create",
-                            "item": {
-                                "type": "function_call_output",
-                                "call_id": item["call_id"],
-                                "output": result.to_text() if result.destination == ToolResultDirection.TO_SERVER else ""
-                            }
-                        })
-                        if result.destination == ToolResultDirection.TO_CLIENT:
-                            # TODO: this will break clients that don't know about this extra message, rewrite
-                            # this to be a regular text message with a special marker of some sort
-                            await client_ws.send_json({
-                                "type": "extension.middle_tier_tool_response",
-                                "previous_item_id": tool_call.previous_id,
-                                "tool_name": item["name"],
-                                "tool_result": result.to_text()
-                            })
-                        updated_message = None
-
-                case "response.done":
-                    if len(self._tools_pending) > 0:
-                        self._tools_pending.clear() # Any chance tool calls could be interleaved across different outstanding responses?
-                        await server_ws.send_json({
-                            "type": "response.create"
-                        })
-                    if "response" in message:
-                        replace = False
-                        for i, output in enumerate(reversed(message["response"]["output"])):
-                            if output["type"] == "function_call":
-                                try:
-                                    message["response"]["output"].pop(i)
-                                    replace = True
-                                except Exception as e:
-                                    print(e)
-                        if replace:
-                            updated_message = json.dumps(message)
+            # Fetch the first token while the rest of the app is set up so it is cached when the first
+            # session arrives, outside an event loop the warm-up waits for app startup instead
+            try:
+                self._warm_up_task = asyncio.get_running_loop().create_task(self._warm_up())
+            except RuntimeError:
+                pass
 
+    async def _process_message_to_client(self, msg: str, session: RealtimeSession, server_ws: web.WebSocketResponse) -> Optional[str]:
+        rule, message, updated_message = self._client_events.apply(msg.data)
+        if rule is not None and rule.handler is not None:
+            if await getattr(self, rule.handler)(message, session, server_ws) and updated_message is not None:
+                updated_message = codec.dumps(message)
         return updated_message
 
-    async def _process_message_to_server(self, msg: str, ws: web.WebSocketResponse) -> Optional[str]:
-        message = json.loads(msg.data)
-        updated_message = msg.data
-        if message is not None:
-            match message["type"]:
-                case "session.update":
-                    session = message["session"]
-                    if self.system_message is not None:
-                        session["instructions"] = self.system_message
-                    if self.temperature is not None:
-                        session["temperature"] = self.temperature
-                    if self.max_tokens is not None:
-                        session["max_response_output_tokens"] = self.max_tokens
-                    if self.disable_audio is not None:
-                        session["disable_audio"] = self.disable_audio
-                    session["tool_choice"] = "auto" if len(self.tools) > 0 else "none"
-                    session["tools"] = [tool.schema for tool in self.tools.values()]
-                    message["session"] = session
-                    updated_message = json.dumps(message)
+    async def _on_function_call_added(self, message: dict, session: RealtimeSession, server_ws: web.WebSocketResponse):
+        if self.speculative_tools:
+            self._start_speculation(session, message["item"])
+
+    async def _on_conversation_item_created(self, message: dict, session: RealtimeSession, server_ws: web.WebSocketResponse):
+        item = message["item"]
+        if item["type"] == "function_call" and item["call_id"] not in session.tools_pending:
+            session.tools_pending[item["call_id"]] = RTToolCall(item["call_id"], message["previous_item_id"])
+
+    async def _on_function_call_arguments_delta(self, message: dict, session: RealtimeSession, server_ws: web.WebSocketResponse):
+        if (speculation := session.speculative.get(message.get("call_id"))) is not None and speculation.task is None:
+            if (args := speculation.feed(message["delta"])) is not None:
+                self._launch_speculation(speculation, args)
+
+    async def _on_function_call_done(self, message: dict, session: RealtimeSession, server_ws: web.WebSocketResponse):
+        item = message["item"]
+        tool_call = session.tools_pending[item["call_id"]]
+        tool = self.tools[item["name"]]
+        args = item["arguments"]
+        started = time.monotonic()
+        result = await self._speculative_result(session, item)
+        if result is None:
+            result = await self._execute_tool(item["name"], tool, args)
+        if session.recorder is not None:
+            session.recorder.record_tool(item["name"], item["call_id"], result.to_text(), result.destination.value, time.monotonic() - started)
+        await send_json(server_ws, {
+            "type": "conversation.item.create",
+            "item": {
+                "type": "function_call_output",
+                "call_id": item["call_id"],
+                "output": result.to_text() if result.destination == ToolResultDirection.TO_SERVER else ""
+            }
+        })
+        if result.destination == ToolResultDirection.TO_CLIENT:
+            if session.cards is not None and item["name"] in CARD_TOOLS and isinstance(result.text, list):
+                await session.send_to_client(codec.dumps({
+                    "type": "extension.product_cards",
+                    "previous_item_id": tool_call.previous_id,
+                    "tool_name": item["name"],
+                    **session.cards.update(result.text)
+                }))
+                return
+            # TODO: this will break clients that don't know about this extra message, rewrite
+            # this to be a regular text message with a special marker of some sort
+            await session.send_to_client(codec.dumps({
+                "type": "extension.middle_tier_tool_response",
+                "previous_item_id": tool_call.previous_id,
+                "tool_name": item["name"],
+                "tool_result": result.to_text()
+            }))
+
+    async def _on_response_done(self, message: dict, session: RealtimeSession, server_ws: web.WebSocketResponse):
+        # Function calls were already pruned from the output by the rule
+        session.cancel_speculation()
+        if len(session.tools_pending) > 0:
+            session.tools_pending.clear() # Any chance tool calls could be interleaved across different outstanding responses?
+            await send_json(server_ws, {
+                "type": "response.create"
+            })
+
+    def _start_speculation(self, session: RealtimeSession, item: dict):
+        tool = self.tools.get(item.get("name"))
+        if tool is None or tool.speculative_args is None:
+            return
+        speculation = SpeculativeToolCall(item["name"], tool.speculative_args)
+        session.speculative[item["call_id"]] = speculation
+        if not speculation.keys:
+            self._launch_speculation(speculation, {})
+
+    def _launch_speculation(self, speculation: SpeculativeToolCall, args: dict):
+        speculation.args = args
+        speculation.task = asyncio.create_task(self._execute_tool(speculation.name, self.tools[speculation.name], codec.dumps(args)))
+        self.speculation_stats["started"] += 1
+
+    async def _speculative_result(self, session: RealtimeSession, item: dict) -> Optional[ToolResult]:
+        # Result of the speculative run if it was started with the arguments the model settled on
+        speculation = session.speculative.pop(item["call_id"], None)
+        if speculation is None or speculation.task is None:
+            return None
+        if not speculation.matches(codec.loads(item["arguments"])):
+            speculation.task.cancel()
+            self.speculation_stats["discarded"] += 1
+            logger.debug("Discarded speculative %s call, arguments changed", item["name"], extra={"event": "tool_speculation"})
+            return None
+        result = await speculation.task
+        if result.failed:
+            logger.warning("Speculative %s call failed, running it again", item["name"])
+            self.speculation_stats["failed"] += 1
+            return None
+        self.speculation_stats["used"] += 1
+        return result
+
+    async def _execute_tool(self, name: str, tool: Tool, args: str) -> ToolResult:
+        if tool.cache_ttl is None:
+            return await self.tool_runtime.run(name, tool, codec.loads(args))
+        # Key on the parsed arguments so whitespace and key order differences still hit
+        parsed = codec.loads(args)
+        digest = hashlib.sha256(json.dumps(parsed, sort_keys=True).encode("utf-8")).hexdigest()
+        key = f"tool:{name}:{digest}"
+        # Shielded, speculative runs are cancelled at any point and a state call is left to finish
+        # instead of being torn down halfway through a roundtrip on the shared connection
+        try:
+            cached = await asyncio.shield(self.state.cache_get(key))
+        except Exception as e:
+            logger.warning("Tool cache lookup failed: %s", e)
+            cached = None
+        if cached is not None:
+            entry = codec.loads(cached)
+            logger.debug("Tool cache hit for %s", name, extra={"event": "tool_cache_hit"})
+            return ToolResult(entry["text"], ToolResultDirection(entry["destination"]))
+        result = await self.tool_runtime.run(name, tool, parsed)
+        if result.failed:
+            return result
+        try:
+            await asyncio.shield(self.state.cache_set(key, codec.dumps({"text": result.to_text(), "destination": result.destination.value}), tool.cache_ttl))
+        except Exception as e:
+            logger.warning("Tool cache update failed: %s", e)
+        return result
 
+    async def _process_message_to_server(self, msg: str, session: RealtimeSession, ws: web.WebSocketResponse) -> Optional[str]:
+        rule, message, updated_message = self._server_events.apply(msg.data)
+        if rule is not None and rule.handler is not None:
+            if await getattr(self, rule.handler)(message, session, ws) and updated_message is not None:
+                updated_message = codec.dumps(message)
         return updated_message
 
-    async def _forward_messages(self, ws: web.WebSocketResponse):
-        async with aiohttp.ClientSession(base_url=self.endpoint) as session:
+    async def _on_session_update(self, message: dict, session: RealtimeSession, client_ws: web.WebSocketResponse) -> bool:
+        session_config = message["session"]
+        if self.system_message is not None:
+            session_config["instructions"] = self.system_message
+        if self.temperature is not None:
+            session_config["temperature"] = self.temperature
+        if self.max_tokens is not None:
+            session_config["max_response_output_tokens"] = self.max_tokens
+        if self.disable_audio is not None:
+            session_config["disable_audio"] = self.disable_audio
+        session_config["tool_choice"] = "auto" if len(self.tools) > 0 else "none"
+        session_config["tools"] = [tool.schema for tool in self.tools.values()]
+        if session.audio_gate is not None and isinstance(session_config.get("turn_detection"), dict):
+            session.audio_gate.follow_turn_detection(session_config["turn_detection"])
+        return True
+
+    async def _on_input_audio_append(self, message: dict, session: RealtimeSession, client_ws: web.WebSocketResponse):
+        # The rule drops the event, held back silence is relayed ahead of it once speech starts
+        for audio in session.audio_gate.feed(message["audio"]):
+            await session.upstream.send_str(codec.dumps({"type": "input_audio_buffer.append", "audio": audio}))
+
+    async def _forward_messages(self, ws: web.WebSocketResponse, session: RealtimeSession):
+        async with aiohttp.ClientSession(base_url=self.endpoint) as client_session:
             params = { "api-version": "2024-10-01-preview", "deployment": self.deployment }
             headers = {}
             if "x-ms-client-request-id" in ws.headers:
@@ -147,37 +274,196 @@ class RTMiddleTier:
             if self.key is not None:
                 headers = { "api-key": self.key }
             else:
-                headers = { "Authorization": f"Bearer {self._token_provider()}" } # NOTE: no async version of token provider, maybe refresh token on a timer?
-            async with session.ws_connect("/openai/realtime", headers=headers, params=params) as target_ws:
-                async def from_client_to_server():
-                    async for msg in ws:
-                        if msg.type == aiohttp.WSMsgType.TEXT:
-                            new_msg = await self._process_message_to_server(msg, ws)
-                            if new_msg is not None:
-                                await target_ws.send_str(new_msg)
-                        else:
-                            print("Error: unexpected message type:", msg.type)
+                # No async version of the token provider, a refresh must not block the event loop
+                headers = { "Authorization": f"Bearer {await asyncio.to_thread(self._token_provider)}" }
+            try:
+                target_ws = await client_session.ws_connect("/openai/realtime", headers=headers, params=params)
+            except aiohttp.WSServerHandshakeError as e:
+                if e.status == 429:
+                    retry_after = e.headers.get("Retry-After") if e.headers else None
+                    await self.admission.report_throttled(float(retry_after) if retry_after and retry_after.isdigit() else None)
+                    await ws.close(code=aiohttp.WSCloseCode.TRY_AGAIN_LATER, message=b"Upstream capacity exceeded, retry later")
+                    return
+                raise
+            self.admission.report_success()
+            async with target_ws:
+                session.upstream = target_ws
 
                 async def from_server_to_client():
                     async for msg in target_ws:
                         if msg.type == aiohttp.WSMsgType.TEXT:
-                            new_msg = await self._process_message_to_client(msg, ws, target_ws)
+                            if session.recorder is not None:
+                                session.recorder.record(Direction.UPSTREAM, msg.data)
+                            new_msg = await self._process_message_to_client(msg, session, target_ws)
                             if new_msg is not None:
-                                await ws.send_str(new_msg)
+                                await session.send_to_client(new_msg)
                         else:
-                            print("Error: unexpected message type:", msg.type)
+                            logger.warning("Unexpected message type: %s", msg.type, extra={"event": "unexpected_frame", "sample_every": 100})
+                    if session.coalescer is not None:
+                        await session.coalescer.flush()
 
+                upstream = session.upstream_task = asyncio.create_task(from_server_to_client())
+                if session.resumable:
+                    self._sessions[session.resume_token] = session
+                    await send_json(ws, {"type": "extension.session_resumable", "resume_token": session.resume_token, "grace_period": self.resume_grace_period})
+                await session.attach(ws)
                 try:
-                    await asyncio.gather(from_client_to_server(), from_server_to_client())
-                except ConnectionResetError:
-                    # Ignore the errors resulting from the client disconnecting the socket
-                    pass
+                    await self._from_client_to_server(ws, session, upstream)
+                    await self._hold_for_resume(session, upstream)
+                finally:
+                    self._sessions.pop(session.resume_token, None)
+                    session.cancel_speculation()
+                    upstream.cancel()
+                    if session.client_ws is not None:
+                        await session.client_ws.close()
+                    error = (await asyncio.gather(upstream, return_exceptions=True))[0]
+                    if isinstance(error, Exception) and not isinstance(error, ConnectionResetError):
+                        logger.error("Upstream connection failed: %s", error, exc_info=error)
+
+    async def _from_client_to_server(self, ws: web.WebSocketResponse, session: RealtimeSession, upstream: asyncio.Task):
+        async def pump():
+            async for msg in ws:
+                if msg.type == aiohttp.WSMsgType.TEXT:
+                    if session.recorder is not None:
+                        session.recorder.record(Direction.CLIENT, msg.data)
+                    new_msg = await self._process_message_to_server(msg, session, ws)
+                    if new_msg is not None:
+                        await session.upstream.send_str(new_msg)
+                elif msg.type == aiohttp.WSMsgType.ERROR:
+                    # e.g. the heartbeat timed out, the client socket is gone
+                    logger.info("Client socket failed: %s", ws.exception())
+                    break
+                else:
+                    logger.warning("Unexpected message type: %s", msg.type, extra={"event": "unexpected_frame", "sample_every": 100})
+
+        client = asyncio.create_task(pump())
+        try:
+            # Stop reading from the client once the upstream conversation is over
+            await asyncio.wait({client, upstream}, return_when=asyncio.FIRST_COMPLETED)
+            if client.done() and not client.cancelled() and not isinstance(client.exception(), ConnectionResetError):
+                client.result()
+            if upstream.done() and not ws.closed:
+                await ws.close()
+        finally:
+            client.cancel()
+            session.detach(ws)
+
+    async def _hold_for_resume(self, session: RealtimeSession, upstream: asyncio.Task):
+        # Keeps the upstream conversation open while clients come and go, until the upstream closes,
+        # a client ends the conversation cleanly or nobody resumes within the grace period
+        while session.resumable and not session.closed_by_client and not upstream.done():
+            if session.client_ws is None:
+                logger.info("Client disconnected, holding session for %.0fs", self.resume_grace_period)
+                waiter = asyncio.create_task(session.attached.wait())
+                done, _ = await asyncio.wait({waiter, upstream}, timeout=self.resume_grace_period, return_when=asyncio.FIRST_COMPLETED)
+                waiter.cancel()
+                if not done:
+                    logger.info("Session was not resumed within the grace period")
+                    return
+            else:
+                waiter = asyncio.create_task(session.detached.wait())
+                await asyncio.wait({waiter, upstream}, return_when=asyncio.FIRST_COMPLETED)
+                waiter.cancel()
+
+    def _client_socket(self) -> web.WebSocketResponse:
+        return web.WebSocketResponse(heartbeat=self.client_heartbeat or None)
+
+    def _take_over(self, session: RealtimeSession):
+        # The resume token proves the client owns the session, so a socket still attached is stale,
+        # usually one whose network dropped before the heartbeat noticed. Detach it and close it in
+        # the background with a normal close code, so a browser that is still there doesn't resume too.
+        stale = session.client_ws
+        if stale is None:
+            return
+        logger.info("Resume takes over the session from a stale client socket")
+        session.detach(stale)
+        task = asyncio.create_task(stale.close(code=aiohttp.WSCloseCode.OK, message=b"Session resumed on another connection"))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def _resume_session(self, ws: web.WebSocketResponse, session: RealtimeSession, last_seq: Optional[int]):
+        self._take_over(session)
+        replayed, missed = await session.attach(ws, last_seq)
+        if missed and session.cards is not None:
+            # The browser drops its cards too, the next list is sent in full
+            session.cards.reset()
+        logger.info("Session resumed after %.1fs, replayed %d messages (%d missed)", time.monotonic() - (session.detached_at or time.monotonic()), replayed, missed)
+        await self._from_client_to_server(ws, session, session.upstream_task)
 
     async def _websocket_handler(self, request: web.Request):
-        ws = web.WebSocketResponse()
-        await ws.prepare(request)
-        await self._forward_messages(ws)
-        return ws
+        resume_token = request.query.get("resume")
+        if resume_token and (session := self._sessions.get(resume_token)) is not None:
+            session_context.set(session.id)
+            ws = self._client_socket()
+            await ws.prepare(request)
+            last_seq = request.query.get("last_seq", "")
+            await self._resume_session(ws, session, int(last_seq) if last_seq.isdigit() else None)
+            return ws
+
+        # Always generated here, the client's request id is only passed on for correlation
+        session_id = uuid.uuid4().hex
+        client_request_id = request.headers.get("x-ms-client-request-id")
+        session_context.set(session_id)
+        try:
+            admission = await self.admission.acquire(session_id)
+        except AdmissionRejected as e:
+            return web.Response(status=503, text=f"Too many active sessions: {e}", headers={"Retry-After": str(math.ceil(e.retry_after))})
+
+        async with admission:
+            ws = self._client_socket()
+            await ws.prepare(request)
+            if resume_token:
+                # The session expired or lives on another replica, the client has to start over
+                await send_json(ws, {"type": "extension.session_resume_failed"})
+            logger.info("Realtime session started", extra={"client_request_id": client_request_id})
+            session = RealtimeSession(session_id, self.replay_buffer_bytes if self.resume_grace_period > 0 else 0)
+            # Opt-in with REALTIME_RECORDING_DIR, replay recordings with python -m backend.replay
+            session.recorder = SessionRecorder.from_environment(session_id, {"deployment": self.deployment, "client_request_id": client_request_id})
+            if self.audio_gate is not None:
+                session.audio_gate = AudioGate(self.audio_gate)
+            if self.coalescing is not None:
+                session.coalescer = DeltaCoalescer(self.coalescing, session._deliver)
+            if self.product_cards is not None:
+                session.cards = ProductCards(self.product_cards)
+            try:
+                await self._forward_messages(ws, session)
+            finally:
+                if session.recorder is not None:
+                    session.recorder.close()
+                if session.coalescer is not None:
+                    session.coalescer.close()
+                    stats = session.coalescer.stats
+                    self.coalescing_stats.add(stats)
+                    logger.info("Coalesced %d client events into %d frames", stats.events, stats.frames)
+                if session.cards is not None and session.cards.stats.updates:
+                    stats = session.cards.stats
+                    self.product_card_stats.add(stats)
+                    logger.info("Sent %d of %d product cards shown", stats.sent, stats.cards)
+                if session.audio_gate is not None:
+                    stats = session.audio_gate.stats
+                    self.audio_gate_stats.add(stats)
+                    logger.info("Audio gate relayed %.1fs of %.1fs input audio", stats.forwarded_seconds, stats.seconds)
+                logger.info("Realtime session ended")
+            return ws
+
+    async def _warm_up(self):
+        try:
+            with profiler.track("credential_warm_up"):
+                await asyncio.to_thread(self._token_provider)
+        except Exception as e:
+            logger.warning("Credential warm-up failed, the first session will fetch the token: %s", e)
+
+    async def _on_startup(self, app: web.Application):
+        if self._token_provider is not None and self._warm_up_task is None:
+            self._warm_up_task = asyncio.create_task(self._warm_up())
+
+    async def _cleanup(self, app: web.Application):
+        if self._warm_up_task is not None:
+            self._warm_up_task.cancel()
+        self.tool_runtime.shutdown()
+        await self.state.close()
 
     def attach_to_app(self, app, path):
         app.router.add_get(path, self._websocket_handler)
+        app.on_startup.append(self._on_startup)
+        app.on_cleanup.append(self._cleanup)
@@ -0,0 +1,122 @@
+import asyncio
+import secrets
+import time
+from collections import deque
+from typing import Optional
+from aiohttp import ClientWebSocketResponse, web
+from backend.audiogate import AudioGate
+from backend.codec import codec
+from backend.coalescer import DeltaCoalescer
+from backend.productcards import ProductCards
+from backend.recording import SessionRecorder
+from backend.tools import RTToolCall, SpeculativeToolCall
+
+class ReplayBuffer:
+    # Bounded buffer of the most recent messages sent to the client, numbered in send order, so a
+    # reconnecting client can be sent everything after the last message it saw. When full, the
+    # oldest messages are dropped and a resume from before them reports what was missed.
+
+    max_bytes: int
+    size: int = 0
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: deque[tuple[int, str]] = deque()
+
+    def append(self, seq: int, message: str):
+        self._entries.append((seq, message))
+        self.size += len(message)
+        while self.size > self.max_bytes and len(self._entries) > 1:
+            _, dropped = self._entries.popleft()
+            self.size -= len(dropped)
+
+    def since(self, seq: int) -> tuple[list[str], int]:
+        # Messages after seq and the number of messages after seq that are no longer buffered
+        first = self._entries[0][0] if self._entries else seq + 1
+        missed = max(0, first - seq - 1)
+        return [message for s, message in self._entries if s > seq], missed
+
+class RealtimeSession:
+    # Everything that belongs to one conversation rather than to one client socket: the upstream
+    # connection, tool calls in flight and the messages sent to the client. A client socket can
+    # detach and a new one can attach with the resume token and carry on with the same session.
+
+    id: str
+    resume_token: str
+    upstream: Optional[ClientWebSocketResponse] = None
+    upstream_task: Optional[asyncio.Task] = None
+    client_ws: Optional[web.WebSocketResponse] = None
+    tools_pending: dict[str, RTToolCall]
+    speculative: dict[str, SpeculativeToolCall]
+    sent: int = 0
+    detached_at: Optional[float] = None
+    closed_by_client: bool = False
+    recorder: Optional[SessionRecorder] = None
+    audio_gate: Optional[AudioGate] = None
+    coalescer: Optional[DeltaCoalescer] = None
+    cards: Optional[ProductCards] = None
+
+    def __init__(self, session_id: str, replay_bytes: int = 0):
+        self.id = session_id
+        self.resume_token = secrets.token_urlsafe(32)
+        self.tools_pending = {}
+        self.speculative = {}
+        self.replay = ReplayBuffer(replay_bytes) if replay_bytes > 0 else None
+        self.attached = asyncio.Event()
+        self.detached = asyncio.Event()
+        self._send_lock = asyncio.Lock()
+
+    @property
+    def resumable(self) -> bool:
+        return self.replay is not None
+
+    async def send_to_client(self, message: str):
+        if self.coalescer is not None:
+            await self.coalescer.push(message)
+        else:
+            await self._deliver(message)
+
+    async def _deliver(self, message: str):
+        async with self._send_lock:
+            self.sent += 1
+            if self.replay is not None:
+                self.replay.append(self.sent, message)
+            ws = self.client_ws
+            if ws is None or ws.closed:
+                return
+            try:
+                await ws.send_str(message)
+            except ConnectionResetError:
+                # The client went away mid-send, the message stays in the replay buffer
+                pass
+
+    async def attach(self, ws: web.WebSocketResponse, last_seq: Optional[int] = None) -> tuple[int, int]:
+        # Attaches a client socket and replays what it missed, returns (replayed, missed)
+        async with self._send_lock:
+            replayed, missed = [], 0
+            if last_seq is not None and self.replay is not None:
+                replayed, missed = self.replay.since(last_seq)
+                # Not numbered, the client only counts conversation messages
+                await ws.send_str(codec.dumps({"type": "extension.session_resumed", "replayed": len(replayed), "missed": missed}))
+                for message in replayed:
+                    await ws.send_str(message)
+            self.client_ws = ws
+            self.detached_at = None
+            self.detached.clear()
+            self.attached.set()
+            return len(replayed), missed
+
+    def cancel_speculation(self):
+        for speculation in self.speculative.values():
+            if speculation.task is not None:
+                speculation.task.cancel()
+        self.speculative.clear()
+
+    def detach(self, ws: web.WebSocketResponse):
+        if self.client_ws is not ws:
+            return
+        self.closed_by_client = ws.close_code in (1000, 1001)
+        self.client_ws = None
+        self.detached_at = time.monotonic()
+        self.attached.clear()
+        self.detached.set()
@@ -0,0 +1,265 @@
+import asyncio
+import logging
+import os
+import ssl
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Optional
+from urllib.parse import urlparse
+
+logger = logging.getLogger("sharedstate")
+
+class SharedState(ABC):
+    # State that has to be consistent across every replica: the session registry used for global
+    # admission limits, fixed window rate counters and the tool result cache. The in-memory
+    # implementation is the default for a single worker, RedisSharedState shares it across replicas.
+
+    @abstractmethod
+    async def register_session(self, session_id: str, limit: int, ttl: float) -> bool:
+        ...
+
+    @abstractmethod
+    async def refresh_session(self, session_id: str, ttl: float):
+        ...
+
+    @abstractmethod
+    async def unregister_session(self, session_id: str):
+        ...
+
+    @abstractmethod
+    async def session_count(self) -> int:
+        ...
+
+    @abstractmethod
+    async def incr(self, key: str, window: float) -> int:
+        ...
+
+    @abstractmethod
+    async def cache_get(self, key: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    async def cache_set(self, key: str, value: str, ttl: float):
+        ...
+
+    async def close(self):
+        pass
+
+class InMemorySharedState(SharedState):
+    def __init__(self):
+        self._sessions: dict[str, float] = {}
+        self._counters: dict[str, tuple[int, float]] = {}
+        self._cache: dict[str, tuple[str, float]] = {}
+
+    def _expire_sessions(self, now: float):
+        for session_id in [s for s, expires in self._sessions.items() if expires <= now]:
+            del self._sessions[session_id]
+
+    async def register_session(self, session_id: str, limit: int, ttl: float) -> bool:
+        now = time.monotonic()
+        self._expire_sessions(now)
+        if session_id not in self._sessions and len(self._sessions) >= limit:
+            return False
+        self._sessions[session_id] = now + ttl
+        return True
+
+    async def refresh_session(self, session_id: str, ttl: float):
+        if session_id in self._sessions:
+            self._sessions[session_id] = time.monotonic() + ttl
+
+    async def unregister_session(self, session_id: str):
+        self._sessions.pop(session_id, None)
+
+    async def session_count(self) -> int:
+        self._expire_sessions(time.monotonic())
+        return len(self._sessions)
+
+    async def incr(self, key: str, window: float) -> int:
+        now = time.monotonic()
+        count, expires = self._counters.get(key, (0, 0.0))
+        if expires <= now:
+            count, expires = 0, now + window
+        self._counters[key] = (count + 1, expires)
+        return count + 1
+
+    async def cache_get(self, key: str) -> Optional[str]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.monotonic():
+            del self._cache[key]
+            return None
+        return entry[0]
+
+    async def cache_set(self, key: str, value: str, ttl: float):
+        self._cache[key] = (value, time.monotonic() + ttl)
+        if len(self._cache) > 10000:
+            now = time.monotonic()
+            for expired in [k for k, (_, expires) in self._cache.items() if expires <= now]:
+                del self._cache[expired]
+
+class RedisError(Exception):
+    pass
+
+class RespConnection:
+    # Minimal RESP2 client, enough for the handful of commands the shared state needs. Commands are
+    # serialized over a single connection and transparently reconnect after a connection failure.
+
+    def __init__(self, host: str, port: int, password: Optional[str] = None, db: int = 0, use_ssl: bool = False, timeout: float = 5.0):
+        self.host = host
+        self.port = port
+        self.password = password
+        self.db = db
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._lock = asyncio.Lock()
+
+    async def _connect(self):
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, ssl=ssl.create_default_context() if self.use_ssl else None),
+            self.timeout)
+        if self.password:
+            await self._roundtrip([("AUTH", self.password)])
+        if self.db:
+            await self._roundtrip([("SELECT", self.db)])
+
+    @staticmethod
+    def _encode(command: tuple) -> bytes:
+        parts = [b"*%d\r\n" % len(command)]
+        for arg in command:
+            data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(parts)
+
+    async def _read_reply(self) -> Any:
+        line = await self._reader.readline()
+        if not line:
+            raise ConnectionResetError("Redis connection closed")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode("utf-8")
+        if kind == b"-":
+            return RedisError(payload.decode("utf-8"))
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = await self._reader.readexactly(length + 2)
+            return data[:-2].decode("utf-8")
+        if kind == b"*":
+            length = int(payload)
+            if length < 0:
+                return None
+            return [await self._read_reply() for _ in range(length)]
+        raise RedisError(f"Unexpected reply type {kind!r}")
+
+    async def _roundtrip(self, commands: list[tuple]) -> list[Any]:
+        self._writer.write(b"".join(self._encode(command) for command in commands))
+        await self._writer.drain()
+        replies = [await asyncio.wait_for(self._read_reply(), self.timeout) for _ in commands]
+        for reply in replies:
+            if isinstance(reply, RedisError):
+                raise reply
+        return replies
+
+    async def pipeline(self, *commands: tuple) -> list[Any]:
+        async with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._writer is None:
+                        await self._connect()
+                    return await self._roundtrip(list(commands))
+                except RedisError:
+                    # Every reply was read, the connection is still in sync
+                    raise
+                except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError, OSError):
+                    await self._reset()
+                    if attempt:
+                        raise
+                except BaseException:
+                    # Cancelled mid-roundtrip, the unread replies would be handed to the next caller
+                    await self._reset()
+                    raise
+
+    async def execute(self, *command) -> Any:
+        return (await self.pipeline(tuple(command)))[0]
+
+    async def _reset(self):
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except Exception:
+                pass
+        self._reader = self._writer = None
+
+    async def close(self):
+        async with self._lock:
+            await self._reset()
+
+class RedisSharedState(SharedState):
+    # Sessions live in a sorted set scored by their expiry time, so sessions of a crashed replica
+    # age out on their own. Registration adds first and backs out if the set is over the limit,
+    # which can briefly under-admit under contention but never over-admits.
+
+    def __init__(self, connection: RespConnection, prefix: str = "rtmt:"):
+        self.connection = connection
+        self.prefix = prefix
+        self.sessions_key = prefix + "sessions"
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisSharedState":
+        parsed = urlparse(url)
+        db = int(parsed.path.lstrip("/") or 0)
+        connection = RespConnection(parsed.hostname or "localhost", parsed.port or 6379, parsed.password, db, parsed.scheme == "rediss")
+        return cls(connection)
+
+    async def register_session(self, session_id: str, limit: int, ttl: float) -> bool:
+        now = time.time()
+        _, _, count = await self.connection.pipeline(
+            ("ZREMRANGEBYSCORE", self.sessions_key, "-inf", now),
+            ("ZADD", self.sessions_key, now + ttl, session_id),
+            ("ZCARD", self.sessions_key))
+        if count > limit:
+            await self.connection.execute("ZREM", self.sessions_key, session_id)
+            return False
+        return True
+
+    async def refresh_session(self, session_id: str, ttl: float):
+        await self.connection.execute("ZADD", self.sessions_key, "XX", time.time() + ttl, session_id)
+
+    async def unregister_session(self, session_id: str):
+        await self.connection.execute("ZREM", self.sessions_key, session_id)
+
+    async def session_count(self) -> int:
+        _, count = await self.connection.pipeline(
+            ("ZREMRANGEBYSCORE", self.sessions_key, "-inf", time.time()),
+            ("ZCARD", self.sessions_key))
+        return count
+
+    async def incr(self, key: str, window: float) -> int:
+        bucket = f"{self.prefix}rate:{key}:{int(time.time() // window)}"
+        count, _ = await self.connection.pipeline(
+            ("INCR", bucket),
+            ("EXPIRE", bucket, max(1, int(window * 2))))
+        return count
+
+    async def cache_get(self, key: str) -> Optional[str]:
+        return await self.connection.execute("GET", self.prefix + "cache:" + key)
+
+    async def cache_set(self, key: str, value: str, ttl: float):
+        await self.connection.execute("SET", self.prefix + "cache:" + key, value, "PX", max(1, int(ttl * 1000)))
+
+    async def close(self):
+        await self.connection.close()
+
+def create_shared_state(url: Optional[str] = None) -> SharedState:
+    url = url or os.environ.get("SHARED_STATE_URL")
+    if url and url.startswith(("redis://", "rediss://")):
+        logger.info("Using Redis shared state at %s", urlparse(url).hostname)
+        return RedisSharedState.from_url(url)
+    return InMemorySharedState()
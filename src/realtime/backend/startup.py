@@ -0,0 +1,82 @@
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Iterator, Optional
+
+if TYPE_CHECKING:
+    from azure.core.credentials import AzureKeyCredential, TokenCredential
+
+logger = logging.getLogger("startup")
+
+class StartupProfiler:
+    # Times the import and setup of each startup component and the time until the app serves its
+    # first request. STARTUP_PROFILE=1 logs the report once the app is ready, STARTUP_PROFILE_FILE
+    # additionally writes it as JSON so cold start can be tracked in CI. Times are relative to when
+    # the entry module imported this one, which it does first.
+
+    enabled: bool
+    path: Optional[str]
+
+    def __init__(self, enabled: bool = False, path: Optional[str] = None):
+        self.enabled = enabled
+        self.path = path
+        self.origin = time.perf_counter()
+        self.components: dict[str, float] = {}
+        self.time_to_ready: Optional[float] = None
+
+    @classmethod
+    def from_environment(cls) -> "StartupProfiler":
+        path = os.environ.get("STARTUP_PROFILE_FILE")
+        enabled = bool(path) or os.environ.get("STARTUP_PROFILE", "false").lower() in ("1", "true", "yes")
+        return cls(enabled, path)
+
+    @contextmanager
+    def track(self, component: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(component, time.perf_counter() - started)
+
+    def record(self, component: str, seconds: float):
+        self.components[component] = round(seconds * 1000, 3)
+        if self.enabled and self.time_to_ready is not None:
+            # Background work (e.g. the credential warm-up) finishing after the app became ready
+            logger.info("Startup component %s took %.1fms", component, seconds * 1000)
+            self._write()
+
+    def report(self) -> dict[str, Any]:
+        return {
+            "pid": os.getpid(),
+            "components_ms": self.components,
+            "time_to_ready_ms": round(self.time_to_ready * 1000, 3) if self.time_to_ready is not None else None,
+        }
+
+    def _write(self):
+        if self.path:
+            from backend.codec import codec
+            with open(self.path, "wb") as file:
+                file.write(codec.dumps_bytes(self.report()))
+
+    async def on_startup(self, app: Any):
+        self.time_to_ready = time.perf_counter() - self.origin
+        if self.enabled:
+            logger.info("Ready after %.1fms: %s", self.time_to_ready * 1000, self.components)
+            self._write()
+
+profiler = StartupProfiler.from_environment()
+
+def create_credential(key: Optional[str]) -> "AzureKeyCredential | TokenCredential":
+    # azure.identity takes a large share of the import time, only load it when keyless auth is used
+    if key:
+        with profiler.track("import:azure.core"):
+            from azure.core.credentials import AzureKeyCredential
+        return AzureKeyCredential(key)
+    with profiler.track("import:azure.identity"):
+        from azure.identity import AzureDeveloperCliCredential, DefaultAzureCredential
+    if tenant_id := os.environ.get("AZURE_TENANT_ID"):
+        logger.info("Using AzureDeveloperCliCredential with tenant_id %s", tenant_id)
+        return AzureDeveloperCliCredential(tenant_id=tenant_id, process_timeout=60)
+    logger.info("Using DefaultAzureCredential")
+    return DefaultAzureCredential()
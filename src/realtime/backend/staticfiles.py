@@ -0,0 +1,215 @@
+import asyncio
+import gzip
+import hashlib
+import logging
+import mimetypes
+import re
+import time
+from pathlib import Path
+from typing import Optional
+from aiohttp import web
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger("staticfiles")
+
+_COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+_STATIC_REFERENCE = re.compile(r'(?P<attr>(?:src|href)=["\'])/static/(?P<path>[^"\'?#]+)')
+
+class StaticAsset:
+    path: Path
+    relative: str
+    hash: str
+    content_type: str
+    etag: str
+    body: Optional[bytes]
+    encodings: dict[str, bytes]
+    # Size and modification time of the file the asset was read from, to notice when it changes
+    size: int = -1
+    mtime_ns: int = 0
+    checked_at: float = 0.0
+
+    def __init__(self, path: Path, relative: str, body: bytes, max_memory_size: int):
+        self.path = path
+        self.relative = relative
+        self.hash = hashlib.sha256(body).hexdigest()[:12]
+        self.content_type = mimetypes.guess_type(relative)[0] or "application/octet-stream"
+        self.etag = f'"{self.hash}"'
+        # Large files stay on disk and are streamed, everything else is served from memory
+        self.body = body if len(body) <= max_memory_size else None
+        self.encodings = {}
+
+    @property
+    def hashed_relative(self) -> str:
+        parent, _, name = self.relative.rpartition("/")
+        stem, dot, suffix = name.rpartition(".")
+        hashed = f"{stem}.{self.hash}.{suffix}" if dot else f"{name}.{self.hash}"
+        return f"{parent}/{hashed}" if parent else hashed
+
+    def compress(self, min_size: int):
+        if self.body is None or len(self.body) < min_size or not self.content_type.startswith(_COMPRESSIBLE_TYPES):
+            return
+        encoded = gzip.compress(self.body, compresslevel=9, mtime=0)
+        if len(encoded) < len(self.body):
+            self.encodings["gzip"] = encoded
+        if brotli is not None:
+            encoded = brotli.compress(self.body, quality=11)
+            if len(encoded) < len(self.body):
+                self.encodings["br"] = encoded
+
+class StaticAssets:
+    # Serves a static directory with precompressed bodies, ETags and content hashed urls.
+    # Hashed urls (/static/app.3f2a9c1d7e4b.js) are cached as immutable by browsers, plain urls
+    # are revalidated with the ETag. Files too large to keep in memory are streamed from disk
+    # and only get plain urls, the file could change under a hashed url while it is served. HTML pages are rendered once with their /static/ references
+    # rewritten to the hashed urls and then served from memory. Files added or changed after
+    # startup (e.g. catalog images regenerated with --force) are read and compressed off the event
+    # loop, a file is checked for changes at most every check_interval seconds.
+
+    directory: Path
+    prefix: str
+    max_memory_size: int = 2 * 1024 * 1024
+    min_compress_size: int = 256
+    check_interval: float = 1.0
+
+    def __init__(self, directory: Path, prefix: str = "/static/"):
+        self.directory = Path(directory).resolve()
+        self.prefix = prefix
+        self._assets: dict[str, StaticAsset] = {}
+        self._hashed: dict[str, StaticAsset] = {}
+        self._pages: dict[str, StaticAsset] = {}
+        self._loading: dict[str, asyncio.Future] = {}
+        self.load()
+
+    def load(self):
+        for path in sorted(self.directory.rglob("*")):
+            if path.is_file() and (asset := self._read(path)) is not None:
+                self._install(asset)
+        for name in list(self._assets):
+            if name.endswith(".html"):
+                self._pages[name] = self._render_page(name)
+        total = sum(len(a.body or b"") for a in self._assets.values())
+        compressed = sum(len(a.encodings) for a in self._assets.values())
+        logger.info("Loaded %d static assets (%d bytes in memory, %d precompressed encodings)", len(self._assets), total, compressed)
+
+    def _read(self, path: Path) -> Optional[StaticAsset]:
+        # Blocking, only called at startup or in a worker thread. None if the file is gone.
+        try:
+            stat = path.stat()
+            body = path.read_bytes()
+        except (FileNotFoundError, IsADirectoryError):
+            return None
+        asset = StaticAsset(path, path.relative_to(self.directory).as_posix(), body, self.max_memory_size)
+        asset.size, asset.mtime_ns, asset.checked_at = stat.st_size, stat.st_mtime_ns, time.monotonic()
+        asset.compress(self.min_compress_size)
+        return asset
+
+    def _install(self, asset: StaticAsset):
+        previous = self._assets.get(asset.relative)
+        if previous is not None and self._hashed.get(previous.hashed_relative) is previous:
+            del self._hashed[previous.hashed_relative]
+        self._assets[asset.relative] = asset
+        if asset.body is not None:
+            self._hashed[asset.hashed_relative] = asset
+
+    def _render_page(self, name: str) -> StaticAsset:
+        source = self._assets[name]
+        html = source.path.read_text(encoding="utf-8")
+        html = _STATIC_REFERENCE.sub(lambda m: m.group("attr") + self.url(m.group("path")), html)
+        page = StaticAsset(source.path, name, html.encode("utf-8"), self.max_memory_size)
+        page.compress(self.min_compress_size)
+        return page
+
+    def url(self, relative: str) -> str:
+        asset = self._assets.get(relative)
+        return self.prefix + (asset.hashed_relative if asset and asset.body is not None else relative)
+
+    def _changed(self, asset: StaticAsset) -> bool:
+        now = time.monotonic()
+        if now - asset.checked_at < self.check_interval:
+            return False
+        asset.checked_at = now
+        try:
+            stat = asset.path.stat()
+        except FileNotFoundError:
+            return True
+        return stat.st_size != asset.size or stat.st_mtime_ns != asset.mtime_ns
+
+    async def _reload(self, relative: str, path: Path) -> Optional[StaticAsset]:
+        # Concurrent requests for the same file share one read, the result is installed on the loop
+        future = self._loading.get(relative)
+        if future is None:
+            future = self._loading[relative] = asyncio.ensure_future(asyncio.to_thread(self._read, path))
+            future.add_done_callback(lambda _: self._loading.pop(relative, None))
+            asset = await asyncio.shield(future)
+            if asset is None:
+                self._assets.pop(relative, None)
+                return None
+            self._install(asset)
+            if self._pages:
+                # Pages link the hashed urls, render them again with the new hash
+                pages = await asyncio.to_thread(lambda: {name: self._render_page(name) for name in self._pages})
+                self._pages.update(pages)
+            return asset
+        return await asyncio.shield(future)
+
+    async def _lookup(self, relative: str) -> Optional[StaticAsset]:
+        asset = self._assets.get(relative)
+        if asset is not None:
+            return asset if not self._changed(asset) else await self._reload(relative, asset.path)
+        # Pick up files added after startup (e.g. freshly generated catalog images)
+        path = (self.directory / relative).resolve()
+        if path.is_relative_to(self.directory) and path.is_file():
+            return await self._reload(relative, path)
+        return None
+
+    def _respond(self, request: web.Request, asset: StaticAsset, cache_control: str) -> web.StreamResponse:
+        headers = {
+            "ETag": asset.etag,
+            "Cache-Control": cache_control,
+            "Vary": "Accept-Encoding",
+        }
+        if asset.etag in request.headers.get("If-None-Match", ""):
+            return web.Response(status=304, headers=headers)
+        if asset.body is None:
+            return web.FileResponse(asset.path, headers=headers)
+        body = asset.body
+        accepted = request.headers.get("Accept-Encoding", "")
+        for encoding in ("br", "gzip"):
+            if encoding in asset.encodings and encoding in accepted:
+                body = asset.encodings[encoding]
+                headers["Content-Encoding"] = encoding
+                break
+        return web.Response(body=body, content_type=asset.content_type, headers=headers)
+
+    async def handle_static(self, request: web.Request) -> web.StreamResponse:
+        relative = request.match_info["filename"]
+        if relative in self._pages:
+            return await self._respond_page(request, relative)
+        asset = self._hashed.get(relative)
+        if asset is not None:
+            return self._respond(request, asset, "public, max-age=31536000, immutable")
+        asset = await self._lookup(relative)
+        if asset is None:
+            raise web.HTTPNotFound()
+        return self._respond(request, asset, "no-cache")
+
+    async def _respond_page(self, request: web.Request, name: str) -> web.StreamResponse:
+        # A changed page source renders every page again through _lookup
+        await self._lookup(name)
+        return self._respond(request, self._pages[name], "no-cache")
+
+    def page_handler(self, name: str):
+        if name not in self._pages:
+            raise KeyError(name)
+
+        async def handler(request: web.Request) -> web.StreamResponse:
+            return await self._respond_page(request, name)
+        return handler
+
+    def attach_to_app(self, app: web.Application, index: str = "index.html"):
+        app.router.add_get("/", self.page_handler(index))
+        app.router.add_get(self.prefix + "{filename:.+}", self.handle_static, name="static")
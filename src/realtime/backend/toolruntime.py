@@ -0,0 +1,111 @@
+import asyncio
+import inspect
+import logging
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Optional
+from backend.tools import Tool, ToolResult, ToolResultDirection
+
+logger = logging.getLogger("toolruntime")
+
+@dataclass
+class ToolStats:
+    calls: int = 0
+    errors: int = 0
+    exec_seconds: float = 0.0
+    max_exec_seconds: float = 0.0
+    queue_wait_seconds: float = 0.0
+    max_queue_wait_seconds: float = 0.0
+
+    def observe(self, wait: float, elapsed: float):
+        self.calls += 1
+        self.exec_seconds += elapsed
+        self.max_exec_seconds = max(self.max_exec_seconds, elapsed)
+        self.queue_wait_seconds += wait
+        self.max_queue_wait_seconds = max(self.max_queue_wait_seconds, wait)
+
+def _timed_call(target: Any, args: Any) -> tuple[Any, float]:
+    # Runs in the worker, returns the result and when it started so the queue wait can be measured
+    started = time.monotonic()
+    return target(args), started
+
+def _is_async(target: Any) -> bool:
+    # Coroutine functions, also behind functools.partial or as the __call__ of a callable object
+    return inspect.iscoroutinefunction(target) or inspect.iscoroutinefunction(getattr(target, "__call__", None))
+
+class ToolRuntime:
+    # Runs tool targets without blocking the event loop: coroutine functions are called on the loop,
+    # any other target in the thread pool, and cpu_bound tools in a process pool, which requires a
+    # picklable module level target. A sync wrapper returning a coroutine (a lambda around an async
+    # method) has to be declared blocking=False to skip the thread hop. What a target returns is
+    # awaited if it is awaitable. Failures are logged and reported to the model as "Error".
+
+    thread_workers: int
+    process_workers: int
+
+    def __init__(self, thread_workers: int = 8, process_workers: int = 2):
+        self.thread_workers = thread_workers
+        self.process_workers = process_workers
+        self.stats: dict[str, ToolStats] = {}
+        self._threads: Optional[Executor] = None
+        self._processes: Optional[Executor] = None
+
+    @classmethod
+    def from_environment(cls) -> "ToolRuntime":
+        return cls(
+            thread_workers=int(os.environ.get("TOOL_THREAD_WORKERS", "8")),
+            process_workers=int(os.environ.get("TOOL_PROCESS_WORKERS", "2")),
+        )
+
+    @staticmethod
+    def kind(tool: Tool) -> str:
+        if tool.cpu_bound:
+            return "process"
+        if tool.blocking is not None:
+            return "thread" if tool.blocking else "loop"
+        return "loop" if _is_async(tool.target) else "thread"
+
+    def _executor(self, kind: str) -> Executor:
+        if kind == "process":
+            if self._processes is None:
+                self._processes = ProcessPoolExecutor(max_workers=self.process_workers)
+            return self._processes
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(max_workers=self.thread_workers, thread_name_prefix="tool")
+        return self._threads
+
+    async def run(self, name: str, tool: Tool, args: Any) -> ToolResult:
+        stats = self.stats.setdefault(name, ToolStats())
+        kind = self.kind(tool)
+        submitted = time.monotonic()
+        started = submitted
+        try:
+            if kind == "loop":
+                result = tool.target(args)
+            else:
+                result, started = await asyncio.get_running_loop().run_in_executor(self._executor(kind), _timed_call, tool.target, args)
+            if inspect.isawaitable(result):
+                result = await result
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            stats.errors += 1
+            logger.exception("Tool %s failed: %s", name, e)
+            result = ToolResult("Error", ToolResultDirection.TO_SERVER)
+            result.failed = True
+        finally:
+            finished = time.monotonic()
+            stats.observe(started - submitted, finished - started)
+        return result
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        return {name: {**vars(stats), "mean_exec_seconds": stats.exec_seconds / stats.calls if stats.calls else 0.0}
+                for name, stats in self.stats.items()}
+
+    def shutdown(self):
+        for executor in (self._threads, self._processes):
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+        self._threads = self._processes = None
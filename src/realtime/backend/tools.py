@@ -1,8 +1,9 @@
+import asyncio
 import json
+import re
+from backend.codec import codec
 from enum import Enum
-from typing import Any, Callable
-from azure.core.credentials import AzureKeyCredential
-from azure.identity import DefaultAzureCredential
+from typing import Any, Awaitable, Callable, Optional
 
 class ToolResultDirection(Enum):
     TO_SERVER = 1
@@ -11,6 +12,8 @@ class ToolResultDirection(Enum):
 class ToolResult:
     text: str
     destination: ToolResultDirection
+    # Set by the tool runtime when the target raised, failed results are never cached
+    failed: bool = False
 
     def __init__(self, text: str, destination: ToolResultDirection):
         self.text = text
@@ -19,15 +22,31 @@ class ToolResult:
     def to_text(self) -> str:
         if self.text is None:
             return ""
-        return self.text if type(self.text) == str else json.dumps(self.text)
+        return self.text if type(self.text) == str else codec.dumps(self.text)
 
 class Tool:
-    target: Callable[..., ToolResult]
+    # Async targets are called on the event loop, sync targets in a thread and cpu_bound ones in a
+    # process (must be a picklable module level function), see backend/toolruntime.py. blocking
+    # overrides the detection, e.g. blocking=False for a lambda that returns a coroutine.
+    target: Callable[..., ToolResult | Awaitable[ToolResult]]
     schema: Any
+    # Seconds a result may be reused for identical arguments across sessions and replicas, None disables caching
+    cache_ttl: Optional[float]
+    # Arguments the result depends on, if set the tool may be started speculatively while the model is
+    # still streaming the call, as soon as these arguments are complete. () means it depends on the name only.
+    # Only for side effect free tools, the result is discarded if the final arguments differ.
+    speculative_args: Optional[tuple[str, ...]]
+    blocking: Optional[bool]
+    cpu_bound: bool
 
-    def __init__(self, target: Any, schema: Any):
+    def __init__(self, target: Any, schema: Any, cache_ttl: Optional[float] = None, speculative_args: Optional[tuple[str, ...]] = None,
+                 blocking: Optional[bool] = None, cpu_bound: bool = False):
         self.target = target
         self.schema = schema
+        self.cache_ttl = cache_ttl
+        self.speculative_args = speculative_args
+        self.blocking = blocking
+        self.cpu_bound = cpu_bound
 
 class RTToolCall:
     tool_call_id: str
@@ -37,6 +56,35 @@ class RTToolCall:
         self.tool_call_id = tool_call_id
         self.previous_id = previous_id
 
+class SpeculativeToolCall:
+    # A tool call whose arguments are still streaming. Once every argument in keys has been streamed
+    # completely the tool is started with just those arguments.
+
+    name: str
+    keys: tuple[str, ...]
+    buffer: str = ""
+    args: Optional[dict[str, Any]] = None
+    task: Optional[asyncio.Task] = None
+
+    def __init__(self, name: str, keys: tuple[str, ...]):
+        self.name = name
+        self.keys = keys
+        self._patterns = [re.compile(r'"%s"\s*:\s*("(?:[^"\\]|\\.)*"|-?\d+(?:\.\d+)?\s*[,}]|true|false|null)' % re.escape(key)) for key in keys]
+
+    def feed(self, delta: str) -> Optional[dict[str, Any]]:
+        # Returns the arguments once all keys are complete, None until then
+        self.buffer += delta
+        args = {}
+        for key, pattern in zip(self.keys, self._patterns):
+            match = pattern.search(self.buffer)
+            if match is None:
+                return None
+            args[key] = json.loads(match.group(1).rstrip(",} \t\n"))
+        return args
+
+    def matches(self, final_args: dict[str, Any]) -> bool:
+        return self.args is not None and all(final_args.get(key) == self.args[key] for key in self.keys)
+
 
 _get_available_locations_tool_schema = {
     "type": "function",
@@ -88,17 +136,25 @@ _show_final_details_tool_schema = {
 _get_available_models_tool_schema = {
     "type": "function",
     "name": "get_available_cars",
-    "description": "Search the model database for possible car models. The knowledge base is in German, translate to and from German if " + \
-                   "needed. Results are returned in JSON format with a set of metadata that might help the user understand the available options with name, image, price and available seats.",
+    "description": "Search the model database for car models available at the pickup location between the pickup and return date. The knowledge base is in German, translate to and from German if " + \
+                   "needed. Results are returned in JSON format with a set of metadata that might help the user understand the available options with name, image, price, available seats and number of available cars.",
     "parameters": {
         "type": "object",
         "properties": {
             "prefered_location": {
                 "type": "string",
                 "description": "The user prefered pickup location."
+            },
+            "pickup_date": {
+                "type": "string",
+                "description": "The pickup date as YYYY-MM-DD."
+            },
+            "return_date": {
+                "type": "string",
+                "description": "The return date as YYYY-MM-DD."
             }
         },
-        "required": ["prefered_location"],
+        "required": ["prefered_location", "pickup_date", "return_date"],
         "additionalProperties": False
     }
 }
@@ -0,0 +1,276 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Optional
+from backend.codec import codec
+
+logger = logging.getLogger("bookings")
+
+class BookingRejected(Exception):
+    pass
+
+class BookingBackend(ABC):
+    # Database the booking writer flushes batches to, after they are in the local log
+
+    @abstractmethod
+    async def write(self, bookings: list[dict[str, Any]]):
+        ...
+
+    async def close(self):
+        pass
+
+class InMemoryBookingBackend(BookingBackend):
+    # Stand-in for the database in development and tests. latency delays every write and the next
+    # fail_writes writes raise, to exercise the writer's retries.
+
+    def __init__(self, latency: float = 0.0, fail_writes: int = 0):
+        self.latency = latency
+        self.fail_writes = fail_writes
+        self.bookings: dict[str, dict[str, Any]] = {}
+        self.writes = 0
+
+    async def write(self, bookings: list[dict[str, Any]]):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.fail_writes > 0:
+            self.fail_writes -= 1
+            raise ConnectionError("Injected booking backend failure")
+        self.writes += 1
+        for booking in bookings:
+            self.bookings[booking["id"]] = booking
+
+class CosmosBookingBackend(BookingBackend):
+    # Upserts bookings into the Cosmos DB container the infra provisions. Its partition key is /id,
+    # so a batch can't be one transactional batch and its items are upserted concurrently instead.
+    # The client is the process wide one from reportstore/cosmos.py, closed with close_clients().
+
+    def __init__(self, container: Any):
+        self.container = container
+
+    @classmethod
+    def from_environment(cls) -> "CosmosBookingBackend":
+        from reportstore.cosmos import container_client
+        return cls(container_client(os.environ.get("COSMOSDB_BOOKINGS_CONTAINER_NAME")))
+
+    async def write(self, bookings: list[dict[str, Any]]):
+        await asyncio.gather(*(self.container.upsert_item(booking) for booking in bookings))
+
+class BookingLog:
+    # Append-only JSON lines file, a batch is on disk before it is sent to the backend so bookings
+    # survive a restart or a database outage. Appends are blocking and run off the event loop.
+    # Once the log grows past max_bytes the store compacts it: the bookings still worth keeping are
+    # written to a snapshot next to it and the log starts over, so startup only reads what matters.
+
+    path: Path
+    snapshot_path: Path
+    max_bytes: int
+
+    def __init__(self, path: Path, max_bytes: int = 16 * 1024 * 1024):
+        self.path = Path(path)
+        self.snapshot_path = self.path.with_name(f"{self.path.stem}.snapshot{self.path.suffix}")
+        self.max_bytes = max_bytes
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def size(self) -> int:
+        try:
+            return self.path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def append(self, bookings: list[dict[str, Any]]):
+        with open(self.path, "ab") as file:
+            file.write(b"".join(codec.dumps_bytes(booking) + b"\n" for booking in bookings))
+            file.flush()
+            os.fsync(file.fileno())
+
+    def read(self) -> list[dict[str, Any]]:
+        # A crash between writing the snapshot and truncating the log leaves bookings in both
+        bookings: dict[str, dict[str, Any]] = {}
+        for path in (self.snapshot_path, self.path):
+            if not path.exists():
+                continue
+            with open(path, "rb") as file:
+                for line in file:
+                    if line.strip():
+                        booking = codec.loads(line)
+                        bookings[booking["id"]] = booking
+        return list(bookings.values())
+
+    def compact(self, keep: Callable[[dict[str, Any]], bool]) -> int:
+        # Blocking, rewrites the snapshot with the bookings to keep and empties the log. Returns the
+        # number of bookings kept.
+        kept = [booking for booking in self.read() if keep(booking)]
+        tmp_path = self.snapshot_path.with_name(self.snapshot_path.name + ".tmp")
+        with open(tmp_path, "wb") as file:
+            file.write(b"".join(codec.dumps_bytes(booking) + b"\n" for booking in kept))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        with open(self.path, "wb") as file:
+            os.fsync(file.fileno())
+        return len(kept)
+
+@dataclass
+class BookingStats:
+    submitted: int = 0
+    rejected: int = 0
+    written: int = 0
+    failed: int = 0
+    batches: int = 0
+    max_batch: int = 0
+    flush_seconds: float = 0.0
+    max_flush_seconds: float = 0.0
+    max_queue_depth: int = 0
+    compactions: int = 0
+
+class BookingStore:
+    # Write-behind store for confirmed bookings. submit() only enqueues, so a tool call never waits
+    # on the disk or the database. A writer task takes up to max_batch bookings, waiting at most
+    # max_delay for a batch to fill, appends them to the log and then writes them to the backend,
+    # retrying failed writes with backoff. A full queue rejects bookings rather than growing.
+    # retain decides which bookings survive a log compaction, the log is never compacted without it.
+
+    max_batch: int
+    max_delay: float
+    max_queue: int
+    retries: int = 3
+    retain: Optional[Callable[[dict[str, Any]], bool]]
+
+    def __init__(self, backend: Optional[BookingBackend] = None, log: Optional[BookingLog] = None, max_batch: int = 100, max_delay: float = 0.05, max_queue: int = 10000,
+                 retain: Optional[Callable[[dict[str, Any]], bool]] = None):
+        self.backend = backend
+        self.log = log
+        self.retain = retain
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_queue = max_queue
+        self.stats = BookingStats()
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_environment(cls, retain: Optional[Callable[[dict[str, Any]], bool]] = None) -> "BookingStore":
+        # BOOKINGS_BACKEND=cosmos writes to Cosmos DB, =memory to the in-memory fake, the log is
+        # always written unless BOOKINGS_LOG is set to an empty value and compacted beyond
+        # BOOKINGS_LOG_MAX_MB
+        backend_name = os.environ.get("BOOKINGS_BACKEND", "memory").lower()
+        backend = CosmosBookingBackend.from_environment() if backend_name == "cosmos" else InMemoryBookingBackend() if backend_name == "memory" else None
+        log_path = os.environ.get("BOOKINGS_LOG", str(Path(__file__).parent / "data" / "bookings.jsonl"))
+        log_max_bytes = int(float(os.environ.get("BOOKINGS_LOG_MAX_MB", "16")) * 1024 * 1024)
+        return cls(
+            backend,
+            BookingLog(Path(log_path), log_max_bytes) if log_path else None,
+            max_batch=int(os.environ.get("BOOKINGS_MAX_BATCH", "100")),
+            max_delay=int(os.environ.get("BOOKINGS_MAX_DELAY_MS", "50")) / 1000,
+            max_queue=int(os.environ.get("BOOKINGS_MAX_QUEUE", "10000")),
+            retain=retain,
+        )
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def submit(self, booking: dict[str, Any]) -> dict[str, Any]:
+        # Assigns the booking its id and timestamp and queues it, must be called on the event loop
+        if self._queue is None:
+            self._queue = asyncio.Queue(self.max_queue)
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._write_behind())
+        booking = {"id": uuid.uuid4().hex, "type": "booking", "created_at": time.time(), **booking}
+        try:
+            self._queue.put_nowait(booking)
+        except asyncio.QueueFull:
+            self.stats.rejected += 1
+            raise BookingRejected(f"{self.max_queue} bookings are waiting to be written")
+        self.stats.submitted += 1
+        self.stats.max_queue_depth = max(self.stats.max_queue_depth, self._queue.qsize())
+        return booking
+
+    async def _write_behind(self):
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                if queue.empty():
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    batch.append(queue.get_nowait())
+            try:
+                await self._flush(batch)
+                if self.log is not None and self.retain is not None and self.log.size > self.log.max_bytes:
+                    await self._compact()
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    async def _compact(self):
+        # Runs on the writer task, so no append can interleave with it
+        try:
+            kept = await asyncio.to_thread(self.log.compact, self.retain)
+        except Exception as e:
+            logger.error("Compacting the booking log failed: %s", e)
+            return
+        self.stats.compactions += 1
+        logger.info("Compacted the booking log, kept %d bookings", kept)
+
+    async def _flush(self, batch: list[dict[str, Any]]):
+        started = time.monotonic()
+        try:
+            if self.log is not None:
+                await asyncio.to_thread(self.log.append, batch)
+            if self.backend is not None:
+                await self._write_with_retries(batch)
+            self.stats.written += len(batch)
+        except Exception as e:
+            self.stats.failed += len(batch)
+            logger.error("Writing %d bookings failed: %s", len(batch), e)
+        elapsed = time.monotonic() - started
+        self.stats.batches += 1
+        self.stats.max_batch = max(self.stats.max_batch, len(batch))
+        self.stats.flush_seconds += elapsed
+        self.stats.max_flush_seconds = max(self.stats.max_flush_seconds, elapsed)
+
+    async def _write_with_retries(self, batch: list[dict[str, Any]]):
+        for attempt in range(self.retries + 1):
+            try:
+                await self.backend.write(batch)
+                return
+            except Exception as e:
+                if attempt == self.retries:
+                    raise
+                delay = 0.1 * 2 ** attempt
+                logger.warning("Booking backend write failed, retrying in %.1fs: %s", delay, e)
+                await asyncio.sleep(delay)
+
+    def snapshot(self) -> dict[str, Any]:
+        stats = asdict(self.stats)
+        stats["queue_depth"] = self.queue_depth
+        stats["mean_batch"] = round((self.stats.written + self.stats.failed) / self.stats.batches, 2) if self.stats.batches else 0.0
+        stats["mean_flush_ms"] = round(self.stats.flush_seconds / self.stats.batches * 1000, 3) if self.stats.batches else 0.0
+        stats["max_flush_ms"] = round(self.stats.max_flush_seconds * 1000, 3)
+        del stats["flush_seconds"], stats["max_flush_seconds"]
+        return stats
+
+    async def close(self):
+        # Writes what is still queued, then stops the writer
+        if self._queue is not None and self._writer is not None and not self._writer.done():
+            await self._queue.join()
+        if self._writer is not None:
+            self._writer.cancel()
+            await asyncio.gather(self._writer, return_exceptions=True)
+        if self.backend is not None:
+            await self.backend.close()
+        logger.info("Booking store closed: %s", self.snapshot())
@@ -0,0 +1,378 @@
+import argparse
+import asyncio
+import logging
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Iterable, Optional
+from backend.codec import codec
+from backend.rtmt import ToolResult, ToolResultDirection
+from reportstore.images import ImageVariants
+
+# Catalog documents share the reports container, partitioned by /id:
+#   catalog           {"id": "catalog", "categories": [category keys]}
+#   category:<key>    a category of categories.json with its variations, without their products
+#   variant:<key>     a variation with its products
+CATALOG_TYPES = ("catalog", "category", "variant")
+
+CATEGORIES_PATH = Path(__file__).parent / "categories.json"
+
+def catalog_key(name: str) -> str:
+    return "-".join(str(name).lower().split())
+
+def documents_from_categories(categories: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    # Splits categories.json into the documents above, e.g. to seed the container or the fake
+    documents = [{"id": "catalog", "type": "catalog", "categories": [catalog_key(item["category"]) for item in categories]}]
+    for item in categories:
+        variations = item.get("variations", [])
+        documents.append({
+            **{key: value for key, value in item.items() if key != "variations"},
+            "id": f"category:{catalog_key(item['category'])}",
+            "type": "category",
+            "variations": [{key: value for key, value in variation.items() if key != "products"} for variation in variations],
+        })
+        for variation in variations:
+            documents.append({
+                **variation,
+                "id": f"variant:{catalog_key(variation['name'])}",
+                "type": "variant",
+                "category": item["category"],
+                "products": variation.get("products", []),
+            })
+    return documents
+
+def load_categories(path: Path = CATEGORIES_PATH) -> list[dict[str, Any]]:
+    if not path.exists():
+        return []
+    with open(path, "r") as file:
+        return codec.load(file)
+
+async def seed(container: "CatalogContainer", categories: list[dict[str, Any]], concurrency: int = 16) -> int:
+    # Upserts the catalog documents of categories, returns how many were written
+    documents = documents_from_categories(categories)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def upsert(document: dict[str, Any]):
+        async with semaphore:
+            await container.upsert(document)
+
+    await asyncio.gather(*(upsert(document) for document in documents))
+    return len(documents)
+
+class CatalogContainer(ABC):
+    # Document access the catalog store needs, point reads by id (which is the partition key)
+
+    @abstractmethod
+    async def read(self, item_id: str) -> Optional[dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    async def read_many(self, item_ids: list[str]) -> list[dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    async def read_types(self, types: Iterable[str]) -> list[dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    async def upsert(self, item: dict[str, Any]):
+        ...
+
+class CosmosCatalogContainer(CatalogContainer):
+    def __init__(self, container: Any):
+        self.container = container
+
+    @classmethod
+    def from_environment(cls) -> "CosmosCatalogContainer":
+        from reportstore.cosmos import container_client
+        return cls(container_client(os.environ.get("COSMOSDB_CATALOG_CONTAINER_NAME")))
+
+    async def read(self, item_id: str) -> Optional[dict[str, Any]]:
+        from azure.cosmos.exceptions import CosmosResourceNotFoundError
+        try:
+            return await self.container.read_item(item=item_id, partition_key=item_id)
+        except CosmosResourceNotFoundError:
+            return None
+
+    async def read_many(self, item_ids: list[str]) -> list[dict[str, Any]]:
+        return await self._query("SELECT * FROM c WHERE ARRAY_CONTAINS(@ids, c.id)", [{"name": "@ids", "value": list(item_ids)}])
+
+    async def read_types(self, types: Iterable[str]) -> list[dict[str, Any]]:
+        return await self._query("SELECT * FROM c WHERE ARRAY_CONTAINS(@types, c.type)", [{"name": "@types", "value": list(types)}])
+
+    async def upsert(self, item: dict[str, Any]):
+        await self.container.upsert_item(item)
+
+    async def _query(self, query: str, parameters: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        return [item async for item in self.container.query_items(query=query, parameters=parameters)]
+
+class InMemoryCatalogContainer(CatalogContainer):
+    # Stand-in for the container in development, tests and benchmarks. Every request waits latency
+    # seconds, like a round trip to the database, and is counted.
+
+    def __init__(self, documents: Iterable[dict[str, Any]] = (), latency: float = 0.0):
+        self.items = {document["id"]: document for document in documents}
+        self.latency = latency
+        self.requests = 0
+
+    async def _round_trip(self):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def read(self, item_id: str) -> Optional[dict[str, Any]]:
+        await self._round_trip()
+        item = self.items.get(item_id)
+        # Callers own what they get, like a deserialized response
+        return codec.loads(codec.dumps(item)) if item is not None else None
+
+    async def read_many(self, item_ids: list[str]) -> list[dict[str, Any]]:
+        await self._round_trip()
+        return [codec.loads(codec.dumps(self.items[item_id])) for item_id in item_ids if item_id in self.items]
+
+    async def read_types(self, types: Iterable[str]) -> list[dict[str, Any]]:
+        await self._round_trip()
+        types = set(types)
+        return [codec.loads(codec.dumps(item)) for item in self.items.values() if item.get("type") in types]
+
+    async def upsert(self, item: dict[str, Any]):
+        await self._round_trip()
+        self.items[item["id"]] = item
+
+class TTLCache:
+    # In-process read-through cache with a time to live and LRU eviction. Misses are cached too,
+    # so a category the model made up doesn't cost a round trip on every mention, and concurrent
+    # misses of the same key share one load.
+
+    ttl: float
+    max_items: int
+
+    def __init__(self, ttl: float = 300.0, max_items: int = 10000):
+        self.ttl = ttl
+        self.max_items = max_items
+        self.hits = 0
+        self.misses = 0
+        self._items: OrderedDict[str, tuple[Any, float]] = OrderedDict()
+        self._loading: dict[str, asyncio.Future] = {}
+
+    def get(self, key: str) -> tuple[bool, Any]:
+        entry = self._items.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            return False, None
+        self._items.move_to_end(key)
+        return True, entry[0]
+
+    def set(self, key: str, value: Any):
+        if self.ttl <= 0:
+            return
+        self._items[key] = (value, time.monotonic() + self.ttl)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    async def get_or_load(self, key: str, load: Callable[[], Awaitable[Any]]) -> Any:
+        found, value = self.get(key)
+        if found:
+            self.hits += 1
+            return value
+        self.misses += 1
+        if key in self._loading:
+            return await asyncio.shield(self._loading[key])
+        future = self._loading[key] = asyncio.get_running_loop().create_future()
+        try:
+            value = await load()
+            self.set(key, value)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody else may be waiting for it
+            future.exception()
+            raise
+        finally:
+            del self._loading[key]
+
+class CosmosCatalogStore:
+    # Catalog tools served from Cosmos DB documents with the same tool interface as FileDBStore.
+    # Every document is read by id through the TTL cache, and preload() reads all catalog documents
+    # with one query at startup so the first conversations don't wait on the database.
+
+    def __init__(self, container: CatalogContainer, cache: Optional[TTLCache] = None):
+        self.logger = logging.getLogger("catalog")
+        self.container = container
+        self.cache = cache or TTLCache()
+        self.images = ImageVariants()
+
+    @classmethod
+    def from_environment(cls) -> "CosmosCatalogStore":
+        # CATALOG_STORE=cosmos reads the provisioned container, =memory a fake seeded from categories.json
+        if os.environ.get("CATALOG_STORE", "file").lower() == "cosmos":
+            container = CosmosCatalogContainer.from_environment()
+        else:
+            container = InMemoryCatalogContainer(documents_from_categories(load_categories()))
+        cache = TTLCache(
+            ttl=float(os.environ.get("CATALOG_CACHE_TTL", "300")),
+            max_items=int(os.environ.get("CATALOG_CACHE_MAX_ITEMS", "10000")),
+        )
+        return cls(container, cache)
+
+    async def preload(self) -> int:
+        documents = await self.container.read_types(CATALOG_TYPES)
+        for document in documents:
+            self.cache.set(document["id"], document)
+        if not documents:
+            self.logger.warning("No catalog documents found, seed them with python -m reportstore.catalog --seed")
+        else:
+            self.logger.info("Preloaded %d catalog documents", len(documents))
+        return len(documents)
+
+    async def get(self, item_id: str) -> Optional[dict[str, Any]]:
+        return await self.cache.get_or_load(item_id, lambda: self.container.read(item_id))
+
+    async def get_many(self, item_ids: list[str]) -> list[dict[str, Any]]:
+        # Cached documents plus one bulk read of the rest, in the order of item_ids
+        found: dict[str, Optional[dict[str, Any]]] = {}
+        missing = []
+        for item_id in item_ids:
+            hit, document = self.cache.get(item_id)
+            if hit:
+                found[item_id] = document
+            else:
+                missing.append(item_id)
+        self.cache.hits += len(found)
+        if missing:
+            self.cache.misses += len(missing)
+            loaded = {document["id"]: document for document in await self.container.read_many(missing)}
+            for item_id in missing:
+                found[item_id] = loaded.get(item_id)
+                self.cache.set(item_id, found[item_id])
+        return [found[item_id] for item_id in item_ids if found[item_id] is not None]
+
+    async def _categories(self) -> list[dict[str, Any]]:
+        catalog = await self.get("catalog")
+        return await self.get_many([f"category:{key}" for key in catalog["categories"]]) if catalog else []
+
+    async def _variants(self) -> list[dict[str, Any]]:
+        categories = await self._categories()
+        return await self.get_many([f"variant:{catalog_key(variation['name'])}" for item in categories for variation in item.get("variations", [])])
+
+    async def show_product_information(self, args: Any) -> ToolResult:
+        self.logger.debug("showing information", extra={"event": "tool_call"})
+        information = {
+            "title": args["title"],
+            "text": args["text"],
+            "image": args["image"]
+        }
+        # Return the result to the client
+        return ToolResult(information, ToolResultDirection.TO_CLIENT)
+
+    async def show_product_categories(self, args: Any) -> ToolResult:
+        self.logger.debug("showing product categories", extra={"event": "tool_call"})
+        product_categories = [
+            {"title": item.get("title", item["category"]), "text": item["text"], "image": self.images.resolve(item["image"])}
+            for item in await self._categories()
+        ]
+        return ToolResult(product_categories, ToolResultDirection.TO_CLIENT)
+
+    async def show_product_models(self, args: Any) -> ToolResult:
+        self.logger.debug("showing product models for %s", args, extra={"event": "tool_call"})
+        product_models = [
+            {"title": product["title"], "text": product["text"], "image": self.images.resolve(product["image"])}
+            for variant in await self._variants() for product in variant["products"]
+        ]
+        return ToolResult(product_models, ToolResultDirection.TO_CLIENT)
+
+    async def get_available_categories(self, args: Any) -> ToolResult:
+        self.logger.debug("retreiving available categories %s", args, extra={"event": "tool_call"})
+        responses = [
+            {
+                "category_description": item["description"],
+                "image": self.images.resolve(item["image"]),
+                "text": item["text"],
+                "category_name": item["category"],
+                "question": item.get("question"),
+            }
+            for item in await self._categories()
+        ]
+        return ToolResult(responses, ToolResultDirection.TO_SERVER)
+
+    async def get_product_variants_by_category(self, args: Any) -> ToolResult:
+        category = args.get("category", "")
+        self.logger.debug("retreiving category: %s", category, extra={"event": "tool_call"})
+        item = await self.get(f"category:{catalog_key(category)}")
+        responses = [
+            {
+                "name": variation["name"],
+                "description": variation.get("description"),
+                "image": self.images.resolve(variation["image"]),
+                "text": variation.get("text"),
+                "category": item["category"],
+            }
+            for variation in (item or {}).get("variations", [])
+        ]
+        return ToolResult(responses, ToolResultDirection.TO_SERVER)
+
+    async def get_product_models_by_variant(self, args: Any) -> ToolResult:
+        # The schema names the argument category but requires variant, accept both
+        variant_name = args.get("variant") or args.get("category") or ""
+        self.logger.debug("retreiving variants: %s", variant_name, extra={"event": "tool_call"})
+        variant = await self.get(f"variant:{catalog_key(variant_name)}")
+        responses = [
+            {"id": product.get("id"), "title": product["title"], "text": product["text"], "image": self.images.resolve(product["image"])}
+            for product in (variant or {}).get("products", [])
+        ]
+        return ToolResult(responses, ToolResultDirection.TO_SERVER)
+
+    def attach_to_app(self, app: Any):
+        async def on_startup(app):
+            if os.environ.get("CATALOG_PRELOAD", "true").lower() in ("1", "true", "yes"):
+                try:
+                    await self.preload()
+                except Exception as e:
+                    # Tools read through the cache on demand instead
+                    self.logger.warning("Catalog preload failed: %s", e)
+
+        async def on_cleanup(app):
+            from reportstore.cosmos import close_clients
+            await close_clients()
+
+        app.on_startup.append(on_startup)
+        app.on_cleanup.append(on_cleanup)
+
+def create_catalog_store(app: Any) -> Any:
+    # CATALOG_STORE=cosmos or =memory serves the catalog tools from CosmosCatalogStore, the
+    # default keeps reading the local categories.json with FileDBStore
+    if os.environ.get("CATALOG_STORE", "file").lower() in ("cosmos", "memory"):
+        store = CosmosCatalogStore.from_environment()
+        store.attach_to_app(app)
+        return store
+    from reportstore.filedb import FileDBStore
+    return FileDBStore()
+
+async def _seed_cosmos(path: Path) -> int:
+    from reportstore.cosmos import close_clients
+    try:
+        return await seed(CosmosCatalogContainer.from_environment(), load_categories(path))
+    finally:
+        await close_clients()
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description="Manage the catalog documents in the Cosmos DB container.")
+    parser.add_argument("--seed", action="store_true", help="Upsert the catalog documents of the categories file")
+    parser.add_argument("--categories", type=Path, default=CATEGORIES_PATH, help="Categories file to seed from")
+    args = parser.parse_args(argv)
+    if not args.seed:
+        parser.error("nothing to do, pass --seed")
+    if not args.categories.exists():
+        parser.error(f"{args.categories} does not exist")
+    logging.basicConfig(level=logging.INFO)
+    count = asyncio.run(_seed_cosmos(args.categories))
+    print(f"Upserted {count} catalog documents from {args.categories}")
+
+if __name__ == "__main__":
+    main()
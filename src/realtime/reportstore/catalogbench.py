@@ -0,0 +1,87 @@
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from typing import Optional
+from reportstore.catalog import CosmosCatalogStore, InMemoryCatalogContainer, TTLCache, documents_from_categories
+
+# Catalog tool latency against a container with a simulated round trip, without a cache, with the
+# read-through cache and with the cache preloaded at startup:
+#   python -m reportstore.catalogbench [--latency-ms 8] [--sessions 50] [--json]
+
+def _categories(count: int, variations: int, products: int) -> list[dict]:
+    return [{
+        "category": f"Category {c}",
+        "title": f"Category {c}",
+        "description": "A category of the benchmark catalog. " * 10,
+        "text": "Benchmark category",
+        "question": "Which one do you like?",
+        "image": "https://example.com/category.png",
+        "variations": [{
+            "name": f"Variant {c}-{v}",
+            "description": "A variant of the benchmark catalog. " * 10,
+            "text": "Benchmark variant",
+            "image": "https://example.com/variant.png",
+            "products": [{"id": f"{c}-{v}-{p}", "title": f"Model {c}-{v}-{p}", "text": "Benchmark model", "image": "https://example.com/model.png"} for p in range(products)],
+        } for v in range(variations)],
+    } for c in range(count)]
+
+async def _session(store: CosmosCatalogStore, rng: random.Random, categories: int, variations: int, turns: int, latencies: list[float]):
+    # Roughly what one conversation asks for, with the odd name the catalog doesn't have
+    for _ in range(turns):
+        category, variant = rng.randrange(categories + 1), rng.randrange(variations)
+        for call, args in (
+            (store.get_available_categories, {}),
+            (store.get_product_variants_by_category, {"category": f"Category {category}"}),
+            (store.get_product_models_by_variant, {"variant": f"Variant {category}-{variant}"}),
+            (store.show_product_models, {}),
+        ):
+            started = time.perf_counter()
+            await call(args)
+            latencies.append(time.perf_counter() - started)
+
+async def _scenario(name: str, documents: list[dict], args: argparse.Namespace) -> dict:
+    container = InMemoryCatalogContainer(documents, latency=args.latency_ms / 1000)
+    store = CosmosCatalogStore(container, TTLCache(ttl=0 if name == "uncached" else 300))
+    store.images.resolve = lambda url: url
+    if name == "preloaded":
+        await store.preload()
+        container.requests = 0
+    latencies: list[float] = []
+    rng = random.Random(3)
+    started = time.perf_counter()
+    await asyncio.gather(*(_session(store, random.Random(rng.random()), args.categories, args.variations, args.turns, latencies) for _ in range(args.sessions)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "scenario": name,
+        "calls_per_second": round(len(latencies) / elapsed),
+        "p50_ms": round(statistics.median(latencies) * 1000, 3),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 3),
+        "database_requests": container.requests,
+        "cache_hit_rate": round(store.cache.hits / max(1, store.cache.hits + store.cache.misses), 3),
+    }
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark the Cosmos DB catalog store against an in-memory container.")
+    parser.add_argument("--latency-ms", type=float, default=8.0, help="Simulated database round trip")
+    parser.add_argument("--sessions", type=int, default=50, help="Concurrent conversations")
+    parser.add_argument("--turns", type=int, default=5, help="Tool call rounds per conversation")
+    parser.add_argument("--categories", type=int, default=8)
+    parser.add_argument("--variations", type=int, default=6)
+    parser.add_argument("--products", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args(argv)
+    documents = documents_from_categories(_categories(args.categories, args.variations, args.products))
+    results = [asyncio.run(_scenario(name, documents, args)) for name in ("uncached", "read_through", "preloaded")]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'scenario':<14} {'calls/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'db requests':>12} {'hit rate':>9}")
+    for r in results:
+        print(f"{r['scenario']:<14} {r['calls_per_second']:>9} {r['p50_ms']:>8} {r['p95_ms']:>8} {r['database_requests']:>12} {r['cache_hit_rate']:>9}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import logging
+import os
+from typing import Any, Optional
+
+logger = logging.getLogger("cosmos")
+
+# One async client per account for the whole process, it owns the connection pool and the
+# account's routing map, so stores share it instead of paying the TLS and metadata setup per store
+_clients: dict[str, Any] = {}
+# Async token credentials the clients were created with, they hold their own HTTP sessions
+_credentials: list[Any] = []
+
+def _credential() -> Any:
+    # The aio client takes the account key as a plain string, and it can only await an async token
+    # credential, so backend.startup.create_credential doesn't fit here
+    if key := os.environ.get("COSMOSDB_ACCOUNT_KEY"):
+        return key
+    from azure.identity.aio import AzureDeveloperCliCredential, DefaultAzureCredential
+    if tenant_id := os.environ.get("AZURE_TENANT_ID"):
+        credential = AzureDeveloperCliCredential(tenant_id=tenant_id, process_timeout=60)
+    else:
+        credential = DefaultAzureCredential()
+    _credentials.append(credential)
+    return credential
+
+def shared_client(endpoint: Optional[str] = None) -> Any:
+    endpoint = endpoint or os.environ["COSMOSDB_ACCOUNT_ENDPOINT"]
+    if endpoint not in _clients:
+        from azure.cosmos.aio import CosmosClient
+        logger.info("Connecting to Cosmos DB at %s", endpoint)
+        _clients[endpoint] = CosmosClient(endpoint, credential=_credential())
+    return _clients[endpoint]
+
+def container_client(container: Optional[str] = None, database: Optional[str] = None, endpoint: Optional[str] = None) -> Any:
+    # Defaults to the database and container the infra provisions
+    database_client = shared_client(endpoint).get_database_client(database or os.environ.get("COSMOSDB_DATABASE_NAME", "mobile"))
+    return database_client.get_container_client(container or os.environ.get("COSMOSDB_CONTAINER_NAME", "reports"))
+
+async def close_clients():
+    clients = list(_clients.values())
+    _clients.clear()
+    credentials = list(_credentials)
+    _credentials.clear()
+    for client in clients:
+        await client.close()
+    for credential in credentials:
+        await credential.close()
@@ -1,10 +1,11 @@
 import os
 import logging
-import json
 from logging import INFO
 from typing import Any
 from typing import List, Optional, Union, TYPE_CHECKING
+from backend.codec import codec
 from backend.rtmt import RTMiddleTier, Tool, ToolResult, ToolResultDirection
+from reportstore.images import ImageVariants
 
 class FileDBStore:
     logging.basicConfig(level=logging.INFO)
@@ -13,7 +14,7 @@ class FileDBStore:
 
     def load_from_file(self, file_path: str):
         with open(file_path, "r") as file:
-            return json.load(file)
+            return codec.load(file)
 
     def init_data(self):
         self.logger.info("Creating container in database")
@@ -24,10 +25,11 @@ class FileDBStore:
     def __init__(self):
         self.logger = logging.getLogger("filedb")
         self.logger.info("Initializing FileDBStore")
+        self.images = ImageVariants()
         self.init_data()  
     
     async def show_product_information(self, args: Any) -> ToolResult:
-        print("showing information")
+        self.logger.debug("showing information", extra={"event": "tool_call"})
         information = {
             "title": args["title"],
             "text": args["text"],
@@ -37,7 +39,7 @@ class FileDBStore:
         return ToolResult(information, ToolResultDirection.TO_CLIENT)
     
     async def show_product_categories(self, args: Any) -> ToolResult:
-        print("showing product categories")
+        self.logger.debug("showing product categories", extra={"event": "tool_call"})
 
         product_categories = []
 
@@ -45,14 +47,14 @@ class FileDBStore:
             option = {}
             option["title"] = item["title"]
             option["text"] = item["text"]
-            option["image"] = item["image"]
+            option["image"] = self.images.resolve(item["image"])
             product_categories.append(option)
 
         # Return the result to the client
         return ToolResult(product_categories, ToolResultDirection.TO_CLIENT)
     
     async def show_product_models(self, args: Any) -> ToolResult:
-        print("showing product models for ", args)
+        self.logger.debug("showing product models for %s", args, extra={"event": "tool_call"})
 
         product_models = []
 
@@ -62,38 +64,37 @@ class FileDBStore:
                     if ("products" in varation):
                         # print(varation)
                         for product in varation["products"]:
-                            print(product)
                             option = {}
                             option["title"] = product["title"]
                             option["text"] = product["text"]
-                            option["image"] = product["image"]
+                            option["image"] = self.images.resolve(product["image"])
                             product_models.append(option)  
         
         # Return the result to the client
         return ToolResult(product_models, ToolResultDirection.TO_CLIENT)
     
     async def get_available_categories(self, args: Any) -> ToolResult:
-        print("retreiving available categories", args)
+        self.logger.debug("retreiving available categories %s", args, extra={"event": "tool_call"})
 
         responses = []
         try:
             for item in self.categories:
                 option = {}
                 option["category_description"] = item["description"]
-                option["image"] = item["image"]
+                option["image"] = self.images.resolve(item["image"])
                 option["text"] = item["text"]
                 option["category_name"] = item["category"]
                 option["question"] = item["question"]
                 responses.append(option)
         except Exception as e:
-            print(e)
+            self.logger.exception("Failed to retrieve available categories: %s", e)
             return ToolResult("Error", ToolResultDirection.TO_SERVER)
         
         return ToolResult(responses, ToolResultDirection.TO_SERVER)
 
     async def get_product_variants_by_category(self, args: Any) -> ToolResult:
         category = args["category"].lower()
-        print("retreiving category: ", category)
+        self.logger.debug("retreiving category: %s", category, extra={"event": "tool_call"})
 
         responses = []
 
@@ -154,7 +155,7 @@ class FileDBStore:
             
     async def get_product_models_by_variant(self, args: Any) -> ToolResult:
         # variant = args["variant"].lower().strip()
-        print("retreiving variants: ", args)
+        self.logger.debug("retreiving variants: %s", args, extra={"event": "tool_call"})
 
         responses = [
                     {
@@ -0,0 +1,48 @@
+import os
+import logging
+from pathlib import Path
+from typing import Optional
+from backend.codec import codec
+
+DEFAULT_STATIC_DIRECTORY = Path(__file__).parent.parent / "static"
+
+class ImageVariants:
+    # Maps catalog image urls under /static/ to the web variants written by src/image/postprocess.py.
+    # Every directory that has been post-processed contains a variants.json manifest, images without
+    # an entry keep their original url.
+
+    def __init__(self, static_directory: Path = DEFAULT_STATIC_DIRECTORY, variant: Optional[str] = None, formats: Optional[list[str]] = None):
+        self.logger = logging.getLogger("imagevariants")
+        self.static_directory = Path(static_directory)
+        self.variant = variant or os.environ.get("IMAGE_VARIANT", "card")
+        self.formats = formats or os.environ.get("IMAGE_VARIANT_FORMATS", "webp").split(",")
+        self._manifests: dict[str, dict] = {}
+        self._resolved: dict[str, str] = {}
+
+    def _manifest(self, directory: str) -> dict:
+        if directory not in self._manifests:
+            manifest_path = self.static_directory / directory / "variants.json"
+            manifest = {}
+            if manifest_path.exists():
+                try:
+                    with open(manifest_path, "r") as file:
+                        manifest = codec.load(file)
+                except (OSError, ValueError) as e:
+                    self.logger.warning("Ignoring unreadable image manifest %s: %s", manifest_path, e)
+            self._manifests[directory] = manifest
+        return self._manifests[directory]
+
+    def resolve(self, url: str) -> str:
+        if url in self._resolved:
+            return self._resolved[url]
+        resolved = url
+        prefix, marker, relative = url.partition("/static/")
+        if marker:
+            directory, _, filename = relative.rpartition("/")
+            formats = self._manifest(directory).get(filename, {}).get(self.variant, {})
+            for fmt in self.formats:
+                if fmt in formats:
+                    resolved = prefix + marker + (directory + "/" if directory else "") + formats[fmt]
+                    break
+        self._resolved[url] = resolved
+        return resolved
@@ -0,0 +1,219 @@
+import math
+import re
+import unicodedata
+from bisect import bisect_right
+from datetime import date
+from heapq import heappush, heappushpop
+from typing import Any, Iterable, Optional
+
+EARTH_RADIUS_KM = 6371.0
+
+# Anchored on both ends, so house numbers and postcodes like "120, 40474" don't match part of a number
+_COORDINATES = re.compile(r"(?<![\d.])(-?\d{1,2}(?:\.\d+)?)\s*,\s*(-?\d{1,3}(?:\.\d+)?)(?![\d.])")
+
+def normalize(text: str) -> str:
+    # "Düsseldorf" and "Dusseldorf" match, spoken input rarely has the umlauts right
+    text = unicodedata.normalize("NFKD", text.lower().replace("ß", "ss"))
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+def unit_vector(lat: float, lon: float) -> tuple[float, float, float]:
+    phi, lam = math.radians(lat), math.radians(lon)
+    return (math.cos(phi) * math.cos(lam), math.cos(phi) * math.sin(lam), math.sin(phi))
+
+def chord_to_km(chord: float) -> float:
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2))
+
+def parse_day(value: Any) -> Optional[int]:
+    # ISO date -> day number, None for anything else the model came up with
+    if not isinstance(value, str):
+        return None
+    try:
+        return date.fromisoformat(value.strip()[:10]).toordinal()
+    except ValueError:
+        return None
+
+class GeoIndex:
+    # Static k-d tree over points on the unit sphere. The chord between two unit vectors grows with
+    # the great circle distance, so the nearest points by chord are the nearest on the globe and
+    # there is no special casing of the date line or the poles. The tree is stored implicitly: the
+    # median of every range of _order is the node, the halves left and right of it its subtrees.
+
+    def __init__(self, coordinates: Iterable[tuple[float, float]]):
+        self._points = [unit_vector(lat, lon) for lat, lon in coordinates]
+        self._order = list(range(len(self._points)))
+        self._build(0, len(self._order), 0)
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def _build(self, lo: int, hi: int, axis: int):
+        if hi - lo <= 1:
+            return
+        points = self._points
+        self._order[lo:hi] = sorted(self._order[lo:hi], key=lambda i: points[i][axis])
+        mid = (lo + hi) // 2
+        self._build(lo, mid, (axis + 1) % 3)
+        self._build(mid + 1, hi, (axis + 1) % 3)
+
+    def nearest(self, lat: float, lon: float, k: int = 1) -> list[tuple[int, float]]:
+        # The k nearest points as (index, distance in km), closest first
+        if k <= 0 or not self._points:
+            return []
+        query = unit_vector(lat, lon)
+        points, order = self._points, self._order
+        # Max-heap of the best k by negated squared chord
+        best: list[tuple[float, int]] = []
+
+        def visit(lo: int, hi: int, axis: int):
+            if lo >= hi:
+                return
+            mid = (lo + hi) // 2
+            index = order[mid]
+            point = points[index]
+            d2 = (query[0] - point[0]) ** 2 + (query[1] - point[1]) ** 2 + (query[2] - point[2]) ** 2
+            if len(best) < k:
+                heappush(best, (-d2, index))
+            elif d2 < -best[0][0]:
+                heappushpop(best, (-d2, index))
+            diff = query[axis] - point[axis]
+            near, far = ((lo, mid), (mid + 1, hi)) if diff < 0 else ((mid + 1, hi), (lo, mid))
+            next_axis = (axis + 1) % 3
+            visit(near[0], near[1], next_axis)
+            if len(best) < k or diff * diff < -best[0][0]:
+                visit(far[0], far[1], next_axis)
+
+        visit(0, len(order), 0)
+        return [(index, chord_to_km(math.sqrt(-d2))) for d2, index in sorted(best, reverse=True)]
+
+class Reservations:
+    # Reservations of one car as half-open day ranges [start, end), kept sorted and non-overlapping
+    # so both starts and ends are ascending and a range is checked with one binary search.
+    # Returning a car on the day it is picked up again is allowed.
+
+    __slots__ = ("starts", "ends")
+
+    def __init__(self):
+        self.starts: list[int] = []
+        self.ends: list[int] = []
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def is_free(self, start: int, end: int) -> bool:
+        # The first reservation ending after start is the only one that can overlap
+        i = bisect_right(self.ends, start)
+        return i == len(self.starts) or self.starts[i] >= end
+
+    def reserve(self, start: int, end: int) -> bool:
+        i = bisect_right(self.ends, start)
+        if i < len(self.starts) and self.starts[i] < end:
+            return False
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+        return True
+
+    def release(self, start: int, end: int) -> bool:
+        i = bisect_right(self.ends, start)
+        if i < len(self.starts) and self.starts[i] == start and self.ends[i] == end:
+            del self.starts[i], self.ends[i]
+            return True
+        return False
+
+class Inventory:
+    # Stations in a GeoIndex, and per station the cars of every model with their reservations.
+    # Availability only looks at the fleet of one station, a query over a pickup/return range
+    # costs a binary search per car there. A rental returned on its pickup day holds the car for
+    # that day, longer rentals free it on the return day.
+
+    stations: list[dict[str, Any]]
+
+    def __init__(self, stations: list[dict[str, Any]], places: Optional[dict[str, Iterable[float]]] = None):
+        self.stations = stations
+        self.geo = GeoIndex((station["lat"], station["lon"]) for station in stations)
+        self.places = {normalize(name): (float(lat), float(lon)) for name, (lat, lon) in (places or {}).items()}
+        self._station_names = {normalize(station["name"]): i for i, station in enumerate(stations)}
+        self._station_ids = {str(station["id"]): i for i, station in enumerate(stations)}
+        self._fleet: list[dict[str, list[tuple[str, Reservations]]]] = [{} for _ in stations]
+        self._cars: dict[str, tuple[int, str, Reservations]] = {}
+
+    @classmethod
+    def generate(cls, stations: list[dict[str, Any]], places: Optional[dict[str, Iterable[float]]], model_ids: Iterable[str], cars_per_model: int) -> "Inventory":
+        # Same number of cars of every model at every station, ids are station-model-number
+        inventory = cls(stations, places)
+        model_ids = list(model_ids)
+        for station in stations:
+            for model_id in model_ids:
+                for number in range(cars_per_model):
+                    inventory.add_car(f"{station['id']}-{model_id}-{number}", model_id, str(station["id"]))
+        return inventory
+
+    def __len__(self) -> int:
+        return len(self._cars)
+
+    def add_car(self, car_id: str, model_id: str, station_id: str) -> Reservations:
+        station = self._station_ids[station_id]
+        reservations = Reservations()
+        self._fleet[station].setdefault(model_id, []).append((car_id, reservations))
+        self._cars[car_id] = (station, model_id, reservations)
+        return reservations
+
+    def locate(self, text: str) -> Optional[tuple[float, float]]:
+        # Coordinates for a station name, a known place or "lat, lon" mentioned in text. Names come
+        # first, addresses have numbers in them that could pass for coordinates.
+        if (station := self.find_station(text, nearest=False)) is not None:
+            return self.stations[station]["lat"], self.stations[station]["lon"]
+        query = normalize(text)
+        matches = [name for name in self.places if re.search(r"\b%s\b" % re.escape(name), query)]
+        if matches:
+            return self.places[max(matches, key=len)]
+        for match in _COORDINATES.finditer(text):
+            lat, lon = float(match.group(1)), float(match.group(2))
+            if -90 <= lat <= 90 and -180 <= lon <= 180:
+                return lat, lon
+        return None
+
+    def find_station(self, text: str, nearest: bool = True) -> Optional[int]:
+        # Index of the station with exactly this name (ignoring case and accents) or id, else the one
+        # nearest to the place in text. "Berlin" is a place, not the station "Berlin Tegel Airport".
+        text = str(text).strip()
+        if text in self._station_ids:
+            return self._station_ids[text]
+        if (index := self._station_names.get(normalize(text))) is not None:
+            return index
+        if nearest and (location := self.locate(text)) is not None:
+            found = self.geo.nearest(location[0], location[1], 1)
+            return found[0][0] if found else None
+        return None
+
+    def nearest_stations(self, lat: float, lon: float, k: int) -> list[tuple[dict[str, Any], float]]:
+        return [(self.stations[index], distance) for index, distance in self.geo.nearest(lat, lon, k)]
+
+    @staticmethod
+    def _days(start: int, end: int) -> tuple[int, int]:
+        # Pickup and return day -> reserved half-open range, a same-day rental takes up its day
+        return start, max(end, start + 1)
+
+    def available(self, station: int, start: int, end: int) -> dict[str, int]:
+        # Model id -> number of cars at the station free from pickup day start to return day end
+        start, end = self._days(start, end)
+        return {
+            model_id: free
+            for model_id, cars in self._fleet[station].items()
+            if (free := sum(1 for _, reservations in cars if reservations.is_free(start, end))) > 0
+        }
+
+    def reserve(self, station: int, model_id: str, start: int, end: int) -> Optional[str]:
+        # Books the first free car of the model, returns its id or None if all are taken
+        start, end = self._days(start, end)
+        for car_id, reservations in self._fleet[station].get(model_id, ()):
+            if reservations.reserve(start, end):
+                return car_id
+        return None
+
+    def reserve_car(self, car_id: str, start: int, end: int) -> bool:
+        entry = self._cars.get(car_id)
+        return entry is not None and entry[2].reserve(*self._days(start, end))
+
+    def release(self, car_id: str, start: int, end: int) -> bool:
+        entry = self._cars.get(car_id)
+        return entry is not None and entry[2].release(*self._days(start, end))
@@ -0,0 +1,108 @@
+import argparse
+import json
+import math
+import random
+import time
+from typing import Callable, Optional
+from reportstore.inventory import EARTH_RADIUS_KM, Inventory
+
+# Location search and availability of the rental inventory at fleet scale, against the linear scans
+# they replace:
+#   python -m reportstore.inventorybench [--cars 100000] [--stations 2000] [--json]
+
+# Roughly Germany
+_LAT, _LON = (47.3, 55.0), (5.9, 15.0)
+
+def _haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = math.sin((phi2 - phi1) / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+def _per_second(queries: list, run: Callable, seconds: float) -> float:
+    count = 0
+    deadline = time.perf_counter() + seconds
+    started = time.perf_counter()
+    while time.perf_counter() < deadline:
+        for query in queries:
+            run(query)
+        count += len(queries)
+    return count / (time.perf_counter() - started)
+
+def build(cars: int, stations: int, models: int, reservations: int, seed: int = 7) -> tuple[Inventory, list[tuple[int, str, list[tuple[int, int]]]]]:
+    # The inventory, plus the same fleet as (station, model, reservations) rows for the linear scans
+    rng = random.Random(seed)
+    station_rows = [{"id": str(i), "name": f"Station {i}", "lat": rng.uniform(*_LAT), "lon": rng.uniform(*_LON)} for i in range(stations)]
+    inventory = Inventory(station_rows)
+    fleet = []
+    for number in range(cars):
+        station, model = rng.randrange(stations), str(rng.randrange(models))
+        booked = inventory.add_car(str(number), model, str(station))
+        day = rng.randrange(14)
+        for _ in range(reservations):
+            # Rentals of 1-7 days with gaps of 0-14 days, roughly a year per car
+            start, day = day, day + rng.randint(1, 7)
+            booked.reserve(start, day)
+            day += rng.randrange(15)
+        fleet.append((station, model, list(zip(booked.starts, booked.ends))))
+    return inventory, fleet
+
+def run(cars: int, stations: int, models: int, reservations: int, seconds: float, k: int = 5) -> dict:
+    started = time.perf_counter()
+    inventory, fleet = build(cars, stations, models, reservations)
+    build_seconds = time.perf_counter() - started
+
+    rng = random.Random(11)
+    points = [(rng.uniform(*_LAT), rng.uniform(*_LON)) for _ in range(200)]
+    ranges = [(rng.randrange(stations), day, day + rng.randint(1, 14)) for day in (rng.randrange(300) for _ in range(200))]
+
+    def nearest_scan(point):
+        return sorted(range(stations), key=lambda i: _haversine_km(point[0], point[1], inventory.stations[i]["lat"], inventory.stations[i]["lon"]))[:k]
+
+    def available_scan(query):
+        station, start, end = query
+        free: dict[str, int] = {}
+        for car_station, model, booked in fleet:
+            if car_station == station and all(e <= start or s >= end for s, e in booked):
+                free[model] = free.get(model, 0) + 1
+        return free
+
+    # Same answers as the scans
+    for point in points[:20]:
+        assert [index for index, _ in inventory.geo.nearest(point[0], point[1], k)] == nearest_scan(point)
+    for query in ranges[:5]:
+        assert inventory.available(*query) == available_scan(query)
+
+    results = {
+        "cars": cars,
+        "stations": stations,
+        "reservations": sum(len(booked) for _, _, booked in fleet),
+        "build_seconds": round(build_seconds, 3),
+        "nearest_per_second": round(_per_second(points, lambda point: inventory.geo.nearest(point[0], point[1], k), seconds)),
+        "nearest_scan_per_second": round(_per_second(points, nearest_scan, seconds)),
+        "available_per_second": round(_per_second(ranges, lambda query: inventory.available(*query), seconds)),
+        "available_scan_per_second": round(_per_second(ranges[:20], available_scan, seconds)),
+    }
+    results["nearest_speedup"] = round(results["nearest_per_second"] / results["nearest_scan_per_second"], 1)
+    results["available_speedup"] = round(results["available_per_second"] / results["available_scan_per_second"], 1)
+    return results
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark location search and availability of the rental inventory.")
+    parser.add_argument("--cars", type=int, default=100000, help="Fleet size")
+    parser.add_argument("--stations", type=int, default=2000, help="Number of stations")
+    parser.add_argument("--models", type=int, default=4, help="Number of car models")
+    parser.add_argument("--reservations", type=int, default=40, help="Reservations per car")
+    parser.add_argument("--seconds", type=float, default=1.0, help="Duration of each measurement")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args(argv)
+    results = run(args.cars, args.stations, args.models, args.reservations, args.seconds)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{results['cars']} cars at {results['stations']} stations with {results['reservations']} reservations, built in {results['build_seconds']}s")
+    print(f"{'query':<12} {'indexed/s':>12} {'scan/s':>12} {'speedup':>8}")
+    print(f"{'nearest':<12} {results['nearest_per_second']:>12} {results['nearest_scan_per_second']:>12} {results['nearest_speedup']:>8}")
+    print(f"{'available':<12} {results['available_per_second']:>12} {results['available_scan_per_second']:>12} {results['available_speedup']:>8}")
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,51 @@
 import os
 import logging
-import json
+from datetime import date
 from logging import INFO
 from typing import Any
 from typing import List, Optional, Union, TYPE_CHECKING
+from backend.codec import codec
 from backend.rtmt import RTMiddleTier, Tool, ToolResult, ToolResultDirection
+from reportstore.bookings import BookingRejected, BookingStore
+from reportstore.cosmos import close_clients
+from reportstore.images import ImageVariants
+from reportstore.inventory import Inventory, normalize, parse_day
 
 class RentalDBStore:
     logging.basicConfig(level=logging.INFO)
 
+    cars = []
+
+    # Number of stations get_available_locations proposes, closest first
+    nearest_locations = 5
+
+    def load_from_file(self, file_path: str):
+        with open(file_path, "r", encoding="utf-8") as file:
+            return codec.load(file)
+
+    def init_data(self):
+        cars_path = os.path.join(os.path.dirname(__file__), 'cars.json')
+        self.cars = self.load_from_file(cars_path)
+        stations = self.load_from_file(os.path.join(os.path.dirname(__file__), 'stations.json'))
+        # Until there is a fleet database every station has RENTAL_CARS_PER_MODEL cars of each model
+        cars_per_model = int(os.environ.get("RENTAL_CARS_PER_MODEL", "3"))
+        self.inventory = Inventory.generate(stations["stations"], stations["places"], [car["id"] for car in self.cars], cars_per_model)
+        if self.bookings.log is not None:
+            # Cars booked before a restart stay booked
+            for booking in self.bookings.log.read():
+                if booking.get("car_id") is not None:
+                    self.inventory.reserve_car(booking["car_id"], parse_day(booking["pickup_date"]), parse_day(booking["return_date"]))
+
     def __init__(self):
         self.logger = logging.getLogger("rentaldb")
         self.logger.info("Initializing rentaldb")
+        self.images = ImageVariants()
+        self.bookings = BookingStore.from_environment(retain=self._booking_active)
+        self.init_data()
    
 
     async def show_product_information(self, args: Any) -> ToolResult:
-        print("showing information")
+        self.logger.debug("showing information", extra={"event": "tool_call"})
         information = {
             "title": args["title"],
             "text": args["text"],
@@ -27,98 +57,83 @@ class RentalDBStore:
 
 
     async def get_available_locations(self, args: Any) -> ToolResult:
-        print("retreiving available locations", args)
-
-        responses = [
-                {
-                    "id": "1",
-                    "name": "Düsseldorf Airport",
-                    "title": "Düsseldorf Airport",
-                    "image": "https://www.dus.com/-/media/dus/businesspartner/aviation/general-aviation/executive_terminal_1920x1080px.ashx",
-                    "address": "Flughafenstraße 120, 40474 Düsseldorf, Germany",
-                    "distance": "30 km",
-                    "opening_hours": "Mo - So 06:00 - 23:30"
-                },
-                {
-                    "id": "2",
-                    "name": "Cologne Central Station",
-                    "address": "Trankgasse 11, 50667 Köln, Germany",
-                    "distance": "25 km",
-                    "opening_hours": "Mo - So 05:00 - 22:00"
-                },
-                {
-                    "id": "3",
-                    "name": "Frankfurt Main Airport",
-                    "address": "60547 Frankfurt am Main, Germany",
-                    "distance": "120 km",
-                    "opening_hours": "Mo - So 24/7"
-                },
-                {
-                    "id": "4",
-                    "name": "Berlin Tegel Airport",
-                    "address": "Friedrichstraße 50, 10117 Berlin, Germany",
-                    "distance": "650 km",
-                    "opening_hours": "Mo - So 24/7"
-                },
-                {
-                    "id": "5",
-                    "name": "Munich Central Station",
-                    "address": "Bahnhofplatz 1, 80335 München, Germany",
-                    "distance": "500 km",
-                    "opening_hours": "Mo - So 04:00 - 01:00"
-                }
-            ]
-        
+        self.logger.debug("retreiving available locations %s", args, extra={"event": "tool_call"})
+
+        location = self.inventory.locate(args.get("prefered_location") or "")
+        if location is None:
+            # Unknown place, offer every station and let the model ask for a city
+            responses = [self._station(station) for station in self.inventory.stations]
+        else:
+            responses = [self._station(station, distance) for station, distance in self.inventory.nearest_stations(*location, self.nearest_locations)]
+
         return ToolResult(responses, ToolResultDirection.TO_SERVER)
 
     async def get_available_cars(self, args: Any) -> ToolResult:
-        print("retreiving available cars", args)
-
-        responses = [
-                {
-                    "id": "1",
-                    "name": "SUV",
-                    "title": "SUV",
-                    "image": "http://localhost:8765/static/cars/cat_1_var_1.png",
-                    "text": "Ein vollelektrischer SUV, der die Zukunft der Mobilität verkörpert.",
-                    "description": "Der vollelektrische SUV bietet eine beeindruckende Reichweite von 500 km und ist mit modernster Technologie ausgestattet. Er verfügt über ein geräumiges Interieur, fortschrittliche Sicherheitsfunktionen und ein elegantes Design.",
-                    "price": "90.00 € per day",
-                    "seats": 6,
-                    "transmission": "Automatic",
-                },
-                {
-                    "id": "2",
-                    "name": "Sedan",
-                    "title": "Practical Sedan",
-                    "image": "http://localhost:8765/static/cars/cat_1_var_2_mod_2.png",
-                    "text": "Ein luxuriöser Sedan mit fortschrittlicher Technologie.",
-                    "description": "Der luxuriöse Sedan bietet eine Kombination aus Komfort und Leistung. Er ist mit einem leistungsstarken Motor ausgestattet, der eine sanfte Fahrt ermöglicht. Das Interieur ist mit hochwertigen Materialien gestaltet und bietet modernste Infotainment-Systeme.",
-                    "price": "60.00 € per day",
-                    "seats": 5,
-                    "transmission": "Automatic",
-                },
-                {
-                    "id": "3",
-                    "name": "Compact",
-                    "title": "Compact City Car",
-                    "image": "http://localhost:8765/static/cars/cat_1_var_3.png",
-                    "text": "Ein kompakter und effizienter Stadtwagen.",
-                    "description": "Der kompakte Stadtwagen ist ideal für den urbanen Verkehr. Er bietet eine hohe Kraftstoffeffizienz und ist leicht zu parken. Das Interieur ist funktional",
-                    "price": "55.00 € per day",
-                    "seats": 4,
-                    "transmission": "Manual",
-                },
-                {
-                    "id": "4",
-                    "name": "Limousine",
-                    "title": "Elegant Limousine",
-                    "image": "http://localhost:8765/static/cars/cat_1_var_2_mod_1.png",
-                    "text": "Eine elegante Limousine für besondere Anlässe.",
-                    "description": "Die elegante Limousine bietet Luxus und Stil. Sie ist mit einem leistungsstarken Motor ausgestattet und bietet ein geräumiges Interieur mit hochwertigen Materialien. Ideal für besondere Anlässe oder Geschäftsreisen.",
-                    "price": "85.00 € per day",
-                    "seats": 5,
-                    "transmission": "Automatic",
-                }
+        self.logger.debug("retreiving available cars %s", args, extra={"event": "tool_call"})
+
+        station = self.inventory.find_station(args.get("prefered_location") or "")
+        pickup, dropoff = parse_day(args.get("pickup_date")), parse_day(args.get("return_date"))
+        if station is None or pickup is None or dropoff is None or dropoff < pickup:
+            # Without a station and a valid date range availability can't be checked, list the fleet
+            responses = [{**car, "image": self.images.resolve(car["image"])} for car in self.cars]
+        else:
+            available = self.inventory.available(station, pickup, dropoff)
+            responses = [
+                {**car, "image": self.images.resolve(car["image"]), "location": self.inventory.stations[station]["name"], "available": available[car["id"]]}
+                for car in self.cars if car["id"] in available
             ]
-        
-        return ToolResult(responses, ToolResultDirection.TO_SERVER) 
\ No newline at end of file
+
+        return ToolResult(responses, ToolResultDirection.TO_SERVER)
+
+    def _station(self, station: dict, distance: Optional[float] = None) -> dict:
+        response = {key: value for key, value in station.items() if key not in ("lat", "lon")}
+        if distance is not None:
+            response["distance"] = f"{distance:.0f} km"
+        return response
+
+    async def show_final_details(self, args: Any) -> ToolResult:
+        self.logger.debug("showing final details %s", args, extra={"event": "tool_call"})
+
+        station = self.inventory.find_station(args.get("pickup_location") or "")
+        car = self._find_car(args.get("car_model") or "")
+        pickup, dropoff = parse_day(args.get("pickup_date")), parse_day(args.get("return_date"))
+        car_id = None
+        if station is not None and car is not None and pickup is not None and dropoff is not None and dropoff >= pickup:
+            car_id = self.inventory.reserve(station, car["id"], pickup, dropoff)
+        try:
+            # Queued for the write-behind writer, the tool call doesn't wait for the log or the database
+            booking = self.bookings.submit({
+                "pickup_location": self.inventory.stations[station]["name"] if station is not None else args.get("pickup_location"),
+                "car_model": car["title"] if car is not None else args.get("car_model"),
+                "pickup_date": args.get("pickup_date"),
+                "return_date": args.get("return_date"),
+                "station_id": self.inventory.stations[station]["id"] if station is not None else None,
+                "model_id": car["id"] if car is not None else None,
+                "car_id": car_id,
+                # Requested bookings couldn't be matched to a free car and need a follow-up
+                "status": "confirmed" if car_id is not None else "requested",
+            })
+        except BookingRejected:
+            if car_id is not None:
+                self.inventory.release(car_id, pickup, dropoff)
+            raise
+
+        # Return the result to the client
+        return ToolResult(booking, ToolResultDirection.TO_CLIENT)
+
+    @staticmethod
+    def _booking_active(booking: dict) -> bool:
+        # Bookings that can still hold a car, the rest is in the backend and dropped from the local log
+        return_day = parse_day(booking.get("return_date"))
+        return return_day is not None and return_day >= date.today().toordinal()
+
+    def _find_car(self, text: str) -> Optional[dict]:
+        query = normalize(text)
+        for car in self.cars:
+            if normalize(car["name"]) in query or normalize(car["title"]) in query or (query and query in normalize(car["title"])):
+                return car
+        return None
+
+    async def on_cleanup(self, app: Any):
+        await self.bookings.close()
+        await close_clients()
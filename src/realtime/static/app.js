@@ -10,6 +10,20 @@ let mediaStream = null;
 let mediaProcessor = null;
 let audioQueueTime = 0;
 
+// Session resumption: the server keeps the conversation open for a grace period after an unclean
+// disconnect, reconnecting with the resume token and the number of messages received continues it
+let resumeToken = null;
+let resumeGracePeriod = 0;
+let resumeRetry = null;
+let receivedCount = 0;
+
+// Abnormal drops (1006) without a resume token start a new session, retried with backoff for this long
+const RECONNECT_PERIOD = 10000;
+let reconnectRetry = null;
+
+// Product cards the server already sent, by id, the server only sends the ones missing here
+const productCards = new Map();
+
 // Variables for client-side VAD (optional)
 let speaking = false;
 const VAD_THRESHOLD = 0.01; // Adjust this threshold as needed
@@ -26,52 +40,12 @@ async function startRecording() {
     }
 
     // Open WebSocket connection
-    if (window.location.protocol != "https:") {
-        websocket = new WebSocket(`ws://${window.location.host}/realtime`);
-    }else
-    {
-        websocket = new WebSocket(`wss://${window.location.host}/realtime`);
-    }    
-
-    websocket.onopen = () => {
-        console.log('WebSocket connection opened');
-        // Send session update with all required parameters
-        const sessionUpdate = {
-            type: 'session.update',
-            session: {
-                turn_detection: {
-                    type: 'server_vad',
-                    threshold: 0.7,          // Adjust if necessary
-                    prefix_padding_ms: 300,  // Adjust if necessary
-                    silence_duration_ms: 500 // Adjust as needed
-                },
-                // If you want to enable input audio transcription
-                // input_audio_transcription: {
-                //     model: 'whisper-1'
-                // }
-                // Do not include 'tools' and 'tool_choice'; backend will handle them
-                // Other parameters like 'temperature' and 'max_response_output_tokens' can be set here if needed
-            }
-        };
-        websocket.send(JSON.stringify(sessionUpdate));
-    };
-
-    websocket.onmessage = (event) => {
-        const message = JSON.parse(event.data);
-        // console.log('Received message:', message);
-        handleWebSocketMessage(message);
-    };
-
-    websocket.onclose = () => {
-        console.log('WebSocket connection closed');
-        if (isRecording) {
-            stopRecording();
-        }
-    };
-
-    websocket.onerror = (event) => {
-        console.error('WebSocket error:', event);
-    };
+    resumeToken = null;
+    resumeRetry = null;
+    reconnectRetry = null;
+    receivedCount = 0;
+    productCards.clear();
+    connectWebSocket();
 
     // Start recording audio
     mediaStream = await navigator.mediaDevices.getUserMedia({ audio: true });
@@ -92,7 +66,9 @@ async function startRecording() {
             type: 'input_audio_buffer.append',
             audio: base64Audio
         };
-        websocket.send(JSON.stringify(audioCommand));
+        if (websocket && websocket.readyState === WebSocket.OPEN) {
+            websocket.send(JSON.stringify(audioCommand));
+        }
 
         // Optional: Client-side VAD for immediate interruption handling
         const isUserSpeaking = detectSpeech(inputData);
@@ -108,6 +84,140 @@ async function startRecording() {
     };
 }
 
+function connectWebSocket(resume) {
+    const protocol = window.location.protocol != "https:" ? "ws" : "wss";
+    const query = resume ? `?resume=${encodeURIComponent(resumeToken)}&last_seq=${receivedCount}` : '';
+    websocket = new WebSocket(`${protocol}://${window.location.host}/realtime${query}`);
+
+    websocket.onopen = () => {
+        console.log('WebSocket connection opened');
+        resumeRetry = null;
+        reconnectRetry = null;
+        if (!resume) {
+            statusMessage.textContent = 'Talking...';
+            sendSessionUpdate();
+        }
+    };
+
+    websocket.onmessage = (event) => {
+        const message = JSON.parse(event.data);
+        // console.log('Received message:', message);
+        switch (message.type) {
+            case 'extension.session_resumable':
+                resumeToken = message.resume_token;
+                resumeGracePeriod = message.grace_period * 1000;
+                return;
+            case 'extension.session_resumed':
+                console.log(`Session resumed, ${message.replayed} messages replayed, ${message.missed} missed`);
+                if (message.missed > 0) {
+                    // The server forgets the cards too and sends the next list in full
+                    productCards.clear();
+                }
+                statusMessage.textContent = 'Talking...';
+                return;
+            case 'extension.session_resume_failed':
+                // The server started a fresh session instead
+                receivedCount = 0;
+                productCards.clear();
+                sendSessionUpdate();
+                return;
+        }
+        receivedCount++;
+        handleWebSocketMessage(message);
+    };
+
+    websocket.onclose = (event) => {
+        console.log('WebSocket connection closed');
+        if (isRecording && resumeToken && event.code !== 1000 && event.code !== 1013) {
+            // Retry with backoff until the server side grace period runs out
+            if (resumeRetry === null) {
+                resumeRetry = { deadline: Date.now() + resumeGracePeriod, delay: 250 };
+            } else {
+                resumeRetry.delay = Math.min(resumeRetry.delay * 2, 2000);
+            }
+            scheduleResume();
+            return;
+        }
+        if (isRecording && event.code === 1006) {
+            // A dropped connection, or a 503 on the upgrade which browsers report the same way
+            if (reconnectRetry === null) {
+                reconnectRetry = { deadline: Date.now() + RECONNECT_PERIOD, delay: 250 };
+            } else {
+                reconnectRetry.delay = Math.min(reconnectRetry.delay * 2, 2000);
+            }
+            scheduleReconnect();
+            return;
+        }
+        if (isRecording) {
+            stopRecording();
+        }
+        if (event.code === 1013) {
+            // The server is at capacity, ask the user to retry shortly
+            statusMessage.textContent = 'The showroom is busy right now, please try again in a moment.';
+        }
+    };
+
+    websocket.onerror = (event) => {
+        console.error('WebSocket error:', event);
+    };
+}
+
+function scheduleResume() {
+    if (Date.now() + resumeRetry.delay > resumeRetry.deadline) {
+        resumeToken = null;
+        resumeRetry = null;
+        stopRecording();
+        statusMessage.textContent = 'Connection lost, please start the conversation again.';
+        return;
+    }
+    statusMessage.textContent = 'Reconnecting...';
+    setTimeout(() => {
+        if (isRecording) {
+            connectWebSocket(true);
+        }
+    }, resumeRetry.delay);
+}
+
+function scheduleReconnect() {
+    if (Date.now() + reconnectRetry.delay > reconnectRetry.deadline) {
+        reconnectRetry = null;
+        stopRecording();
+        statusMessage.textContent = 'Could not reach the showroom, please try again in a moment.';
+        return;
+    }
+    statusMessage.textContent = 'Reconnecting...';
+    setTimeout(() => {
+        if (isRecording) {
+            // Nothing to resume, the conversation starts over
+            receivedCount = 0;
+            productCards.clear();
+            connectWebSocket();
+        }
+    }, reconnectRetry.delay);
+}
+
+function sendSessionUpdate() {
+    // Send session update with all required parameters
+    const sessionUpdate = {
+        type: 'session.update',
+        session: {
+            turn_detection: {
+                type: 'server_vad',
+                threshold: 0.7,          // Adjust if necessary
+                prefix_padding_ms: 300,  // Adjust if necessary
+                silence_duration_ms: 500 // Adjust as needed
+            },
+            // If you want to enable input audio transcription
+            // input_audio_transcription: {
+            //     model: 'whisper-1'
+            // }
+            // Do not include 'tools' and 'tool_choice'; backend will handle them
+            // Other parameters like 'temperature' and 'max_response_output_tokens' can be set here if needed
+        }
+    };
+    websocket.send(JSON.stringify(sessionUpdate));
+}
+
 function stopRecording() {
     isRecording = false;
     toggleButton.textContent = 'Start Conversation';
@@ -124,7 +234,9 @@ function stopRecording() {
     }
 
     if (websocket) {
-        websocket.close();
+        // A normal close ends the conversation on the server instead of holding it for a resume
+        websocket.onclose = null;
+        websocket.close(1000);
         websocket = null;
     }
 }
@@ -151,6 +263,9 @@ function handleWebSocketMessage(message) {
             // Conversation response is complete
             console.log('Response done');
             break;
+        case 'extension.product_cards':
+            renderProductCards(message);
+            break;
         case 'extension.middle_tier_tool_response':
             // Handle tool response
             if (message.tool_name === 'show_product_information') {
@@ -166,28 +281,16 @@ function handleWebSocketMessage(message) {
                     productListDiv.innerHTML = '<div class="product"><h3>' + information.title + '</h3><img src="'+ information.image + '" /><p>' + information.text + '</p></div>'
                 }
             }
-            if (message.tool_name === 'show_product_categories') {
+            if (message.tool_name === 'show_product_categories' || message.tool_name === 'show_product_models') {
+                // Only sent when the server has REALTIME_CARD_DIFF turned off
                 const information = JSON.parse(message.tool_result);
-                console.log('Showing product categories:', information);
-                productListDiv.innerHTML = '';
-                for (var i = 0; i < information.length; i++) {
-                    var layout = '<div class="product"><h3>' + information[i].title + '</h3><img src="'+ information[i].image + '" /><p>' + information[i].text + '</p></div>'
-                    productListDiv.innerHTML += layout;
-                }
-            }
-            if (message.tool_name === 'show_product_models') {
-                const information = JSON.parse(message.tool_result);
-                console.log('Showing product models:', information);
-                productListDiv.innerHTML = '';
-                for (var i = 0; i < information.length; i++) {
-                    var layout = '<div class="product"><h3>' + information[i].title + '</h3><img src="'+ information[i].image + '" /><p>' + information[i].text + '</p></div>'
-                    productListDiv.innerHTML += layout;
-                }
+                console.log('Showing ' + message.tool_name + ':', information);
+                productListDiv.innerHTML = information.map(card => '<div class="product"><h3>' + card.title + '</h3><img src="'+ card.image + '" /><p>' + card.text + '</p></div>').join('');
             }
             if (message.tool_name === 'show_final_details') {
                 const information = JSON.parse(message.tool_result);
                 console.log('Showing details:', information);
-                productListDiv.innerHTML = information;
+                productListDiv.innerHTML = '<div class="product"><h3>' + information.car_model + '</h3><p>' + information.pickup_location + '</p><p>' + information.pickup_date + ' - ' + information.return_date + '</p><p>Booking ' + information.id.substring(0, 8) + ' (' + information.status + ')</p></div>';
             }
             break;
         case 'error':
@@ -198,6 +301,34 @@ function handleWebSocketMessage(message) {
     }
 }
 
+function createProductCard(card) {
+    const node = document.createElement('div');
+    node.className = 'product';
+    const title = document.createElement('h3');
+    title.textContent = card.title;
+    const image = document.createElement('img');
+    image.src = card.image;
+    const text = document.createElement('p');
+    text.textContent = card.text;
+    node.append(title, image, text);
+    return node;
+}
+
+function renderProductCards(message) {
+    // Cards are built detached and swapped in with a single replaceChildren, one layout for the whole list
+    for (const id of message.removed) {
+        productCards.delete(id);
+    }
+    for (const card of message.added) {
+        productCards.set(card.id, createProductCard(card));
+    }
+    const nodes = message.order.map(id => productCards.get(id)).filter(node => node !== undefined);
+    if (nodes.length < message.order.length) {
+        console.warn(`Missing ${message.order.length - nodes.length} product cards`);
+    }
+    productListDiv.replaceChildren(...nodes);
+}
+
 let assistantAudioSources = [];
 
 function playAudio(base64Audio) {
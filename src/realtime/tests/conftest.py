@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The app modules import backend and reportstore relative to src/realtime, like the entry points do
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
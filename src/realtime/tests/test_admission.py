@@ -0,0 +1,114 @@
+import asyncio
+import pytest
+from backend.admission import AdmissionController, AdmissionRejected
+from backend.sharedstate import InMemorySharedState
+
+class UnreachableState(InMemorySharedState):
+    async def cache_get(self, key):
+        raise ConnectionError("down")
+
+    async def incr(self, key, window):
+        raise ConnectionError("down")
+
+    async def register_session(self, session_id, limit, ttl):
+        raise ConnectionError("down")
+
+    async def unregister_session(self, session_id):
+        raise ConnectionError("down")
+
+def test_queued_session_gets_the_released_slot():
+    async def test():
+        controller = AdmissionController(max_sessions=1, max_waiting=1, queue_timeout=5)
+        first = await controller.acquire("a")
+        waiting = asyncio.create_task(controller.acquire("b"))
+        await asyncio.sleep(0)
+        # The queue is full
+        with pytest.raises(AdmissionRejected):
+            await controller.acquire("c")
+        await controller.release(first)
+        second = await waiting
+        assert controller.active == 1
+        await controller.release(second)
+        assert controller.active == 0
+        assert controller.stats["admitted"] == 2 and controller.stats["rejected"] == 1
+    asyncio.run(test())
+
+def test_queue_timeout_rejects_with_retry_hint():
+    async def test():
+        controller = AdmissionController(max_sessions=1, queue_timeout=0.05)
+        first = await controller.acquire("a")
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire("b")
+        assert rejected.value.retry_after >= 1
+        assert not controller._waiters
+        await controller.release(first)
+        assert controller.active == 0
+    asyncio.run(test())
+
+def test_cancelled_waiter_passes_the_slot_on():
+    async def test():
+        controller = AdmissionController(max_sessions=1, queue_timeout=5)
+        first = await controller.acquire("a")
+        cancelled = asyncio.create_task(controller.acquire("b"))
+        waiting = asyncio.create_task(controller.acquire("c"))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await controller.release(first)
+        await asyncio.gather(cancelled, return_exceptions=True)
+        await controller.release(await waiting)
+        assert controller.active == 0
+    asyncio.run(test())
+
+def test_global_limit_and_rate_only_count_admitted_sessions():
+    async def test():
+        state = InMemorySharedState()
+        controller = AdmissionController(max_sessions=1, max_waiting=0, global_max_sessions=1, max_sessions_per_minute=5, state=state)
+        admission = await controller.acquire("a")
+        for session_id in ("b", "c", "d"):
+            with pytest.raises(AdmissionRejected):
+                await controller.acquire(session_id)
+        # Another replica with free slots still sees the global limit
+        replica = AdmissionController(global_max_sessions=1, max_sessions_per_minute=5, state=state)
+        with pytest.raises(AdmissionRejected):
+            await replica.acquire("e")
+        assert replica.active == 0
+        # Rejected sessions didn't use up the start rate
+        assert await state.incr("session_starts", 60) == 2
+        await controller.release(admission)
+        assert await state.session_count() == 0
+    asyncio.run(test())
+
+def test_rate_rejection_releases_the_slot_and_registration():
+    async def test():
+        state = InMemorySharedState()
+        controller = AdmissionController(global_max_sessions=10, max_sessions_per_minute=1, state=state)
+        admission = await controller.acquire("a")
+        with pytest.raises(AdmissionRejected):
+            await controller.acquire("b")
+        assert controller.active == 1
+        assert await state.session_count() == 1
+        await controller.release(admission)
+    asyncio.run(test())
+
+def test_unreachable_shared_state_fails_open():
+    async def test():
+        controller = AdmissionController(global_max_sessions=1, max_sessions_per_minute=1, state=UnreachableState())
+        first = await controller.acquire("a")
+        second = await controller.acquire("b")
+        assert controller.active == 2
+        await controller.release(first)
+        await controller.release(second)
+        assert controller.active == 0
+    asyncio.run(test())
+
+def test_upstream_throttling_shrinks_capacity_and_is_shared():
+    async def test():
+        state = InMemorySharedState()
+        throttled = AdmissionController(max_sessions=8, state=state)
+        await throttled.report_throttled(retry_after=30)
+        assert throttled.capacity == 6
+        replica = AdmissionController(max_sessions=8, state=state)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await replica.acquire("a")
+        assert 0 < rejected.value.retry_after <= 30
+    asyncio.run(test())
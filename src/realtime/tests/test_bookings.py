@@ -0,0 +1,37 @@
+import asyncio
+from reportstore.bookings import BookingLog, BookingStore, InMemoryBookingBackend
+
+def test_log_is_compacted_past_its_size_limit(tmp_path):
+    async def test():
+        log = BookingLog(tmp_path / "bookings.jsonl", max_bytes=2000)
+        store = BookingStore(InMemoryBookingBackend(), log, max_batch=10, max_delay=0.001, retain=lambda booking: booking["n"] % 10 == 0)
+        for n in range(200):
+            store.submit({"n": n})
+            await asyncio.sleep(0)
+        await store.close()
+        assert store.stats.compactions > 0
+        assert log.size <= 2000 + 1000
+        kept = {booking["n"] for booking in log.read()}
+        # Retained bookings survive every compaction, the rest only until the next one
+        assert {n for n in range(200) if n % 10 == 0} <= kept
+        assert len(kept) < 200
+        assert len(store.backend.bookings) == 200
+    asyncio.run(test())
+
+def test_read_deduplicates_a_crash_between_snapshot_and_truncate(tmp_path):
+    log = BookingLog(tmp_path / "bookings.jsonl")
+    log.append([{"id": "a", "n": 1}, {"id": "b", "n": 2}])
+    log.compact(lambda booking: True)
+    log.append([{"id": "a", "n": 1}, {"id": "c", "n": 3}])
+    assert sorted(booking["id"] for booking in log.read()) == ["a", "b", "c"]
+
+def test_log_is_not_compacted_without_retain(tmp_path):
+    async def test():
+        log = BookingLog(tmp_path / "bookings.jsonl", max_bytes=100)
+        store = BookingStore(None, log, max_delay=0.001)
+        for n in range(20):
+            store.submit({"n": n})
+        await store.close()
+        assert store.stats.compactions == 0
+        assert len(log.read()) == 20
+    asyncio.run(test())
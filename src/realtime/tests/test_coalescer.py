@@ -0,0 +1,62 @@
+import asyncio
+import base64
+import json
+from backend.coalescer import CoalescerSettings, DeltaCoalescer
+
+def _audio(delta: bytes, item: str = "i1") -> str:
+    return json.dumps({"type": "response.audio.delta", "response_id": "r1", "item_id": item, "content_index": 0, "delta": base64.b64encode(delta).decode("ascii")})
+
+def _transcript(delta: str) -> str:
+    return json.dumps({"type": "response.audio_transcript.delta", "response_id": "r1", "item_id": "i1", "content_index": 0, "delta": delta})
+
+def _coalescer(window: float = 10.0, max_bytes: int = 32 * 1024):
+    delivered: list[dict] = []
+
+    async def deliver(message: str):
+        delivered.append(json.loads(message))
+    return DeltaCoalescer(CoalescerSettings(window=window, max_bytes=max_bytes), deliver), delivered
+
+def test_deltas_of_a_content_part_are_merged():
+    async def test():
+        coalescer, delivered = _coalescer()
+        # Parts that aren't multiples of 3 bytes can't be concatenated as base64
+        for chunk in (b"ab", b"cde", b"f"):
+            await coalescer.push(_audio(chunk))
+        await coalescer.push(_transcript("Hel"))
+        await coalescer.push(_transcript("lo"))
+        await coalescer.flush()
+        assert [base64.b64decode(m["delta"]) for m in delivered if m["type"] == "response.audio.delta"] == [b"abcdef"]
+        assert [m["delta"] for m in delivered if m["type"] == "response.audio_transcript.delta"] == ["Hello"]
+        assert coalescer.stats.snapshot()["frames_saved"] == 3
+    asyncio.run(test())
+
+def test_other_events_flush_pending_deltas_first():
+    async def test():
+        coalescer, delivered = _coalescer()
+        await coalescer.push(_transcript("Hi"))
+        await coalescer.push(json.dumps({"type": "response.done"}))
+        assert [m["type"] for m in delivered] == ["response.audio_transcript.delta", "response.done"]
+    asyncio.run(test())
+
+def test_window_and_size_flush():
+    async def test():
+        coalescer, delivered = _coalescer(window=0.01)
+        await coalescer.push(_transcript("Hi"))
+        await asyncio.sleep(0.05)
+        assert len(delivered) == 1
+        coalescer, delivered = _coalescer(max_bytes=4)
+        await coalescer.push(_transcript("abc"))
+        await coalescer.push(_transcript("def"))
+        assert [m["delta"] for m in delivered] == ["abcdef"]
+        assert coalescer.stats.flushed_by_size == 1
+        coalescer.close()
+    asyncio.run(test())
+
+def test_content_parts_are_kept_apart():
+    async def test():
+        coalescer, delivered = _coalescer()
+        await coalescer.push(_audio(b"abc", "i1"))
+        await coalescer.push(_audio(b"def", "i2"))
+        await coalescer.flush()
+        assert [(m["item_id"], base64.b64decode(m["delta"])) for m in delivered] == [("i1", b"abc"), ("i2", b"def")]
+    asyncio.run(test())
@@ -0,0 +1,64 @@
+import math
+import random
+from reportstore.inventory import GeoIndex, Inventory, Reservations, parse_day
+
+STATIONS = [
+    {"id": "1", "name": "Düsseldorf Airport", "lat": 51.2895, "lon": 6.7668},
+    {"id": "2", "name": "Berlin Tegel Airport", "lat": 52.5069, "lon": 13.3903},
+    {"id": "3", "name": "Munich Central Station", "lat": 48.1402, "lon": 11.5600},
+]
+PLACES = {"Berlin": (52.52, 13.405), "Düsseldorf": (51.2277, 6.7735)}
+
+def _haversine_km(lat1, lon1, lat2, lon2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    a = math.sin((p2 - p1) / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    return 2 * 6371.0 * math.asin(math.sqrt(a))
+
+def test_geo_index_matches_a_linear_scan():
+    rng = random.Random(3)
+    points = [(rng.uniform(-89, 89), rng.uniform(-180, 180)) for _ in range(300)]
+    index = GeoIndex(points)
+    for _ in range(50):
+        lat, lon = rng.uniform(-89, 89), rng.uniform(-180, 180)
+        expected = sorted(range(len(points)), key=lambda i: _haversine_km(lat, lon, *points[i]))[:5]
+        found = index.nearest(lat, lon, 5)
+        assert [i for i, _ in found] == expected
+        assert math.isclose(found[0][1], _haversine_km(lat, lon, *points[expected[0]]), rel_tol=1e-6)
+
+def test_reservations_reject_overlaps_and_allow_back_to_back():
+    reservations = Reservations()
+    assert reservations.reserve(10, 15)
+    assert not reservations.reserve(12, 20)
+    assert not reservations.reserve(5, 11)
+    assert reservations.reserve(15, 20)
+    assert reservations.reserve(5, 10)
+    assert not reservations.is_free(14, 16)
+    assert reservations.release(10, 15)
+    assert reservations.is_free(10, 15)
+
+def test_find_station_matches_names_exactly():
+    inventory = Inventory(STATIONS, PLACES)
+    assert inventory.find_station("berlin tegel airport", nearest=False) == 1
+    assert inventory.find_station("Dusseldorf Airport", nearest=False) == 0
+    assert inventory.find_station("2", nearest=False) == 1
+    # A city is a place, its station is found as the nearest one
+    assert inventory.find_station("Berlin", nearest=False) is None
+    assert inventory.find_station("Berlin") == 1
+
+def test_locate_coordinates_in_text():
+    inventory = Inventory(STATIONS, PLACES)
+    assert inventory.locate("near 48.14, 11.56 please") == (48.14, 11.56)
+    assert inventory.locate("Flughafenstraße 120, 40474") is None
+    assert inventory.locate("Munich Central Station") == (48.1402, 11.5600)
+
+def test_same_day_rentals_hold_the_car_for_that_day():
+    inventory = Inventory.generate(STATIONS, PLACES, ["suv"], 1)
+    day = parse_day("2026-11-01")
+    assert inventory.available(0, day, day) == {"suv": 1}
+    car = inventory.reserve(0, "suv", day, day)
+    assert car is not None
+    assert inventory.available(0, day, day) == {}
+    assert inventory.available(0, day - 3, day) == {"suv": 1}
+    assert inventory.available(0, day + 1, day + 2) == {"suv": 1}
+    assert inventory.release(car, day, day)
+    assert inventory.available(0, day, day) == {"suv": 1}
@@ -0,0 +1,52 @@
+from backend.productcards import ProductCards, ProductCardSettings, card_id
+
+SUV = {"title": "SUV", "image": "/static/suv.png"}
+SEDAN = {"title": "Sedan", "image": "/static/sedan.png"}
+COMPACT = {"title": "Compact", "image": "/static/compact.png"}
+
+def test_only_new_cards_are_sent():
+    cards = ProductCards(ProductCardSettings())
+    first = cards.update([SUV, SEDAN])
+    assert [card["title"] for card in first["added"]] == ["SUV", "Sedan"]
+    assert first["order"] == [card_id(SUV), card_id(SEDAN)]
+    second = cards.update([SEDAN, COMPACT])
+    assert [card["title"] for card in second["added"]] == ["Compact"]
+    assert second["order"] == [card_id(SEDAN), card_id(COMPACT)]
+    assert second["removed"] == []
+    assert cards.stats.snapshot()["reused"] == 1
+
+def test_changed_card_gets_a_new_id():
+    cards = ProductCards(ProductCardSettings())
+    cards.update([SUV])
+    changed = {**SUV, "image": "/static/suv-2.png"}
+    update = cards.update([changed])
+    assert update["added"] == [{"id": card_id(changed), **changed}]
+    assert card_id(changed) != card_id(SUV)
+
+def test_duplicates_are_shown_once():
+    cards = ProductCards(ProductCardSettings())
+    update = cards.update([SUV, SUV, SEDAN])
+    assert update["order"] == [card_id(SUV), card_id(SEDAN)]
+    assert len(update["added"]) == 2
+
+def test_least_recently_shown_cards_are_evicted():
+    cards = ProductCards(ProductCardSettings(cache_size=2))
+    cards.update([SUV, SEDAN])
+    cards.update([SUV])
+    update = cards.update([COMPACT])
+    assert update["removed"] == [card_id(SEDAN)]
+    assert len(cards) == 2
+
+def test_cards_about_to_be_shown_are_never_evicted():
+    cards = ProductCards(ProductCardSettings(cache_size=1))
+    update = cards.update([SUV, SEDAN, COMPACT])
+    assert update["removed"] == []
+    assert len(cards) == 3
+    update = cards.update([SEDAN])
+    assert set(update["removed"]) == {card_id(SUV), card_id(COMPACT)}
+
+def test_reset_sends_everything_again():
+    cards = ProductCards(ProductCardSettings())
+    cards.update([SUV])
+    cards.reset()
+    assert len(cards.update([SUV])["added"]) == 1
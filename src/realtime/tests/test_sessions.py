@@ -0,0 +1,69 @@
+import asyncio
+import json
+from backend.sessions import RealtimeSession, ReplayBuffer
+
+class FakeSocket:
+    closed = False
+    close_code = None
+
+    def __init__(self):
+        self.sent: list[str] = []
+
+    async def send_str(self, message: str):
+        self.sent.append(message)
+
+def test_replay_buffer_returns_messages_after_a_sequence_number():
+    buffer = ReplayBuffer(max_bytes=1000)
+    for seq in range(1, 6):
+        buffer.append(seq, f"m{seq}")
+    assert buffer.since(3) == (["m4", "m5"], 0)
+    assert buffer.since(5) == ([], 0)
+
+def test_replay_buffer_reports_dropped_messages():
+    buffer = ReplayBuffer(max_bytes=10)
+    for seq in range(1, 6):
+        buffer.append(seq, "abcd")
+    # Only the last two messages fit, 1-3 were dropped
+    assert buffer.size == 8
+    assert buffer.since(0) == (["abcd", "abcd"], 3)
+    assert buffer.since(4) == (["abcd"], 0)
+
+def test_replay_buffer_keeps_a_message_larger_than_the_buffer():
+    buffer = ReplayBuffer(max_bytes=4)
+    buffer.append(1, "too large")
+    assert buffer.since(0) == (["too large"], 0)
+
+def test_resume_replays_what_the_client_missed():
+    async def test():
+        session = RealtimeSession("s", replay_bytes=1000)
+        first = FakeSocket()
+        await session.attach(first)
+        for n in range(3):
+            await session.send_to_client(f"m{n}")
+        first.close_code = 1006
+        session.detach(first)
+        assert not session.closed_by_client
+        # Sent while no client was attached
+        await session.send_to_client("m3")
+        second = FakeSocket()
+        replayed, missed = await session.attach(second, last_seq=2)
+        assert (replayed, missed) == (2, 0)
+        assert json.loads(second.sent[0]) == {"type": "extension.session_resumed", "replayed": 2, "missed": 0}
+        assert second.sent[1:] == ["m2", "m3"]
+        await session.send_to_client("m4")
+        assert second.sent[-1] == "m4"
+        assert session.sent == 5
+    asyncio.run(test())
+
+def test_detach_only_applies_to_the_attached_socket():
+    async def test():
+        session = RealtimeSession("s", replay_bytes=1000)
+        stale, current = FakeSocket(), FakeSocket()
+        await session.attach(stale)
+        await session.attach(current)
+        session.detach(stale)
+        assert session.client_ws is current and session.attached.is_set()
+        current.close_code = 1000
+        session.detach(current)
+        assert session.client_ws is None and session.closed_by_client
+    asyncio.run(test())
@@ -0,0 +1,52 @@
+import asyncio
+from backend.respserver import RespStandIn
+from backend.sharedstate import InMemorySharedState, RedisSharedState
+
+async def _with_redis(test):
+    standin = RespStandIn()
+    port = await standin.start(port=0)
+    state = RedisSharedState.from_url(f"redis://127.0.0.1:{port}")
+    try:
+        await test(state)
+    finally:
+        await state.close()
+        await standin.stop()
+
+def test_cache_roundtrip():
+    async def test(state):
+        assert await state.cache_get("tool:a") is None
+        await state.cache_set("tool:a", "A", 10)
+        assert await state.cache_get("tool:a") == "A"
+    asyncio.run(_with_redis(test))
+
+def test_cancelled_call_does_not_desync_the_connection():
+    async def test(state):
+        await state.cache_set("tool:a", "A", 10)
+        await state.cache_set("tool:b", "B", 10)
+        for _ in range(20):
+            task = asyncio.create_task(state.cache_get("tool:a"))
+            # Let the request go out, then cancel before the reply is read
+            await asyncio.sleep(0)
+            await asyncio.sleep(0)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            assert await state.cache_get("tool:b") == "B"
+            assert await state.cache_get("tool:missing") is None
+    asyncio.run(_with_redis(test))
+
+def test_session_registry_limit():
+    async def test(state):
+        assert await state.register_session("s1", 2, 60)
+        assert await state.register_session("s2", 2, 60)
+        assert not await state.register_session("s3", 2, 60)
+        assert await state.session_count() == 2
+        await state.unregister_session("s1")
+        assert await state.register_session("s3", 2, 60)
+    asyncio.run(_with_redis(test))
+    asyncio.run(test(InMemorySharedState()))
+
+def test_incr_counts_within_window():
+    async def test(state):
+        assert [await state.incr("starts", 60) for _ in range(3)] == [1, 2, 3]
+    asyncio.run(_with_redis(test))
+    asyncio.run(test(InMemorySharedState()))
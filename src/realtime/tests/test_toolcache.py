@@ -0,0 +1,35 @@
+import asyncio
+import json
+from azure.core.credentials import AzureKeyCredential
+from backend.respserver import RespStandIn
+from backend.rtmt import RTMiddleTier
+from backend.sharedstate import RedisSharedState
+from backend.tools import Tool, ToolResult, ToolResultDirection
+
+async def _lookup(args):
+    return ToolResult({"query": args["query"]}, ToolResultDirection.TO_SERVER)
+
+def test_cancelled_speculation_leaves_the_shared_connection_alone():
+    async def test():
+        standin = RespStandIn()
+        port = await standin.start(port=0)
+        relay = RTMiddleTier("http://127.0.0.1:1", "deployment", AzureKeyCredential("key"))
+        relay.state = RedisSharedState.from_url(f"redis://127.0.0.1:{port}")
+        tool = Tool(target=_lookup, schema={}, cache_ttl=60)
+        try:
+            await relay._execute_tool("lookup", tool, '{"query": "a"}')
+            writer = relay.state.connection._writer
+            for ticks in range(6):
+                # Cancelled at different points of the cache lookup, like a discarded speculation
+                task = asyncio.create_task(relay._execute_tool("lookup", tool, '{"query": "a"}'))
+                for _ in range(ticks):
+                    await asyncio.sleep(0)
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                result = await relay._execute_tool("lookup", tool, '{"query": "b"}')
+                assert json.loads(result.to_text()) == {"query": "b"}
+            assert relay.state.connection._writer is writer
+        finally:
+            await relay.state.close()
+            await standin.stop()
+    asyncio.run(test())
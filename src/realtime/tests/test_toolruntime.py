@@ -0,0 +1,39 @@
+import asyncio
+import functools
+import threading
+from backend.toolruntime import ToolRuntime
+from backend.tools import Tool, ToolResult, ToolResultDirection
+
+async def _async_target(args):
+    return ToolResult(threading.current_thread().name, ToolResultDirection.TO_SERVER)
+
+def _sync_target(args):
+    return ToolResult(threading.current_thread().name, ToolResultDirection.TO_SERVER)
+
+class _AsyncCallable:
+    async def __call__(self, args):
+        return await _async_target(args)
+
+def test_kind_is_detected_from_the_target():
+    assert ToolRuntime.kind(Tool(_async_target, {})) == "loop"
+    assert ToolRuntime.kind(Tool(functools.partial(_async_target), {})) == "loop"
+    assert ToolRuntime.kind(Tool(_AsyncCallable(), {})) == "loop"
+    assert ToolRuntime.kind(Tool(_sync_target, {})) == "thread"
+    assert ToolRuntime.kind(Tool(lambda args: _async_target(args), {})) == "thread"
+    assert ToolRuntime.kind(Tool(lambda args: _async_target(args), {}, blocking=False)) == "loop"
+    assert ToolRuntime.kind(Tool(_async_target, {}, blocking=True)) == "thread"
+    assert ToolRuntime.kind(Tool(_sync_target, {}, cpu_bound=True)) == "process"
+
+def test_sync_targets_run_off_the_loop():
+    async def test():
+        runtime = ToolRuntime()
+        try:
+            loop_thread = threading.current_thread().name
+            assert (await runtime.run("a", Tool(_async_target, {}), {})).text == loop_thread
+            assert (await runtime.run("s", Tool(_sync_target, {}), {})).text != loop_thread
+            # A coroutine returned from the thread is still awaited
+            assert (await runtime.run("w", Tool(lambda args: _async_target(args), {}), {})).text == loop_thread
+            assert runtime.stats["s"].calls == 1
+        finally:
+            runtime.shutdown()
+    asyncio.run(test())
@@ -1,6 +1,8 @@
+import asyncio
 import logging
 import os
 from pathlib import Path
+from typing import Any, Optional
 from aiohttp import web
 from azure.core.credentials import AzureKeyCredential
 from azure.identity import AzureDeveloperCliCredential, DefaultAzureCredential
@@ -8,6 +10,7 @@ from dotenv import load_dotenv
 
 from filedb import FileDBStore
 from reportstore import ReportStore
+from staticfiles import StaticAssets
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("webrtc")
@@ -19,7 +22,11 @@ llm_endpoint = os.environ.get("SMALL_ENDPOINT")
 llm_deployment = os.environ.get("SMALL_COMPLETION_MODEL")
 llm_api_version = os.environ.get("SMALL_API_VERSION")
 
-report_store = ReportStore()
+# Answer of /api/search while no search backend (e.g. FileDBStore) is configured
+CANNED_ANSWER = "a device for testing adhesives is called a 'tensile tester'. It is used to measure the strength and elasticity of materials, including adhesives. Tensile testers apply a controlled force to a sample until it breaks, allowing for the assessment of adhesive properties such as tensile strength, elongation, and modulus of elasticity."
+
+SEARCH_BACKEND = web.AppKey("search_backend", Any)
+REPORT_STORE = web.AppKey("report_store", ReportStore)
 
 # fileDB = FileDBStore(
 #     endpoint=llm_endpoint,
@@ -28,8 +35,12 @@ report_store = ReportStore()
 # )
 
 
-async def create_app():
+async def create_app(search_backend: Optional[Any] = None, report_store: Optional[ReportStore] = None):
+    # search_backend is anything with a search(query) method, sync methods run in a thread.
+    # loadtest.py passes a stub with a configurable latency in place of the LLM.
     app = web.Application()
+    app[SEARCH_BACKEND] = search_backend
+    app[REPORT_STORE] = report_store or ReportStore()
 
     # Serve static files and index.html
     current_directory = Path(__file__).parent  # Points to 'app' directory
@@ -39,26 +50,29 @@ async def create_app():
     if not static_directory.exists():
         raise FileNotFoundError("Static directory not found at expected path: {}".format(static_directory))
 
-    # Serve index.html at root
-    async def index(request):
-        return web.FileResponse(static_directory / 'index.html')
-
-    app.router.add_get('/', index)
-    app.router.add_static('/static/', path=str(static_directory), name='static')
+    # Serve index.html at root from memory and static files precompressed with content hashed urls
+    static_assets = StaticAssets(static_directory)
+    static_assets.attach_to_app(app, index='index.html')
     app.router.add_post("/api/search", search)
     app.router.add_post("/api/report", get_report)
 
     return app
 
 async def search(request):
-    
-    return web.json_response(
-        "a device for testing adhesives is called a 'tensile tester'. It is used to measure the strength and elasticity of materials, including adhesives. Tensile testers apply a controlled force to a sample until it breaks, allowing for the assessment of adhesive properties such as tensile strength, elongation, and modulus of elasticity."
-    )
+    backend = request.app[SEARCH_BACKEND]
+    if backend is None:
+        return web.json_response(CANNED_ANSWER)
+    body = await request.json() if request.can_read_body else {}
+    query = body.get("query", "") if isinstance(body, dict) else ""
+    if asyncio.iscoroutinefunction(backend.search):
+        answer = await backend.search(query)
+    else:
+        answer = await asyncio.to_thread(backend.search, query)
+    return web.json_response(answer)
 
 async def get_report(request):
-    report = await report_store.get_schema(request)
-    print (f"Retrieved report: {report}")
+    report = await request.app[REPORT_STORE].get_schema(request)
+    logger.debug("Retrieved report: %s", report)
     return web.json_response(report)
 
 if __name__ == "__main__":
@@ -0,0 +1,208 @@
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import random
+import statistics
+import subprocess
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Optional
+import aiohttp
+from aiohttp import web
+
+from app import CANNED_ANSWER, create_app
+from reportstore import ReportStore
+
+# Measures what one worker serves: create_app() runs in-process on its own event loop, with a stub
+# in place of the LLM, while the load generator drives /api/search and /api/report at rising
+# concurrency from a second loop. Results are written as JSON for comparing runs across commits:
+#   python loadtest.py [--concurrency 1,4,16,64] [--duration 5] [--llm-latency-ms 200] [--output results.json] [--compare old.json]
+
+SAMPLE_REPORT = {
+    "title": "Adhesive test report",
+    "sections": [{"name": name, "fields": [{"label": f"{name} {i}", "type": "text"} for i in range(8)]} for name in ("Sample", "Setup", "Results")],
+}
+
+class StubLLM:
+    # Answers after latency seconds, give or take jitter, without any network or CPU cost
+    def __init__(self, latency: float, jitter: float = 0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self._random = random.Random(5)
+
+    async def search(self, query: str) -> str:
+        await asyncio.sleep(max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter)))
+        return CANNED_ANSWER
+
+class LoopLagMonitor:
+    # Wakes up every interval on the server loop, how late it wakes is time the loop was busy
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: list[float] = []
+
+    async def run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - started - self.interval))
+
+class Server:
+    # The app on a loop in a background thread, so server and load generator don't share a loop
+    def __init__(self, llm: StubLLM):
+        self.llm = llm
+        self.monitor = LoopLagMonitor()
+        self.port: Optional[int] = None
+        self._loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_until_complete(self._start())
+        self._ready.set()
+        self._loop.run_forever()
+
+    async def _start(self):
+        app = await create_app(search_backend=self.llm, report_store=ReportStore(templates=[SAMPLE_REPORT]))
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        self._monitor_task = asyncio.create_task(self.monitor.run())
+
+    def start(self) -> "Server":
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def reset_lag(self) -> list[float]:
+        samples, self.monitor.samples = self.monitor.samples, []
+        return samples
+
+    def stop(self):
+        async def stop():
+            self._monitor_task.cancel()
+            await self._runner.cleanup()
+        asyncio.run_coroutine_threadsafe(stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+def _percentiles(values: list[float]) -> dict[str, Optional[float]]:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "max": None}
+    values = sorted(values)
+    pick = lambda q: round(values[min(len(values) - 1, int(len(values) * q))] * 1000, 3)
+    return {"p50": round(statistics.median(values) * 1000, 3), "p95": pick(0.95), "p99": pick(0.99), "max": round(values[-1] * 1000, 3)}
+
+async def _stage(base_url: str, concurrency: int, duration: float, search_share: float) -> dict[str, Any]:
+    latencies: dict[str, list[float]] = {"search": [], "report": []}
+    errors = {"search": 0, "report": 0}
+    rng = random.Random(concurrency)
+
+    async def worker(session: aiohttp.ClientSession, deadline: float):
+        while time.perf_counter() < deadline:
+            endpoint = "search" if rng.random() < search_share else "report"
+            started = time.perf_counter()
+            try:
+                if endpoint == "search":
+                    response = await session.post("/api/search", json={"query": "Which device tests adhesives?"})
+                else:
+                    response = await session.post("/api/report")
+                async with response:
+                    await response.read()
+                    ok = response.status == 200
+            except aiohttp.ClientError:
+                ok = False
+            if ok:
+                latencies[endpoint].append(time.perf_counter() - started)
+            else:
+                errors[endpoint] += 1
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(base_url, connector=connector) as session:
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(worker(session, deadline) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    endpoints = {
+        name: {"requests": len(values), "errors": errors[name], "rps": round(len(values) / elapsed, 1), "latency_ms": _percentiles(values)}
+        for name, values in latencies.items()
+    }
+    return {
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "rps": round(sum(len(values) for values in latencies.values()) / elapsed, 1),
+        "endpoints": endpoints,
+    }
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True, cwd=Path(__file__).parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(concurrency: list[int], duration: float, llm_latency: float, llm_jitter: float, search_share: float) -> dict[str, Any]:
+    server = Server(StubLLM(llm_latency, llm_jitter)).start()
+    base_url = f"http://127.0.0.1:{server.port}"
+    stages = []
+    try:
+        for level in concurrency:
+            server.reset_lag()
+            stage = asyncio.run(_stage(base_url, level, duration, search_share))
+            stage["loop_lag_ms"] = _percentiles(server.reset_lag())
+            stages.append(stage)
+    finally:
+        server.stop()
+    return {
+        "commit": _commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "aiohttp": aiohttp.__version__,
+        "duration": duration,
+        "llm_latency_ms": llm_latency * 1000,
+        "llm_jitter_ms": llm_jitter * 1000,
+        "search_share": search_share,
+        "stages": stages,
+    }
+
+def _print(results: dict[str, Any], baseline: Optional[dict[str, Any]] = None):
+    print(f"commit {results['commit']}, stub LLM {results['llm_latency_ms']:.0f}ms, {results['duration']}s per stage")
+    previous = {stage["concurrency"]: stage for stage in (baseline or {}).get("stages", [])}
+    print(f"{'conc':>5} {'rps':>9} {'search p50':>11} {'p95':>9} {'p99':>9} {'report p50':>11} {'p95':>9} {'p99':>9} {'lag p99':>8} {'errors':>7}" + (f" {'rps vs base':>12}" if baseline else ""))
+    for stage in results["stages"]:
+        search, report = stage["endpoints"]["search"], stage["endpoints"]["report"]
+        line = (f"{stage['concurrency']:>5} {stage['rps']:>9} {search['latency_ms']['p50']!s:>11} {search['latency_ms']['p95']!s:>9} {search['latency_ms']['p99']!s:>9} "
+                f"{report['latency_ms']['p50']!s:>11} {report['latency_ms']['p95']!s:>9} {report['latency_ms']['p99']!s:>9} {stage['loop_lag_ms']['p99']!s:>8} {search['errors'] + report['errors']:>7}")
+        if baseline:
+            base = previous.get(stage["concurrency"])
+            ratio = f"{stage['rps'] / base['rps']:.2f}x" if base and base["rps"] else "-"
+            line += f" {ratio:>12}"
+        print(line)
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description="Load test /api/search and /api/report of an in-process voicelive app.")
+    parser.add_argument("--concurrency", default="1,4,16,64,256", help="Comma separated concurrency levels, run in order")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per concurrency level")
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0, help="Latency of the stub LLM behind /api/search")
+    parser.add_argument("--llm-jitter-ms", type=float, default=50.0, help="Uniform jitter added to the stub LLM latency")
+    parser.add_argument("--search-share", type=float, default=0.5, help="Share of requests going to /api/search, the rest go to /api/report")
+    parser.add_argument("--output", type=Path, help="Write the results as JSON to this file")
+    parser.add_argument("--compare", type=Path, help="Results of an earlier run to compare throughput against")
+    args = parser.parse_args(argv)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    results = run([int(level) for level in args.concurrency.split(",")], args.duration, args.llm_latency_ms / 1000, args.llm_jitter_ms / 1000, args.search_share)
+    baseline = json.loads(args.compare.read_text()) if args.compare else None
+    _print(results, baseline)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -16,9 +16,12 @@ class ReportStore:
             return json.load(file)
 
 
-    def __init__(self):
+    def __init__(self, templates: Optional[list] = None):
         self.logger = logging.getLogger("reportstore")
         self.logger.info("Initializing ReportStore")
+        if templates is not None:
+            self.templates = templates
+            return
         templates_path = os.path.join(os.path.dirname(__file__), 'templates.json')
         self.templates = self.load_from_file(templates_path)
  